@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from models.models import LLMPrompt, db
+from services.shared_services import active_prompt_cache
 from pytz import timezone
 
 admin_bp = Blueprint("admin", __name__)
@@ -46,6 +47,8 @@ def update_prompt(id):
     prompt.updated_by = data.get("updated_by", prompt.updated_by)
     prompt.updated_at = current_time
     db.session.commit()
+    if prompt.is_active:
+        active_prompt_cache.invalidate()  # 활성 프롬프트 내용 변경 시 캐시 무효화
     return jsonify({"message": "Prompt updated successfully"}), 200
 
 # 프롬프트 활성화
@@ -59,4 +62,5 @@ def activate_prompt(id):
         return jsonify({"error": "Prompt not found"}), 404
     prompt.is_active = True  # 선택한 프롬프트 활성화
     db.session.commit()
+    active_prompt_cache.invalidate()  # 모든 워커의 프롬프트 캐시 무효화
     return jsonify({"message": f"{prompt.prompt_name} 프롬프트가 활성화되었습니다."}), 200
@@ -1,12 +1,17 @@
 
-from flask import Blueprint, request, jsonify, redirect, url_for
+from flask import Blueprint, request, jsonify, redirect, url_for, g
 from models import db, User, Log, Token, Conversation
 import jwt
+import hashlib
 import re
 import os
 import uuid
 from datetime import datetime, timedelta
 from functools import wraps
+from services.pagination import keyset_page, parse_limit
+from services.conversation_search import ConversationSearchIndex
+from services.auth_cache import auth_cache
+from services.write_behind import write_behind
 
 import requests as py_requests
 from google.oauth2 import id_token
@@ -33,11 +38,26 @@ password_regex = r'^(?=.*[A-Za-z])(?=.*\d)[A-Za-z\d@$!.%*?&]{8,}$'
 tz = timezone("Asia/Ho_Chi_Minh")
 current_time = datetime.utcnow()
 
+# 대화 제목/본문 전문 검색 인덱스 (대화 생성/수정/삭제 시 같은 트랜잭션에서 동기화)
+conversation_search = ConversationSearchIndex(
+    db,
+    backfill=lambda connection: connection.execute(
+        db.select(Conversation.id, Conversation.user_id, Conversation.title, Conversation.messages)
+    )
+)
+
 def is_valid_username(username):
     return re.match(email_regex, username) is not None
 
+def revocation_key(token_str, claims):
+    """Key for the revocation cache: the jti claim, or a hash of the token for tokens without one."""
+    return claims.get('jti') or hashlib.sha256(token_str.encode('utf-8')).hexdigest()
+
 def token_required(f):
-    """Decorator to protect routes with JWT authentication."""
+    """
+    Decorator to protect routes with JWT authentication.
+    Revocation status and the user are served from auth_cache, so a cached request needs no DB round trip.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('Authorization')
@@ -45,14 +65,18 @@ def token_required(f):
             return jsonify({'error': 'Token is missing or malformed!'}), 401
         token_str = token.split(" ")[1]
 
-        # Check if token is revoked
-        invalid_token = Token.query.filter_by(token=token_str, revoked=True).first()
-        if invalid_token:
-            return jsonify({'error': 'Token has been revoked. Please log in again.'}), 401
-
         try:
             data = jwt.decode(token_str, SECRET_KEY, algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+
+            # Check if token is revoked
+            revoked = auth_cache.is_revoked(
+                revocation_key(token_str, data), data.get('exp'),
+                lambda: Token.query.filter_by(token=token_str, revoked=True).first() is not None
+            )
+            if revoked:
+                return jsonify({'error': 'Token has been revoked. Please log in again.'}), 401
+
+            current_user = auth_cache.get_user(data['user_id'], lambda: User.query.get(data['user_id']))
             if not current_user:
                 return jsonify({'error': 'Invalid user associated with token!'}), 401
         except jwt.ExpiredSignatureError:
@@ -60,6 +84,7 @@ def token_required(f):
         except Exception as e:
             return jsonify({'error': f'Token is invalid: {str(e)}'}), 401
 
+        g.token_claims = data
         return f(current_user, *args, **kwargs)
     return decorated
 
@@ -118,11 +143,11 @@ def login():
     }, SECRET_KEY, algorithm='HS256')
 
     try:
-        token_entry = Token(user_id=user.id, token=jwt_token, issued_at=now, revoked=False)
-        db.session.add(token_entry)
-        log_entry = Log(user_id=user.id, description=f"User {username} logged in")
-        db.session.add(log_entry)
+        # The Token row is written synchronously so logout can always revoke it;
+        # the audit Log row is written in batches by the write-behind buffer
+        db.session.add(Token(user_id=user.id, token=jwt_token, issued_at=now, revoked=False))
         db.session.commit()
+        write_behind.add(Log, user_id=user.id, description=f"User {username} logged in", timestamp=now)
 
         return jsonify({'message': 'Login successful', 'token': jwt_token}), 200
     except Exception as e:
@@ -138,13 +163,16 @@ def logout(current_user):
         invalid_token = Token.query.filter_by(token=token_str).first()
         if invalid_token:
             invalid_token.revoked = True
-        log_entry = Log(user_id=current_user.id, description=f"User {current_user.username} logged out")
-        db.session.add(log_entry)
-        db.session.commit()
+            db.session.commit()
+        write_behind.add(Log, user_id=current_user.id, description=f"User {current_user.username} logged out",
+                         timestamp=datetime.utcnow())
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f"Failed to log logout event: {str(e)}"}), 500
 
+    # Reject the token immediately in this process (other processes see it once their cached check expires)
+    auth_cache.revoke(revocation_key(token_str, g.token_claims), g.token_claims.get('exp'))
+
     return jsonify({'message': 'Logout successful'}), 200
 
 ###############################################################################
@@ -211,11 +239,9 @@ def google_callback():
     }, SECRET_KEY, algorithm='HS256')
 
     try:
-        token_entry = Token(user_id=user.id, token=jwt_token, issued_at=now, revoked=False)
-        db.session.add(token_entry)
-        log_entry = Log(user_id=user.id, description=f"User {user.username} logged in")
-        db.session.add(log_entry)
+        db.session.add(Token(user_id=user.id, token=jwt_token, issued_at=now, revoked=False))
         db.session.commit()
+        write_behind.add(Log, user_id=user.id, description=f"User {user.username} logged in", timestamp=now)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f"Failed to log login event: {str(e)}"}), 500
@@ -234,14 +260,23 @@ def google_callback():
 @token_required
 def get_conversations(current_user):
     """
-    Example: GET /conversations?titlesOnly=true
-    Returns all conversations for the logged-in user, optionally only ID/title/timestamp
+    Example: GET /conversations?titlesOnly=true&limit=50&cursor=...
+    Returns one page of conversations (newest first) for the logged-in user, optionally only ID/title/timestamp.
+    The cursor for the next page is returned in the X-Next-Cursor header.
     """
     titles_only = request.args.get('titlesOnly') == 'true'
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        convs, next_cursor = keyset_page(
+            Conversation.query.filter_by(user_id=current_user.id),
+            Conversation.timestamp, Conversation.id, limit,
+            cursor=request.args.get('cursor'), descending=True,
+            columns=(Conversation.id, Conversation.title, Conversation.timestamp) if titles_only else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     if titles_only:
-        convs = db.session.query(Conversation.id, Conversation.title, Conversation.timestamp) \
-                          .filter_by(user_id=current_user.id) \
-                          .order_by(Conversation.timestamp.desc()).all()
         data = []
         for c_id, c_title, c_ts in convs:
             data.append({
@@ -249,10 +284,7 @@ def get_conversations(current_user):
                 "title": c_title,
                 "timestamp": c_ts
             })
-        return jsonify(data), 200
     else:
-        convs = Conversation.query.filter_by(user_id=current_user.id) \
-                                  .order_by(Conversation.timestamp.desc()).all()
         data = []
         for c in convs:
             data.append({
@@ -264,37 +296,48 @@ def get_conversations(current_user):
                 "model": c.model,
                 "systemPrompt": c.systemPrompt
             })
-        return jsonify(data), 200
+    response = jsonify(data)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
 
 @auth_routes.route('/conversations/search', methods=['GET'])
 @token_required
 def search_conversations(current_user):
     """
     Example: GET /conversations/search?in=convo&q=someTerm
-             GET /conversations/search?q=titleTerm
+             GET /conversations/search?q=titleTerm&limit=20
+    Full-text search ranked by relevance; "snippet" highlights matches with <mark>.
     """
     in_param = request.args.get('in')
     q = request.args.get('q', '')
-
-    if in_param == 'convo':
-        # Search in messages
-        found = Conversation.query.filter(
-            Conversation.user_id == current_user.id,
-            Conversation.messages.ilike(f'%{q}%')
-        ).all()
-    else:
-        # Title search
-        found = Conversation.query.filter(
-            Conversation.user_id == current_user.id,
-            Conversation.title.ilike(f'%{q}%')
-        ).all()
+    try:
+        limit = parse_limit(request.args.get('limit'), default=20)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # in=convo: title + messages, otherwise title only
+    hits = conversation_search.search(current_user.id, q, field="all" if in_param == 'convo' else "title", limit=limit)
+    if not hits:
+        return jsonify([]), 200
+
+    found = {
+        c_id: (c_title, c_ts)
+        for c_id, c_title, c_ts in db.session.query(Conversation.id, Conversation.title, Conversation.timestamp)
+        .filter(Conversation.user_id == current_user.id, Conversation.id.in_([hit["id"] for hit in hits]))
+    }
 
     data = []
-    for c in found:
+    for hit in hits:
+        if hit["id"] not in found:
+            continue
+        c_title, c_ts = found[hit["id"]]
         data.append({
-            "id": c.id,
-            "title": c.title,
-            "timestamp": c.timestamp,
+            "id": hit["id"],
+            "title": c_title,
+            "timestamp": c_ts,
+            "rank": hit["rank"],
+            "snippet": hit["snippet"],
             "messages": "[]"  # if you want to omit the actual messages
         })
     return jsonify(data), 200
@@ -333,6 +376,8 @@ def create_conversation(current_user):
         timestamp=int(datetime.now().timestamp())  # or store an integer
     )
     db.session.add(new_conv)
+    db.session.flush()  # id 할당
+    conversation_search.upsert(new_conv.id, current_user.id, title, messages)
     db.session.commit()
     return jsonify({"message": "Conversation created", "id": new_conv.id}), 201
 
@@ -351,6 +396,8 @@ def update_conversation(current_user, conv_id):
     if messages is not None:
         conversation.messages = messages
     conversation.timestamp = int(datetime.now().timestamp())
+    if title is not None or messages is not None:
+        conversation_search.upsert(conversation.id, current_user.id, conversation.title, conversation.messages)
 
     db.session.commit()
     return jsonify({"message": "Conversation updated"}), 200
@@ -363,5 +410,6 @@ def delete_conversation(current_user, conv_id):
         return jsonify({"error": "Conversation not found"}), 404
 
     db.session.delete(conversation)
+    conversation_search.delete(conv_id)
     db.session.commit()
     return jsonify({"message": "Conversation deleted"}), 200
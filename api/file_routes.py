@@ -1,20 +1,19 @@
 from flask import Blueprint, request, jsonify
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-from services.answer_generator import AnswerGenerator
-from services.document_fetcher import DocumentFetcher
-from services.vector_db_manager import VectorDBManager
-from services.retriever_manager import RetrieverManager
-from services.chat_generator import ChatGenerator
-from services.chat_service import ChatService
-from services.RAG_manager import RAGManager
+from services.shared_services import vector_collections, ingestion_queue
+from services.vector_collections import VectorCollections
+from services.pagination import keyset_page, parse_limit
+from services.auth_cache import auth_cache
 from werkzeug.utils import secure_filename
+from werkzeug.formparser import parse_form_data
+from werkzeug.exceptions import RequestEntityTooLarge
 from datetime import datetime
 from models.models import db, FileMetadata,User
 import sqlalchemy as sa
 from pytz import timezone
+from urllib.parse import urlsplit
 
-from dotenv import load_dotenv
+import hashlib
+import io
 import os
 import uuid
 
@@ -22,47 +21,97 @@ file_routes = Blueprint('file_routes', __name__)
 
 ALLOWED_FILE_TYPES = {'txt', 'docx', 'pdf'}
 MAX_FILE_SIZE = 25 * 1024 * 1024  # 25 MB
+MULTIPART_OVERHEAD = 64 * 1024  # 폼 필드/경계 문자열 여유분
+MAX_UPLOAD_REQUEST_SIZE = MAX_FILE_SIZE + MULTIPART_OVERHEAD  # app.config['MAX_CONTENT_LENGTH']로도 사용
+MAX_BULK_URLS = 1000  # 일괄 URL 수집 요청당 최대 URL 수 (sitemap 포함)
 
 tz = timezone("Asia/Ho_Chi_Minh")  # Replace with your desired time zone
 current_time = datetime.now(tz)
 
-# Get API keys from environment variables
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-# Ensure at least one API key is provided
-if not (GOOGLE_API_KEY or OPENAI_API_KEY):
-    raise ValueError("Neither GOOGLE_API_KEY nor OPENAI_API_KEY is set in the environment variables.")
-
-# 클래스 인스턴스 생성
-document_fetcher = DocumentFetcher()
-vector_db_manager = VectorDBManager(
-    openai_api_key=OPENAI_API_KEY,
-    google_api_key=GOOGLE_API_KEY
-)
-answer_generator = AnswerGenerator(
-    model="models/gemini-1.5-flash", 
-    temperature=0.7               
-)
-retriever_manager = RetrieverManager(vector_db_manager=vector_db_manager)
-rag_manager = RAGManager(
-    retriever_manager=retriever_manager,
-    answer_generator=answer_generator,
-    document_fetcher=document_fetcher,
-    vector_db_manager=vector_db_manager
-)
-
-
 def is_allowed_file(file_name):
     return '.' in file_name and file_name.rsplit('.', 1)[1].lower() in ALLOWED_FILE_TYPES
 
-def is_admin(username):
+def unique_upload_path(file_name):
+    """업로드마다 고유한 디렉터리 안의 저장 경로 (같은 이름을 동시에 올려도 서로 덮어쓰지 않음, 파일 이름은 유지)"""
+    directory = os.path.join("temp_uploads", uuid.uuid4().hex)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, secure_filename(file_name))
+
+def upload_source(file_name):
+    """청크 메타데이터에 기록할 고정 source (업로드마다 같은 값이어야 재업로드 시 바뀐 청크만 임베딩)"""
+    return os.path.join("temp_uploads", secure_filename(file_name))
+
+def is_http_url(url):
+    return isinstance(url, str) and urlsplit(url).scheme in ('http', 'https') and bool(urlsplit(url).netloc)
+
+class FileTooLarge(Exception):
+    pass
+
+class HashingUploadFile(io.FileIO):
+    """
+    multipart 파트를 받는 즉시 디스크에 쓰면서 SHA-256과 크기를 계산하는 파일 (werkzeug stream_factory용).
+    max_size를 넘는 순간 FileTooLarge를 발생시켜 본문 읽기를 중단한다.
+    """
+
+    def __init__(self, path, max_size=MAX_FILE_SIZE):
+        super().__init__(path, "w+")
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise FileTooLarge()
+        self.digest.update(data)
+        return super().write(data)
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def parse_upload_stream(environ, max_size=MAX_FILE_SIZE):
+    """
+    요청 본문을 직접 파싱하여 파일 파트를 werkzeug의 임시 파일을 거치지 않고 temp_uploads에 바로 저장.
+    request.form/request.files에 먼저 접근하면 본문 전체가 임시 파일로 복사되므로 그 전에 호출해야 한다.
+    본문이나 파일이 제한을 넘으면 저장 중이던 파일을 지우고 FileTooLarge/RequestEntityTooLarge를 발생시킨다.
+    :return: (form, files, {파일 필드 이름: HashingUploadFile})
+    """
+    uploads = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        os.makedirs("temp_uploads", exist_ok=True)
+        partial_path = os.path.join("temp_uploads", f"{uuid.uuid4().hex}.part")
+        upload = HashingUploadFile(partial_path, max_size)
+        uploads.append(upload)
+        return upload
+
+    try:
+        _, form, files = parse_form_data(
+            environ, stream_factory=stream_factory, max_content_length=MAX_UPLOAD_REQUEST_SIZE, silent=False
+        )
+    except BaseException:
+        for upload in uploads:
+            upload.discard()
+        raise
+    received = {name: storage.stream for name, storage in files.items()}
+    for upload in uploads:
+        if upload not in received.values():
+            upload.discard()
+    return form, files, received
+
+def _load_role(username):
     result = db.session.execute(
         sa.text("SELECT role FROM company_employee WHERE email = :email"),
         {'email': username}
     ).mappings().fetchone()
+    return result['role'] if result else None
 
-    return result and result['role'] == 'admin'
+def is_admin(username):
+    # 역할 조회 결과는 auth_cache에 짧게 보관 (AUTH_ROLE_CACHE_TTL)
+    return auth_cache.get_role(username, lambda: _load_role(username)) == 'admin'
 
 @file_routes.route('/upload', methods=['POST'])
 def upload_content():
@@ -73,98 +122,192 @@ def upload_content():
     if not is_admin(username):
         return jsonify({"error": "Access denied. Only admins can upload content."}), 403
 
-    # 파일 업로드 요청 처리
-    if 'file' in request.files:
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "No selected file"}), 400
+    # 선언된 본문 크기가 제한을 넘으면 본문을 읽기 전에 거절
+    if request.content_length and request.content_length > MAX_UPLOAD_REQUEST_SIZE:
+        return jsonify({"error": "File exceeds maximum size of 25 MB"}), 413
 
-        if not file:
-            return jsonify({"error": "No file provided"}), 400
+    # 본문을 한 번만 읽으면서 파일은 디스크에 바로 저장하고 SHA-256 계산
+    # (Content-Length가 없는 chunked 요청도 MAX_UPLOAD_REQUEST_SIZE에서 중단)
+    try:
+        form, files, uploads = parse_upload_stream(request.environ)
+    except (FileTooLarge, RequestEntityTooLarge):
+        return jsonify({"error": "File exceeds maximum size of 25 MB"}), 413
 
-        if not is_allowed_file(file.filename):
-            return jsonify({"error": "File type not allowed"}), 400
+    upload = uploads.get('file')
+    try:
+        # 저장할 벡터 컬렉션 (없으면 기본 컬렉션)
+        collection = form.get("collection") or None
+        if collection:
+            try:
+                VectorCollections.validate_name(collection)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        # 파일 업로드 요청 처리
+        if 'file' in files:
+            return _queue_file_upload(username, files['file'], upload, collection)
+
+        # URL 업로드 요청 처리
+        if 'title' in form and 'url' in form:
+            return _queue_url_upload(username, form.get("title"), form.get("url"), collection)
+
+        # 유효하지 않은 요청 처리
+        return jsonify({"error": "Invalid request. Provide a file or title and URL."}), 400
+    finally:
+        # 작업에 넘기지 않은 업로드 파일은 정리 (넘긴 파일은 .part가 아닌 경로로 옮겨져 있음)
+        if upload is not None and os.path.exists(upload.path):
+            upload.discard()
 
-        file.seek(0, 2)  # Move to end of file
-        file_size = file.tell()
-        file.seek(0)
+def _queue_file_upload(username, file, upload, collection):
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
 
-        if file_size > MAX_FILE_SIZE:
-            return jsonify({"error": "File exceeds maximum size of 25 MB"}), 400
+    if not file or upload is None:
+        return jsonify({"error": "No file provided"}), 400
 
-        file_name = file.filename
-        file_type = file_name.rsplit('.', 1)[1].lower()
-        upload_date = current_time
+    if not is_allowed_file(file.filename):
+        return jsonify({"error": "File type not allowed"}), 400
 
-        user = User.query.filter_by(username=username).first()
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+    file_name = file.filename
+    file_type = file_name.rsplit('.', 1)[1].lower()
+    upload_date = current_time
 
-        try:
-            # Save file temporarily
-            temp_path = os.path.join("temp_uploads", secure_filename(file_name))
-            file.save(temp_path)
-
-            # Process the document and add to vector DB
-            docs = document_fetcher.load_docx(temp_path) if file_name.endswith("docx") else document_fetcher.load_pdf(temp_path)
-
-            if docs:
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-                documents = []
-
-                for doc in docs:
-                    splits = text_splitter.split_text(doc.page_content)
-                    for i, split in enumerate(splits):
-                        documents.append(
-                            Document(
-                                page_content=split,
-                                metadata={
-                                    "title": file_name,
-                                    "source": temp_path
-                                }
-                            )
-                        )
-
-                vector_db_manager.vectorstore.add_documents(documents)
-                vector_db_manager.vectorstore.save_local(vector_db_manager.vectorstore_path)
-
-                # Save metadata to the database
-                metadata = FileMetadata(
-                    name=file_name, size=file_size, type=file_type, upload_date=upload_date, user_id=user.id
-                )
-                db.session.add(metadata)
-                db.session.commit()
-
-                return jsonify({"message": "File uploaded successfully", "document_count": len(documents)}), 201
-            else:
-                return jsonify({"error": "Failed to process the document content"}), 500
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    try:
+        upload.close()
+        file_size, content_hash = upload.size, upload.digest.hexdigest()
+
+        existing = FileMetadata.query.filter_by(content_hash=content_hash, collection=collection).first()
+        if existing:
+            return jsonify({
+                "message": "File already indexed",
+                "duplicate": True,
+                "file": {
+                    "title": existing.name,
+                    "size": existing.size,
+                    "type": existing.type,
+                    "upload_date": existing.upload_date.isoformat(),
+                    "content_hash": content_hash
+                }
+            }), 200
+
+        temp_path = unique_upload_path(file_name)
+        os.replace(upload.path, temp_path)
+
+        # 파싱/분할/임베딩/메타데이터 저장은 백그라운드 작업으로 처리
+        job_id = ingestion_queue.submit("file", {
+            "file_name": file_name,
+            "temp_path": temp_path,
+            "source": upload_source(file_name),
+            "file_size": file_size,
+            "file_type": file_type,
+            "upload_date": upload_date.isoformat(),
+            "user_id": user.id,
+            "collection": collection,
+            "content_hash": content_hash
+        }, created_by=username)
+
+        return jsonify({
+            "message": "File accepted for processing",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}"
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+def _queue_url_upload(username, title, url, collection):
+    if not title or not url:
+        return jsonify({"error": "Title and URL are required"}), 400
 
-    # URL 업로드 요청 처리
-    elif 'title' in request.form and 'url' in request.form:
-        title = request.form.get("title")
-        url = request.form.get("url")
-        if not title or not url:
-            return jsonify({"error": "Title and URL are required"}), 400
+    try:
+        job_id = ingestion_queue.submit(
+            "url", {"title": title, "url": url, "collection": collection}, created_by=username
+        )
 
+        return jsonify({
+            "message": f"URL '{title}' accepted for processing.",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}"
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"Failed to queue URL: {str(e)}"}), 500
+
+@file_routes.route('/upload_urls', methods=['POST'])
+def upload_urls():
+    """
+    여러 URL 또는 sitemap을 한 번에 수집.
+    요청 본문: {"urls": ["https://...", {"url": "https://...", "title": "..."}], "sitemap": "https://.../sitemap.xml", "collection": "..."}
+    """
+    username = request.headers.get('username')
+    if not username:
+        return jsonify({"error": "Username not provided"}), 400
+
+    if not is_admin(username):
+        return jsonify({"error": "Access denied. Only admins can upload content."}), 403
+
+    data = request.get_json(silent=True) or {}
+    collection = data.get("collection") or None
+    if collection:
         try:
-            doc = document_fetcher.fetch(title, url)
-            vector_details = vector_db_manager.add_doc_to_db(doc)
+            VectorCollections.validate_name(collection)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    urls = []
+    for entry in data.get("urls") or []:
+        item = {"url": entry} if isinstance(entry, str) else entry
+        if not isinstance(item, dict) or not is_http_url(item.get("url")):
+            return jsonify({"error": f"Invalid URL: {entry!r}"}), 400
+        urls.append({"url": item["url"], "title": item.get("title") or None})
+    sitemap = data.get("sitemap")
+    if sitemap is not None and not is_http_url(sitemap):
+        return jsonify({"error": "Invalid sitemap URL"}), 400
+    if not urls and not sitemap:
+        return jsonify({"error": "Provide urls or a sitemap"}), 400
+    if len(urls) > MAX_BULK_URLS:
+        return jsonify({"error": f"Too many URLs (max {MAX_BULK_URLS})"}), 400
 
-            return jsonify({
-                "message": f"URL '{title}' has been successfully added to the vector database.",
-                "vector_info": vector_details
-            }), 200
+    try:
+        job_id = ingestion_queue.submit("urls", {
+            "urls": urls,
+            "sitemap": sitemap,
+            "max_urls": MAX_BULK_URLS - len(urls),
+            "collection": collection
+        }, created_by=username)
+
+        return jsonify({
+            "message": f"{len(urls)} URLs{' and sitemap' if sitemap else ''} accepted for processing.",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}"
+        }), 202
 
-        except RuntimeError as e:
-            return jsonify({"error": f"Failed to process URL: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"Failed to queue URLs: {str(e)}"}), 500
 
-    # 유효하지 않은 요청 처리
-    else:
-        return jsonify({"error": "Invalid request. Provide a file or title and URL."}), 400
+@file_routes.route('/collections', methods=['GET'])
+def list_collections():
+    """벡터 컬렉션 목록과 컬렉션별 문서 수"""
+    username = request.headers.get('username')
+    if not username:
+        return jsonify({"error": "Username not provided"}), 400
+
+    if not is_admin(username):
+        return jsonify({"error": "Access denied. Only admins can view collections."}), 403
+
+    return jsonify({
+        "collections": [
+            {"name": name, "documents": len(vector_collections.get(name).get_all_docs_metadata())}
+            for name in vector_collections.names()
+        ]
+    }), 200
 
 @file_routes.route('/list_files', methods=['GET'])
 def list_files():
@@ -184,12 +327,19 @@ def list_files():
         return jsonify({"error": "Invalid sort parameter"}), 400
 
     try:
-        # 정렬 조건에 따라 파일 메타데이터를 쿼리
-        query = FileMetadata.query.order_by(
-            getattr(FileMetadata, sort_by).asc() if sort_order == 'asc' else getattr(FileMetadata, sort_by).desc()
-        )
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # 정렬 조건에 따라 (정렬 컬럼, id) 인덱스로 한 페이지만 조회 (?limit=&cursor=)
         print(f"Sorting by: {sort_by}, Order: {sort_order}")
-        files = query.all()
+        files, next_cursor = keyset_page(
+            FileMetadata.query,
+            getattr(FileMetadata, sort_by), FileMetadata.id, limit,
+            cursor=request.args.get('cursor'), descending=sort_order != 'asc',
+            columns=(FileMetadata.id, FileMetadata.name, FileMetadata.size, FileMetadata.type, FileMetadata.upload_date)
+        )
 
         # 파일 메타데이터를 제목(title) 중심으로 구성
         file_list = [
@@ -202,7 +352,13 @@ def list_files():
             for file in files
         ]
 
-        return jsonify({"files": file_list}), 200
+        # 다음 페이지 커서는 다른 목록 API와 같이 X-Next-Cursor 헤더로 전달
+        response = jsonify({"files": file_list})
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error while listing files: {e}")
         return jsonify({"error": f"Database error: {str(e)}"}), 500
@@ -219,8 +375,15 @@ def delete_file(title):
     if not is_admin(username):
         return jsonify({"error": "Access denied. Only admins can delete files."}), 403
 
-    # 제목을 기준으로 메타데이터 검색
-    metadata = FileMetadata.query.filter_by(name=title).first()
+    # 벡터 데이터를 삭제할 컬렉션 (없으면 기본 컬렉션)
+    collection = request.args.get("collection") or None
+    try:
+        manager = vector_collections.get(collection, create=False)
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e)}), 404
+
+    # 제목과 컬렉션을 기준으로 메타데이터 검색 (다른 컬렉션의 같은 이름 파일은 건드리지 않음)
+    metadata = FileMetadata.query.filter_by(name=title, collection=collection).first()
     if not metadata:
         return jsonify({"error": f"File with title '{title}' not found"}), 404
 
@@ -231,7 +394,7 @@ def delete_file(title):
 
         # 벡터 데이터 삭제
         try:
-            result = vector_db_manager.delete_doc_by_title(title)  # vector_db_manager의 메서드 호출
+            result = manager.delete_doc_by_title(title)  # vector_db_manager의 메서드 호출
             if result.get("message", "").startswith("✅"):
                 return jsonify({
                     "message": f"File '{title}' and its vector data deleted successfully"
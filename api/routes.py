@@ -1,51 +1,26 @@
-from flask import Blueprint, request, jsonify, render_template
-from services.answer_generator import AnswerGenerator
-from services.document_fetcher import DocumentFetcher
-from services.vector_db_manager import VectorDBManager
-from services.retriever_manager import RetrieverManager
-from services.chat_generator import ChatGenerator
+from flask import Blueprint, request, jsonify, render_template, Response, stream_with_context
 from services.chat_service import ChatService
-from services.RAG_manager import RAGManager
-from werkzeug.utils import secure_filename
-
-from dotenv import load_dotenv
+from services.shared_services import (
+    document_fetcher,
+    vector_db_manager,
+    retriever_manager,
+    rag_manager,
+    ingestion_queue,
+    chat_generator,
+)
+from services.vector_collections import VectorCollections
+from api.file_routes import unique_upload_path, upload_source
+from services.pagination import parse_limit
+import json
 import os
 
-# Load environment variables
-load_dotenv()
-
-# Get API keys from environment variables
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-# Ensure at least one API key is provided
-if not (GOOGLE_API_KEY or OPENAI_API_KEY):
-    raise ValueError("Neither GOOGLE_API_KEY nor OPENAI_API_KEY is set in the environment variables.")
-
 # Blueprint 생성
 api_bp = Blueprint('api', __name__)
 chat_bp = Blueprint('chat', __name__)
 weblink_bp = Blueprint('weblink', __name__)
 pdf_bp = Blueprint('pdf', __name__)
 rag_bp = Blueprint('rag', __name__)
-
-# 클래스 인스턴스 생성
-document_fetcher = DocumentFetcher()
-vector_db_manager = VectorDBManager(
-    openai_api_key=OPENAI_API_KEY,
-    google_api_key=GOOGLE_API_KEY
-)
-answer_generator = AnswerGenerator(
-    model="models/gemini-1.5-flash", 
-    temperature=0.7               
-)
-retriever_manager = RetrieverManager(vector_db_manager=vector_db_manager)
-rag_manager = RAGManager(
-    retriever_manager=retriever_manager,
-    answer_generator=answer_generator,
-    document_fetcher=document_fetcher,
-    vector_db_manager=vector_db_manager
-)
+job_bp = Blueprint('job', __name__)
 
 # 질문 제출 및 응답 생성 API
 @chat_bp.route("/<string:user_id>", methods=["POST"])
@@ -58,27 +33,88 @@ def ask(user_id):
         return jsonify({"error": "❌ 질문을 입력해주세요!"}), 400
 
     try:
-        chat_generator = ChatGenerator(retriever_manager)
-        context = retriever_manager.retrieve_context(question, 3)
+        context = retriever_manager.retrieve_context(question, 3, collections=data.get("collections"))
         answer = chat_generator.generate_answer(user_id, question, context)
         ChatService.save_chat(user_id=user_id, question=question, answer=answer)
         return jsonify({"answer": answer}), 200
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         return jsonify({"error": f"❌ 오류 발생: {str(e)}"}), 500
+
+def _sse_event(event, data):
+    """Server-Sent Events 메시지 포맷"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 질문 제출 및 스트리밍 응답 API (SSE)
+@chat_bp.route("/<string:user_id>/stream", methods=["POST"])
+def ask_stream(user_id):
+    data = request.get_json()
+    question = data.get("question")
+
+    if not question:
+        return jsonify({"error": "❌ 질문을 입력해주세요!"}), 400
+
+    try:
+        context = retriever_manager.retrieve_context(question, 3, collections=data.get("collections"))
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return jsonify({"error": f"❌ 오류 발생: {str(e)}"}), 500
+
+    def generate():
+        parts = []
+        try:
+            for token in chat_generator.stream_answer(user_id, question, context):
+                parts.append(token)
+                yield _sse_event("token", {"text": token})
+
+            references = context.get("references", [])
+            yield _sse_event("references", references)
+
+            # 스트림 완료 후 전체 답변 저장
+            answer = "".join(parts) + chat_generator.format_references(references)
+            ChatService.save_chat(user_id=user_id, question=question, answer=answer)
+            yield _sse_event("done", {"answer": answer})
+        except Exception as e:
+            print(f"❌ Streaming error: {str(e)}")
+            yield _sse_event("error", {"error": f"❌ 오류 발생: {str(e)}"})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 채팅 기록 조회 엔드포인트
+# GET /api/chat/<user_id>?limit=50&cursor=...&summary=true
+# 최신순 한 페이지만 반환하며 다음 페이지 커서는 X-Next-Cursor 헤더로 전달 (기록이 없으면 빈 목록)
 @chat_bp.route("/<string:user_id>", methods=["GET"])
 def get_chat_history(user_id):
-    chat_history = ChatService.get_chat_history(user_id)
-    if not chat_history:
-        return jsonify({"message": "🔍 채팅 기록이 없습니다."}), 404
-
-    return jsonify(
-        [
+    cursor = request.args.get("cursor")
+    summary = request.args.get("summary") == "true"
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        chat_history, next_cursor = ChatService.get_chat_history_page(user_id, limit, cursor=cursor, summary=summary)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if summary:
+        items = [
+            {
+                "id": chat.id,
+                "conversation_id": chat.conversation_id,
+                "question": chat.question,
+                "timestamp": chat.timestamp.isoformat()
+            }
+            for chat in chat_history
+        ]
+    else:
+        items = [
             {"question": chat.question, "answer": chat.answer, "timestamp": chat.timestamp.isoformat()}
             for chat in chat_history
         ]
-    ), 200  
+    response = jsonify(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
 @api_bp.route("/", methods=["GET"])
 def home():
     return jsonify({
@@ -95,12 +131,13 @@ def rag_query():
         retriever_type = data.get("retriever_type", "similarity")
         k = data.get("k", 5)
         similarity_threshold = data.get("similarity_threshold", 0.7)
+        collections = data.get("collections")
 
         if not query:
             return jsonify({"error": "Query is required"}), 400
 
         # Use RAGManager to process the query
-        answer = rag_manager.query(query, retriever_type, k, similarity_threshold)
+        answer = rag_manager.query(query, retriever_type, k, similarity_threshold, collections=collections)
         return jsonify({"query": query, "answer": answer}), 200
 
     except Exception as e:
@@ -117,18 +154,36 @@ def pdf_build_vector_db():
     if file.filename == "":
         return jsonify({"error": "❌ 파일 이름이 비어 있습니다."}), 400
 
-    file_path = os.path.join("temp_uploads", secure_filename(file.filename))
+    collection = request.form.get("collection") or None
+    if collection:
+        try:
+            VectorCollections.validate_name(collection)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # 업로드마다 고유한 경로에 저장 (파일 이름은 유지되므로 문서 제목은 그대로)
+    file_path = unique_upload_path(file.filename)
     file.save(file_path)
 
     try:
-        # 문서 가져오기
-        docs = document_fetcher.load_pdf(file_path)
-
-        if docs:
-            vector_details = vector_db_manager.add_pdf_to_db(docs)
-                # vector_details_list.append(vector_details)
-            return jsonify({"message": "✅ PDF 문서가 성공적으로 처리되었습니다.", "vector_info": vector_details}), 200
-        else:
-            return jsonify({"error": "❌ PDF에서 텍스트를 추출할 수 없습니다."}), 500
+        # 문서 파싱/임베딩은 백그라운드 작업으로 처리
+        job_id = ingestion_queue.submit("pdf", {
+            "file_path": file_path,
+            "source": upload_source(file.filename),
+            "collection": collection
+        })
+        return jsonify({
+            "message": "✅ PDF 문서가 처리 대기열에 등록되었습니다.",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}"
+        }), 202
     except Exception as e:
-        return jsonify({"error": f"❌ Error processing PDF: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"❌ Error processing PDF: {str(e)}"}), 500
+
+# 수집 작업 상태 조회
+@job_bp.route("/<string:job_id>", methods=["GET"])
+def get_job_status(job_id):
+    status = ingestion_queue.get_job_status(job_id)
+    if not status:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status), 200
\ No newline at end of file
@@ -1,8 +1,11 @@
 from flask import Flask, jsonify
-from models.models import db
-from api.file_routes import file_routes
-from api.auth_routes import auth_routes
-from api.routes import chat_bp, weblink_bp, pdf_bp, rag_bp, api_bp
+from models.models import db, ensure_columns, ensure_indexes
+from api.file_routes import file_routes, MAX_UPLOAD_REQUEST_SIZE
+from api.auth_routes import auth_routes, conversation_search
+from api.routes import chat_bp, weblink_bp, pdf_bp, rag_bp, job_bp, api_bp
+from services.shared_services import ingestion_queue
+from services import metrics
+from services.write_behind import write_behind
 from api.admin_routes import admin_bp
 from dotenv import load_dotenv
 from flask import Flask
@@ -15,12 +18,18 @@ load_dotenv()
 app = Flask(__name__)
 
 # 앱에 CORS 설정 적용
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True, expose_headers=["X-Next-Cursor"])
 
 
 # Configure database
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# 요청 본문 최대 크기 (Content-Length 없는 chunked 요청도 읽는 도중 413으로 중단)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_REQUEST_SIZE
+# 수집 워커는 요청을 처리하는 프로세스에서만 시작 (작업 등록만 하는 프로세스는 0으로 설정)
+app.config['INGESTION_WORKERS_ENABLED'] = os.getenv("INGESTION_WORKERS_ENABLED", "1") == "1"
+# 벡터스토어는 한 프로세스만 열 수 있으므로 리로더(부모/자식 두 프로세스)는 사용하지 않음
+app.config['USE_RELOADER'] = False
 
 # Initialize database
 db.init_app(app)
@@ -38,8 +47,12 @@ app.register_blueprint(weblink_bp, url_prefix='/api/weblink')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(pdf_bp, url_prefix='/api/pdf')
 app.register_blueprint(rag_bp, url_prefix='/api/rag')
+app.register_blueprint(job_bp, url_prefix='/api/jobs')
 app.register_blueprint(api_bp, url_prefix='/api')
 
+# 단계별 지연 시간/처리량, 캐시 적중률, 인덱스 크기 (Prometheus 형식 GET /metrics)
+metrics.init_app(app)
+
 # Access environment variables
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -50,6 +63,10 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 
+@app.errorhandler(413)
+def request_entity_too_large(error):
+    return jsonify({"error": "Request body exceeds maximum size of 25 MB"}), 413
+
 @app.route('/')
 def index():
     return jsonify({"message": "Server is running"}), 200
@@ -58,8 +75,16 @@ def index():
 try:
     with app.app_context():
         db.create_all()
+        ensure_columns()
+        ensure_indexes()
+        conversation_search.ensure_schema()
 except Exception as e:
     print(f"Database setup error: {str(e)}")
 
+# 백그라운드 문서 수집 워커 시작 (미완료 작업 복구 포함)
+ingestion_queue.init_app(app)
+# 채팅 기록/로그/토큰 일괄 저장 워커 (종료 시 남은 행 저장)
+write_behind.init_app(app)
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=True, use_reloader=app.config['USE_RELOADER'])
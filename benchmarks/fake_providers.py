@@ -0,0 +1,70 @@
+import hashlib
+import re
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    외부 API 없이 동작하는 결정적 임베딩 (feature hashing).
+    같은 단어를 공유하는 텍스트끼리 가까워지므로 검색 결과도 의미 있게 나온다.
+    latency_ms로 API 왕복 시간을 흉내낼 수 있다.
+    """
+
+    def __init__(self, dimension=768, latency_ms=0.0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self._buckets = {}
+
+    def _bucket(self, token):
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            bucket = (digest % self.dimension, 1.0 if digest >> 63 else -1.0)
+            self._buckets[token] = bucket
+        return bucket
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            index, sign = self._bucket(token)
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+
+
+class FakeLLM(LLM):
+    """
+    결정적 가짜 LLM: 프롬프트 마지막 answer_words개 단어를 답변으로 돌려준다.
+    latency_ms로 생성 시간을 흉내낼 수 있다.
+    """
+
+    latency_ms: float = 0.0
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self):
+        return "fake-benchmark"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return " ".join(prompt.split()[-self.answer_words:])
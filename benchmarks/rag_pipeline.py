@@ -0,0 +1,328 @@
+"""
+RAG 파이프라인 오프라인 벤치마크.
+
+Gemini/OpenAI 대신 결정적 가짜 임베딩/LLM을 사용하여 합성 말뭉치로
+PDF 파싱 → 벡터 DB 적재 → 컨텍스트 검색 → 답변 생성 각 단계의
+처리량, p50/p95/p99 지연 시간, 최대 RSS를 측정하고 JSON으로 저장한다.
+
+사용법:
+    python -m benchmarks.rag_pipeline --sizes 1000,10000,100000 --output benchmark_results.json
+    python -m benchmarks.rag_pipeline --sizes 1000 --baseline benchmark_results.json --max-regression 0.2
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from flask import Flask
+from langchain_core.documents import Document
+
+from benchmarks.fake_providers import FakeEmbeddings, FakeLLM
+from benchmarks.synthetic_corpus import SyntheticCorpus, write_pdf
+
+
+def current_rss_bytes():
+    """현재 RSS (Linux는 /proc, 그 외에는 프로세스 최대 RSS로 대체)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSSSampler:
+    """with 블록 동안 RSS를 주기적으로 읽어 최댓값을 기록"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+def percentile(sorted_values, p):
+    """nearest-rank 백분위수"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_stage(calls, verbose=False):
+    """
+    calls: (items 수, 호출 함수) 목록. 호출마다 지연 시간을 재고 결과를 모은다.
+    :return: (단계 통계 dict, 결과 리스트)
+    """
+    latencies = []
+    results = []
+    items = 0
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with PeakRSSSampler() as sampler, output:
+        started = time.perf_counter()
+        for item_count, call in calls:
+            call_started = time.perf_counter()
+            results.append(call())
+            latencies.append((time.perf_counter() - call_started) * 1000)
+            items += item_count
+        seconds = time.perf_counter() - started
+
+    latencies.sort()
+    stats = {
+        "calls": len(latencies),
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput_per_sec": round(items / seconds, 2) if seconds else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3) if latencies else None,
+            "p95": round(percentile(latencies, 95), 3) if latencies else None,
+            "p99": round(percentile(latencies, 99), 3) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "max": round(latencies[-1], 3) if latencies else None,
+        },
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1),
+    }
+    return stats, results
+
+
+def benchmark_size(chunk_count, args, workdir):
+    """청크 chunk_count개 말뭉치에 대한 전체 단계 측정"""
+    # 서비스 모듈은 import 시 환경 변수를 읽으므로 작업 디렉터리 설정 후 import
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    # 크기마다 인덱스 종류와 compaction 임계값을 고정하여 측정 중 백그라운드 재구성/compaction이 끼어들지 않도록 함
+    os.environ["FAISS_INDEX_TYPE"] = args.index_type
+    os.environ["VECTOR_WAL_COMPACT_BYTES"] = str(args.wal_compact_bytes)
+    from models.models import db
+    from services.chat_generator import ChatGenerator
+    from services.document_fetcher import DocumentFetcher
+    from services.prompt_cache import ActivePromptCache
+    from services.retriever_manager import RetrieverManager
+    from services.session_memory import SessionMemory
+    from services.vector_db_manager import VectorDBManager
+
+    app = Flask("benchmark")
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+
+    corpus = SyntheticCorpus(seed=args.seed, chunk_chars=args.chunk_chars)
+    embeddings = FakeEmbeddings(dimension=args.dimension, latency_ms=args.embedding_latency_ms)
+    stages = {}
+
+    with app.app_context():
+        db.create_all()
+
+        # 1. PDF 파싱 (최대 pdf_pages 페이지만 실제 PDF로 작성하여 측정)
+        pdf_dir = os.path.join(workdir, "pdfs")
+        os.makedirs(pdf_dir)
+        pdf_pages = min(chunk_count, args.pdf_pages)
+        pdf_files = []
+        for start in range(0, pdf_pages, args.pages_per_pdf):
+            end = min(pdf_pages, start + args.pages_per_pdf)
+            path = os.path.join(pdf_dir, f"synthetic_{start:07d}.pdf")
+            write_pdf(path, [corpus.chunk(i) for i in range(start, end)])
+            pdf_files.append((path, end - start))
+
+        fetcher = DocumentFetcher()
+        stages["load_pdf"], parsed = run_stage(
+            [(pages, lambda path=path: fetcher.load_pdf(path)) for path, pages in pdf_files],
+            verbose=args.verbose
+        )
+
+        # 2. 벡터 DB 적재 (파싱한 PDF + 나머지는 같은 크기의 합성 문서 묶음)
+        uploads = [docs for docs in parsed if docs]
+        for start in range(pdf_pages, chunk_count, args.pages_per_pdf):
+            end = min(chunk_count, start + args.pages_per_pdf)
+            title = f"synthetic_{start:07d}"
+            uploads.append([
+                Document(page_content=corpus.chunk(i), metadata={"source": f"{title}.pdf", "title": title})
+                for i in range(start, end)
+            ])
+        manager = VectorDBManager(
+            openai_api_key=None,
+            google_api_key=None,
+            vectorstore_path=os.path.join(workdir, "faiss_db"),
+            embedding_model=embeddings
+        )
+        # 빈 벡터스토어를 고정한 인덱스 종류로 바꾸는 재구성은 측정 전에 끝냄
+        manager.wait_for_maintenance()
+        stages["add_pdf_to_db"], _ = run_stage(
+            [(len(docs), lambda docs=docs: manager.add_pdf_to_db(docs)) for docs in uploads],
+            verbose=args.verbose
+        )
+        manager.wait_for_maintenance()
+
+        # 3. 컨텍스트 검색
+        retriever = RetrieverManager(manager)
+        questions = [corpus.query(i) for i in range(args.queries)]
+        stages["retrieve_context"], contexts = run_stage(
+            [
+                (1, lambda question=question: retriever.retrieve_context(question, k=args.k, search_type=args.search_type))
+                for question in questions
+            ],
+            verbose=args.verbose
+        )
+
+        # 4. 답변 생성 (가짜 LLM, 대화 내역/프롬프트 캐시 포함)
+        generator = ChatGenerator(
+            manager,
+            prompt_cache=ActivePromptCache(version_file=os.path.join(workdir, "prompt_version")),
+            session_memory=SessionMemory(),
+            llm=FakeLLM(latency_ms=args.llm_latency_ms)
+        )
+        stages["generate_answer"], _ = run_stage(
+            [
+                (1, lambda i=i, question=question, context=context: generator.generate_answer(
+                    f"bench-user-{i % 10}", question, context
+                ))
+                for i, (question, context) in enumerate(zip(questions, contexts))
+            ],
+            verbose=args.verbose
+        )
+
+        hits = sum(1 for context in contexts if context["references"])
+        index_info = manager.get_index_info()
+
+    return {
+        "corpus_chunks": chunk_count,
+        "pdf_pages": pdf_pages,
+        "queries_with_references": hits,
+        "index": index_info,
+        "stages": stages,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """
+    기준 결과와 비교하여 p95 지연 증가 / 처리량 감소 비율 출력.
+    :return: max_regression을 넘는 회귀 목록
+    """
+    baseline_by_size = {entry["corpus_chunks"]: entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        base = baseline_by_size.get(entry["corpus_chunks"])
+        if not base:
+            continue
+        for stage, stats in entry["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if not base_stats:
+                continue
+            p95, base_p95 = stats["latency_ms"]["p95"], base_stats["latency_ms"]["p95"]
+            throughput, base_throughput = stats["throughput_per_sec"], base_stats["throughput_per_sec"]
+            p95_change = (p95 - base_p95) / base_p95 if base_p95 else 0.0
+            throughput_change = (throughput - base_throughput) / base_throughput if base_throughput else 0.0
+            print(
+                f"  {entry['corpus_chunks']:>7} {stage:<17} "
+                f"p95 {base_p95:>9.2f} → {p95:>9.2f} ms ({p95_change:+.1%})  "
+                f"throughput {base_throughput:>9.1f} → {throughput:>9.1f}/s ({throughput_change:+.1%})"
+            )
+            if p95_change > max_regression or -throughput_change > max_regression:
+                regressions.append({
+                    "corpus_chunks": entry["corpus_chunks"],
+                    "stage": stage,
+                    "p95_change": round(p95_change, 4),
+                    "throughput_change": round(throughput_change, 4),
+                })
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline RAG pipeline benchmark with fake providers")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="말뭉치 청크 수 (쉼표로 구분)")
+    parser.add_argument("--queries", type=int, default=200, help="검색/답변 생성 질문 수")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--search-type", default="similarity")
+    parser.add_argument("--pdf-pages", type=int, default=2000, help="실제 PDF로 만들어 파싱할 최대 페이지 수")
+    parser.add_argument("--pages-per-pdf", type=int, default=50, help="PDF 한 개(업로드 한 번)당 페이지 수")
+    parser.add_argument("--chunk-chars", type=int, default=900)
+    parser.add_argument("--dimension", type=int, default=768, help="가짜 임베딩 차원")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0, help="임베딩 API 호출당 지연")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="LLM 호출당 지연")
+    parser.add_argument("--index-type", default="flat", choices=["flat", "hnsw", "ivf"],
+                        help="모든 크기에 고정할 FAISS 인덱스 종류 (auto 전환 없음)")
+    parser.add_argument("--wal-compact-bytes", type=int, default=1 << 40,
+                        help="WAL compaction 임계값 (기본값은 측정 중 compaction이 일어나지 않는 크기)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json", help="결과 JSON 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="허용 회귀 비율 (넘으면 종료 코드 1)")
+    parser.add_argument("--verbose", action="store_true", help="서비스 로그 출력")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    results = []
+    for chunk_count in sizes:
+        print(f"▶ 청크 {chunk_count}개 벤치마크 중...")
+        with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+            entry = benchmark_size(chunk_count, args, workdir)
+        results.append(entry)
+        for stage, stats in entry["stages"].items():
+            latency = stats["latency_ms"]
+            print(
+                f"  {stage:<17} {stats['throughput_per_sec']:>10.1f} items/s  "
+                f"p50 {latency['p50']:>9.2f}  p95 {latency['p95']:>9.2f}  p99 {latency['p99']:>9.2f} ms  "
+                f"peak RSS {stats['peak_rss_mb']:>8.1f} MB"
+            )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 결과 저장: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("📊 기준 결과 대비:")
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ 허용 범위({args.max_regression:.0%})를 넘는 회귀: {regressions}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
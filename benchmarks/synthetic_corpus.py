@@ -0,0 +1,79 @@
+import random
+
+
+class SyntheticCorpus:
+    """
+    결정적 합성 말뭉치. 청크마다 하나의 주제를 가지며 주제 고유 단어와 공통 단어를 섞어 만든다.
+    질문은 주제 단어로 만들어 검색 결과가 실제로 해당 주제 청크를 찾도록 한다.
+    (PDF 기본 폰트로 쓸 수 있도록 ASCII만 사용)
+    """
+
+    def __init__(self, seed=42, vocabulary_size=5000, topic_count=200, topic_words=30, chunk_chars=900):
+        self.random = random.Random(seed)
+        self.chunk_chars = chunk_chars
+        self.vocabulary = [self._word() for _ in range(vocabulary_size)]
+        self.topics = [self.random.sample(self.vocabulary, topic_words) for _ in range(topic_count)]
+
+    def _word(self):
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        return "".join(self.random.choice(letters) for _ in range(self.random.randint(3, 9)))
+
+    def chunk(self, index):
+        """index번째 청크 텍스트 (같은 seed면 항상 같은 결과)"""
+        rng = random.Random(index * 7919 + 1)
+        topic = self.topics[index % len(self.topics)]
+        words = [f"doc{index}"]
+        length = len(words[0])
+        while length < self.chunk_chars:
+            word = rng.choice(topic) if rng.random() < 0.6 else rng.choice(self.vocabulary)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)[:self.chunk_chars]
+
+    def query(self, index):
+        """index번째 질문 (주제 단어 5개)"""
+        rng = random.Random(index * 104729 + 3)
+        topic = self.topics[index % len(self.topics)]
+        return " ".join(rng.sample(topic, 5)) + "?"
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, line_chars=90):
+    """
+    외부 라이브러리 없이 텍스트 PDF 작성 (페이지당 문자열 하나, Helvetica).
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages: 페이지 객체 번호가 정해진 뒤 채움
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_numbers = []
+    for text in pages:
+        lines = [text[i:i + line_chars] for i in range(0, len(text), line_chars)] or [""]
+        stream = "BT /F1 9 Tf 11 TL 40 760 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number
+        )
+        page_numbers.append(len(objects))
+    kids = " ".join(f"{number} 0 R" for number in page_numbers)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>".encode("ascii")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(output)
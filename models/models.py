@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from datetime import datetime
+import sqlalchemy as sa
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
@@ -28,6 +29,17 @@ class FileMetadata(db.Model):
     type = db.Column(db.String(10), nullable=False)
     upload_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True)  # 파일 내용 SHA-256 (중복 업로드 판별)
+    collection = db.Column(db.String(64), nullable=True)  # 저장된 벡터 컬렉션 (None이면 기본 컬렉션)
+
+    # list_files 정렬 기준별 keyset 페이지네이션용 (정렬 컬럼, id) 인덱스
+    __table_args__ = (
+        db.Index('ix_files_name_id', 'name', 'id'),
+        db.Index('ix_files_size_id', 'size', 'id'),
+        db.Index('ix_files_type_id', 'type', 'id'),
+        db.Index('ix_files_upload_date_id', 'upload_date', 'id'),
+        db.Index('ix_files_content_hash_collection', 'content_hash', 'collection'),
+    )
 
 
 class Log(db.Model):
@@ -51,6 +63,11 @@ class ChatHistory(db.Model):
     answer = db.Column(db.Text, nullable=False)  # AI 응답
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)  # 시간
 
+    # 사용자별 최신순 조회 (keyset 페이지네이션, 대화 내역 복원)
+    __table_args__ = (
+        db.Index('ix_chat_history_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+    )
+
     def __repr__(self):
         return f"<ChatHistory {self.user_id} - {self.question[:20]}...>"
     
@@ -67,4 +84,53 @@ class LLMPrompt(db.Model):
     is_active = db.Column(db.Boolean, default=False)
 
     def __repr__(self):
-        return f"<LLMPrompt {self.prompt_name}>"
\ No newline at end of file
+        return f"<LLMPrompt {self.prompt_name}>"
+
+class IngestionJob(db.Model):
+    __tablename__ = "ingestion_jobs"
+
+    id = db.Column(db.String(36), primary_key=True)  # job UUID
+    kind = db.Column(db.String(20), nullable=False)  # file / pdf / url
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)  # queued / running / succeeded / failed
+    stage = db.Column(db.String(30), nullable=True)  # parsing / splitting / embedding / saving
+    pages_parsed = db.Column(db.Integer, nullable=False, default=0)
+    chunks_total = db.Column(db.Integer, nullable=False, default=0)
+    chunks_embedded = db.Column(db.Integer, nullable=False, default=0)
+    payload = db.Column(db.Text, nullable=False)  # 작업 입력 (JSON)
+    result = db.Column(db.Text, nullable=True)  # 작업 결과 (JSON)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<IngestionJob {self.id} {self.kind} {self.status}>"
+
+
+def ensure_columns():
+    """
+    모델에 새로 추가된 nullable 컬럼 중 기존 테이블에 없는 것을 ALTER TABLE로 추가 (app context 필요).
+    db.create_all()은 이미 있는 테이블을 변경하지 않으므로 기존 DB에도 적용되도록 한다.
+    """
+    inspector = sa.inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(sa.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"🛠️ 컬럼 추가: {table.name}.{column.name}")
+
+
+def ensure_indexes():
+    """
+    모델에 선언된 인덱스 중 DB에 없는 것을 생성 (app context 필요).
+    db.create_all()은 이미 있는 테이블에 새 인덱스를 추가하지 않으므로 기존 DB에도 적용되도록 한다.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
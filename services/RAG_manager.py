@@ -44,12 +44,13 @@ class RAGManager:
         except Exception as e:
             print(f"Failed to fetch document from URL '{url}': {e}")
 
-    def query(self, query, retriever_type="similarity", k=5, similarity_threshold=0.7):
+    def query(self, query, retriever_type="similarity", k=5, similarity_threshold=0.7, collections=None):
         """
         Execute the RAG pipeline: retrieve documents and generate an answer.
         """
         context = self.retriever_manager.retrieve_context(
-            question=query, k=k, search_type=retriever_type, similarity_threshold=similarity_threshold
+            question=query, k=k, search_type=retriever_type, similarity_threshold=similarity_threshold,
+            collections=collections
         )
 
         if not context or context["context"] == "주어진 정보에서 질문에 대한 정보를 찾을 수 없습니다.":
@@ -1,14 +1,21 @@
-from langchain_google_genai import GoogleGenerativeAI
+import threading
+
 from langchain.prompts import PromptTemplate
+from services.chat_generator import build_llm
 
 ## chat_generator에 통합 가능
 
 class AnswerGenerator:
-    def __init__(self, model="models/gemini-1.5-flash", temperature=0.7):
+    def __init__(self, model="models/gemini-1.5-flash", temperature=0.7, openai_api_key=None, google_api_key=None):
         """
-        Google Generative AI 설정
+        LLM 설정 (클라이언트는 첫 호출 시 설정된 API 키에 맞게 생성, build_llm 참고)
         """
-        self.llm = GoogleGenerativeAI(model=model, temperature=temperature)
+        self._llm = None
+        self._llm_options = {
+            "openai_api_key": openai_api_key, "google_api_key": google_api_key,
+            "model": model, "temperature": temperature
+        }
+        self._llm_lock = threading.Lock()
         self.prompt_template = PromptTemplate.from_template(
             """You are a helpful assistant that provides answers based on the given documents.
             Here are the documents:
@@ -17,6 +24,14 @@ class AnswerGenerator:
             Answer:"""
         )
 
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = build_llm(**self._llm_options)
+        return self._llm
+
     def generate_answer(self, question, documents):
         """
         질문과 문서 데이터를 기반으로 응답 생성.
@@ -0,0 +1,114 @@
+"""
+인증 처리용 프로세스 내 캐시.
+토큰 폐기 여부(jti 기준), 사용자 조회, 관리자 역할 조회 결과를 보관하여
+인증된 요청마다 발생하던 DB 조회를 캐시 미스 때만 하도록 한다.
+"""
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from services.lru_cache import LRUTTLCache
+from services.metrics import registry, cache_collector
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """요청 간에 공유해도 안전한 사용자 스냅샷 (세션에서 분리된 ORM 객체 대신 사용)"""
+    id: int
+    username: str
+    created_at: datetime = None
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(id=user.id, username=user.username, created_at=user.created_at)
+
+
+class AuthCache:
+    def __init__(self, user_ttl=60, role_ttl=60, revocation_check_ttl=30, max_users=10000, max_tokens=100000):
+        """
+        :param user_ttl: 사용자 조회 결과 보관 시간 (초)
+        :param role_ttl: 역할 조회 결과 보관 시간 (초)
+        :param revocation_check_ttl: "폐기되지 않음" 결과 보관 시간 (초).
+            다른 프로세스에서 로그아웃한 토큰은 최대 이 시간 동안 유효하게 보일 수 있다.
+            폐기된 토큰은 만료 시각까지 보관한다.
+        """
+        self.revocation_check_ttl = revocation_check_ttl
+        self.revocations = LRUTTLCache(max_size=max_tokens, ttl_seconds=revocation_check_ttl)
+        self.users = LRUTTLCache(max_size=max_users, ttl_seconds=user_ttl)
+        self.roles = LRUTTLCache(max_size=max_users, ttl_seconds=role_ttl)
+
+    @staticmethod
+    def _remaining(exp):
+        """토큰 만료까지 남은 시간 (exp가 없으면 None)"""
+        if exp is None:
+            return None
+        return max(0.0, float(exp) - time.time())
+
+    def is_revoked(self, jti, exp, loader):
+        """
+        토큰 폐기 여부. 캐시에 없으면 loader()로 DB를 조회한다.
+        :param jti: 토큰 ID (JWT jti 클레임)
+        :param exp: 토큰 만료 시각 (epoch 초)
+        """
+        revoked = self.revocations.get(jti)
+        if revoked is not None:
+            return revoked
+        revoked = bool(loader())
+        remaining = self._remaining(exp)
+        if revoked:
+            ttl = remaining if remaining is not None else self.revocations.ttl_seconds
+        else:
+            ttl = self.revocation_check_ttl if remaining is None else min(self.revocation_check_ttl, remaining)
+        self.revocations.set(jti, revoked, ttl_seconds=ttl)
+        return revoked
+
+    def revoke(self, jti, exp):
+        """로그아웃 등으로 폐기된 토큰을 만료 시각까지 폐기 상태로 기록"""
+        remaining = self._remaining(exp)
+        self.revocations.set(jti, True, ttl_seconds=remaining if remaining is not None else None)
+
+    def get_user(self, user_id, loader):
+        """사용자 스냅샷 (없는 사용자면 None, 결과는 캐시하지 않음)"""
+        user = self.users.get(user_id)
+        if user is not None:
+            return user
+        model = loader()
+        if model is None:
+            return None
+        user = CachedUser.from_model(model)
+        self.users.set(user_id, user)
+        return user
+
+    def invalidate_user(self, user_id):
+        self.users.pop(user_id)
+
+    def get_role(self, username, loader):
+        """사용자 역할 (역할이 없으면 빈 문자열)"""
+        role = self.roles.get(username)
+        if role is None:
+            role = loader() or ""
+            self.roles.set(username, role)
+        return role
+
+    def invalidate_role(self, username):
+        self.roles.pop(username)
+
+    def stats(self):
+        return {
+            "revocations": self.revocations.stats(),
+            "users": self.users.stats(),
+            "roles": self.roles.stats(),
+        }
+
+
+auth_cache = AuthCache(
+    user_ttl=int(os.getenv("AUTH_USER_CACHE_TTL", "60")),
+    role_ttl=int(os.getenv("AUTH_ROLE_CACHE_TTL", "60")),
+    revocation_check_ttl=int(os.getenv("AUTH_REVOCATION_CHECK_TTL", "30"))
+)
+registry.add_collector(cache_collector({
+    "auth_revocation": auth_cache.revocations,
+    "auth_user": auth_cache.users,
+    "auth_role": auth_cache.roles,
+}))
@@ -0,0 +1,190 @@
+import heapq
+import math
+import os
+import pickle
+import re
+import unicodedata
+from collections import Counter
+from operator import itemgetter
+
+
+# 한글 연속 구간과 그 외 문자(라틴/숫자, 코드 구분자 포함) 구간을 나눠서 추출
+_WORD_RE = re.compile(r"[가-힣]+|[^\W가-힣]+(?:[-./][^\W가-힣]+)*")
+_SEPARATOR_RE = re.compile(r"[-./_]")
+
+
+def fold_diacritics(word):
+    """베트남어 성조/발음 부호 제거 (부호 없이 입력한 질문도 매칭되도록)"""
+    decomposed = unicodedata.normalize("NFD", word.replace("đ", "d"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    """
+    BM25용 토큰화.
+    - 한국어: 어절 + 음절 bigram (조사/어미가 붙어도 "삼성전자의" ↔ "삼성전자" 매칭)
+    - 베트남어 등 라틴 문자: 음절 + 부호 제거형 + 인접 음절 bigram ("hà nội" → "hà_nội")
+    - 제품 코드: "AB-123" 전체와 구성 요소 모두 포함
+    """
+    text = unicodedata.normalize("NFC", text).lower()
+    tokens = []
+    previous = None
+    for word in _WORD_RE.findall(text):
+        tokens.append(word)
+        parts = [part for part in _SEPARATOR_RE.split(word) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+        if "가" <= word[0] <= "힣":
+            if len(word) > 2:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+            previous = None
+            continue
+        folded = fold_diacritics(word)
+        if folded != word:
+            tokens.append(folded)
+        if previous is not None:
+            tokens.append(f"{previous}_{word}")
+        previous = word
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    여러 순위 리스트(ID 리스트)를 RRF로 합침: score = Σ 1 / (k + rank)
+    :return: [(ID, 점수)] 점수 순
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=itemgetter(1), reverse=True)
+
+
+def fuse_hits(vector_hits, lexical_hits, limit, k=60):
+    """
+    벡터/BM25 검색 결과 [(키, Document, 벡터, 점수)]를 RRF로 합침.
+    :return: [(Document, 벡터, RRF 점수)] 점수 순 상위 limit개
+    """
+    found = {}
+    for key, doc, vector, _ in vector_hits + lexical_hits:
+        found.setdefault(key, (doc, vector))
+    fused = reciprocal_rank_fusion(
+        [[hit[0] for hit in vector_hits], [hit[0] for hit in lexical_hits]], k=k
+    )[:limit]
+    return [(found[key][0], found[key][1], score) for key, score in fused]
+
+
+class BM25Index:
+    """
+    청크 본문에 대한 BM25 역색인. 청크 추가/삭제 시 해당 청크의 posting만 갱신한다.
+    (VectorDBManager의 락 안에서만 변경/조회)
+    - posting에는 tf와 문서 길이 정규화를 미리 반영한 가중치를 저장하여 검색 시 idf만 곱한다.
+      평균 문서 길이가 reweight_drift 이상 바뀌면 전체 가중치를 다시 계산한다.
+    - 질문 term 중 posting이 max_postings보다 긴 흔한 term(조사 bigram 등)은 idf가 낮으므로,
+      더 드문 term이 있으면 건너뛰어 검색 시간을 posting 길이에 묶어둔다.
+    """
+
+    FILE_NAME = "bm25_index.pkl"
+
+    def __init__(self, k1=1.5, b=0.75, max_postings=5000, reweight_drift=0.1):
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings
+        self.reweight_drift = reweight_drift
+        self._postings = {}     # term → {청크 ID: 가중치}
+        self._doc_terms = {}    # 청크 ID → {term: tf}
+        self._doc_lengths = {}  # 청크 ID → 토큰 수
+        self._total_length = 0
+        self._weighted_average = None  # 가중치 계산에 사용한 평균 문서 길이
+
+    def _weight(self, tf, length, average_length):
+        norm = self.k1 * (1 - self.b + self.b * length / average_length)
+        return tf * (self.k1 + 1) / (tf + norm)
+
+    def _average_length(self):
+        return self._total_length / len(self._doc_lengths) if self._doc_lengths else 1.0
+
+    def _reweight_if_drifted(self):
+        average_length = self._average_length()
+        if self._weighted_average and abs(average_length - self._weighted_average) <= self.reweight_drift * self._weighted_average:
+            return
+        for doc_id, counts in self._doc_terms.items():
+            length = self._doc_lengths[doc_id]
+            for term, tf in counts.items():
+                self._postings[term][doc_id] = self._weight(tf, length, average_length)
+        self._weighted_average = average_length
+
+    def add(self, ids, token_lists):
+        """청크 추가 (토큰화는 락 밖에서 tokenize()로 미리 수행)"""
+        for doc_id, tokens in zip(ids, token_lists):
+            if doc_id in self._doc_lengths:
+                continue
+            counts = dict(Counter(tokens))
+            self._doc_terms[doc_id] = counts
+            self._doc_lengths[doc_id] = len(tokens)
+            self._total_length += len(tokens)
+            average_length = self._weighted_average or self._average_length()
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = self._weight(tf, len(tokens), average_length)
+        self._reweight_if_drifted()
+
+    def remove(self, ids):
+        for doc_id in ids:
+            counts = self._doc_terms.pop(doc_id, None)
+            if counts is None:
+                continue
+            for term in counts:
+                posting = self._postings[term]
+                del posting[doc_id]
+                if not posting:
+                    del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(doc_id)
+        self._reweight_if_drifted()
+
+    def search(self, query, k):
+        """:return: [(청크 ID, BM25 점수)] 점수 순 상위 k개"""
+        doc_count = len(self._doc_lengths)
+        postings = [self._postings[term] for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+        if not doc_count or not postings:
+            return []
+        selective = [posting for posting in postings if len(posting) <= self.max_postings]
+        if not selective:
+            selective = sorted(postings, key=len)[:1]
+
+        scores = {}
+        get = scores.get
+        for posting in selective:
+            df = len(posting)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for doc_id, weight in posting.items():
+                scores[doc_id] = get(doc_id, 0.0) + idf * weight
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    @classmethod
+    def from_docstore(cls, docs_by_id):
+        """docstore 본문으로 인덱스 생성 (저장된 인덱스가 없을 때)"""
+        index = cls()
+        items = [(doc_id, doc) for doc_id, doc in docs_by_id.items() if doc is not None]
+        index.add([doc_id for doc_id, _ in items], [tokenize(doc.page_content) for _, doc in items])
+        return index
+
+    def dumps(self):
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def write(cls, directory, data):
+        """dumps() 결과를 스냅샷 디렉터리에 저장"""
+        with open(os.path.join(directory, cls.FILE_NAME), "wb") as f:
+            f.write(data)
+
+    @classmethod
+    def load(cls, directory):
+        """스냅샷 디렉터리에 저장된 인덱스 로드 (없으면 None)"""
+        path = os.path.join(directory, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
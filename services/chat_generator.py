@@ -1,45 +1,89 @@
-from flask import current_app
+import os
+import threading
+import time
+
 from langchain.schema import AIMessage, HumanMessage, BaseMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_google_genai import GoogleGenerativeAI
+from langchain_openai import OpenAI
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from models.models import LLMPrompt, db  # LLMPrompt 모델 가져오기
+from services.prompt_cache import ActivePromptCache
+from services.session_memory import SessionMemory
+from services.metrics import STAGE_SECONDS
+
+
+def build_llm(openai_api_key=None, google_api_key=None, model="models/gemini-1.5-flash", temperature=0.7):
+    """설정된 API 키에 맞는 LLM 클라이언트 생성 (임베딩 모델과 같은 우선순위: Google, OpenAI)"""
+    if openai_api_key is None and google_api_key is None:
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        google_api_key = os.getenv("GOOGLE_API_KEY")
+    if google_api_key:
+        return GoogleGenerativeAI(model=model, temperature=temperature, google_api_key=google_api_key)
+    if openai_api_key:
+        return OpenAI(openai_api_key=openai_api_key, temperature=temperature)
+    raise ValueError("Either google_api_key or openai_api_key must be provided.")
+
 
 class ChatGenerator:
-    def __init__(self, vector_db_manager):
+    def __init__(self, vector_db_manager, prompt_cache=None, session_memory=None, llm=None,
+                 openai_api_key=None, google_api_key=None):
+        """
+        프로세스 당 한 번 생성하여 재사용 (LLM 클라이언트 재생성 비용 제거).
+        활성 프롬프트는 prompt_cache에서 가져오며 변경 시에만 템플릿을 다시 만든다.
+        llm을 지정하지 않으면 첫 호출 시 설정된 API 키에 맞는 LLM을 만든다 (build_llm).
+        """
         self.vector_db_manager = vector_db_manager
-        self.llm = GoogleGenerativeAI(model="models/gemini-1.5-flash", temperature=0.7)
-        self.message_history_store = {}
-
-        # 활성화된 프롬프트 가져오기 및 설정
-        with current_app.app_context():
-            self.prompt_instruction = self.get_prompt_instruction()
-        # 프롬프트 내용 출력
-        # print(f"🔎 현재 프롬프트 내용:\n{self.prompt_instruction}\n")
-        self.set_prompt_template()
-
-        # `RunnableWithMessageHistory` 초기화
-        self.rag_with_history = RunnableWithMessageHistory(
-            runnable=self.llm,
-            get_session_history=self.get_session_history,
-            input_messages_key="chat_history",
-            history_messages_key="history"
-        )
+        self._llm = llm
+        self._rag_with_history = None
+        self._api_keys = {"openai_api_key": openai_api_key, "google_api_key": google_api_key}
+        self._llm_lock = threading.Lock()
+        # 사용자별 대화 내역 (LRU/TTL, DB 복원, 토큰 예산 윈도우)
+        self.session_memory = session_memory or SessionMemory()
+        self.prompt_cache = prompt_cache or ActivePromptCache()
+        self.prompt_instruction = None
+        self.prompt = None
+
+    @property
+    def llm(self):
+        """LLM 클라이언트 (처음 사용할 때 한 번만 생성)"""
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = build_llm(**self._api_keys)
+        return self._llm
+
+    @property
+    def rag_with_history(self):
+        """`RunnableWithMessageHistory` (LLM과 함께 처음 사용할 때 생성)"""
+        if self._rag_with_history is None:
+            llm = self.llm
+            with self._llm_lock:
+                if self._rag_with_history is None:
+                    self._rag_with_history = RunnableWithMessageHistory(
+                        runnable=llm,
+                        get_session_history=self.get_session_history,
+                        input_messages_key="chat_history",
+                        history_messages_key="history"
+                    )
+        return self._rag_with_history
 
     def get_prompt_instruction(self):
-        """DB에서 활성화된 프롬프트 설명 부분 가져오기"""
-        active_prompt = LLMPrompt.query.filter_by(is_active=True).first()
-        if active_prompt:
-            print(f"✅ 활성화된 프롬프트 로드됨: {active_prompt.prompt_name}")
-            return active_prompt.prompt_text  # 설명 부분만 반환
-        else:
-            print("❌ 활성화된 프롬프트가 없습니다. 기본 프롬프트를 사용합니다.")
-            return "You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If you don't know the answer, just say that you don't know. Answer in Korean."
-
-    def set_prompt_template(self):
+        """활성화된 프롬프트 설명 부분 가져오기 (캐시 사용, app context 필요)"""
+        return self.prompt_cache.get()
+
+    def refresh_prompt(self):
+        """활성 프롬프트가 바뀐 경우에만 프롬프트 템플릿 재생성"""
+        prompt_instruction = self.get_prompt_instruction()
+        if prompt_instruction != self.prompt_instruction or self.prompt is None:
+            self.set_prompt_template(prompt_instruction)
+        return self.prompt
+
+    def set_prompt_template(self, prompt_instruction=None):
         """프롬프트 템플릿 설정"""
+        if prompt_instruction is not None:
+            self.prompt_instruction = prompt_instruction
         self.prompt = PromptTemplate.from_template(
             f"""{self.prompt_instruction}
 
@@ -73,33 +117,25 @@ class ChatGenerator:
         return query_body
 
     def get_session_history(self, user_id: str) -> ChatMessageHistory:
-        if user_id not in self.message_history_store:
-            self.message_history_store[user_id] = ChatMessageHistory()
-        return self.message_history_store[user_id]
+        return self.session_memory.get_history(user_id)
 
     def add_user_message(self, user_id: str, content: str):
-        chat_history = self.get_session_history(user_id)
-        chat_history.add_message(HumanMessage(content=content))
+        self.session_memory.add_message(user_id, HumanMessage(content=content))
 
     def add_ai_message(self, user_id: str, content: str):
-        chat_history = self.get_session_history(user_id)
-        chat_history.add_message(AIMessage(content=content))
-
-    def generate_answer(self, user_id, question, context):
-
-        """질문과 문맥을 기반으로 LLM을 호출하여 답변 생성"""
-        # context 구조에서 본문과 참조 정보를 분리
-        context_text = context.get("context", "문맥 정보가 제공되지 않았습니다.")
-        references = context.get("references", [])
+        self.session_memory.add_message(user_id, AIMessage(content=content))
 
+    def _build_input_messages(self, user_id, question, context_text):
+        """사용자 메시지를 기록하고 LLM에 보낼 메시지 리스트 생성"""
         # 사용자 질문 메시지 추가
         self.add_user_message(user_id, question)
 
-        # 대화 내역 가져오기
-        chat_history = self.get_session_history(user_id).messages
+        # 대화 내역 가져오기 (토큰 예산 안의 최근 메시지만)
+        with STAGE_SECONDS.time(stage="history_lookup"):
+            chat_history = self.session_memory.window(self.get_session_history(user_id).messages)
         # chat_history = "\n".join([message.content for message in self.get_session_history(user_id).messages])
         # 프롬프트 템플릿에 데이터를 삽입하여 완성된 프롬프트 생성
-        formatted_prompt = self.prompt.format(
+        formatted_prompt = self.refresh_prompt().format(
             chat_history=chat_history,
             question=question,
             context=context_text
@@ -109,17 +145,33 @@ class ChatGenerator:
         print(f"📝 최종 프롬프트:\n{formatted_prompt}")
 
         # LLM 호출 메시지 리스트 생성
-        input_messages = chat_history + [HumanMessage(content=f"질문: {question}\n문맥: {context_text}")]
+        return chat_history + [HumanMessage(content=f"질문: {question}\n문맥: {context_text}")]
+
+    @staticmethod
+    def format_references(references):
+        """참조 문서 정보를 답변 끝에 붙일 텍스트로 변환"""
+        if not references:
+            return ""
+        reference_texts = "\n".join([f"- {ref['title']} ({ref['url']})" for ref in references])
+        return f"\n\n참고 자료:\n{reference_texts}"
+
+    def generate_answer(self, user_id, question, context):
+
+        """질문과 문맥을 기반으로 LLM을 호출하여 답변 생성"""
+        # context 구조에서 본문과 참조 정보를 분리
+        context_text = context.get("context", "문맥 정보가 제공되지 않았습니다.")
+        references = context.get("references", [])
+
+        input_messages = self._build_input_messages(user_id, question, context_text)
 
         try:
             # LLM 호출 및 응답 생성
-            response = self.llm.invoke(input_messages)
+            with STAGE_SECONDS.time(stage="llm"):
+                response = self.llm.invoke(input_messages)
             answer = response.content if isinstance(response, AIMessage) else response
 
             # 참조 문서 정보를 답변에 추가
-            if references:
-                reference_texts = "\n".join([f"- {ref['title']} ({ref['url']})" for ref in references])
-                answer += f"\n\n참고 자료:\n{reference_texts}"
+            answer += self.format_references(references)
 
             # AI 응답 메시지 추가
             self.add_ai_message(user_id, answer)
@@ -127,3 +179,28 @@ class ChatGenerator:
         except Exception as e:
             print(f"❌ LLM 호출 오류: {e}")
             return "답변을 생성하는 중 오류가 발생했습니다."
+
+    def stream_answer(self, user_id, question, context):
+        """
+        generate_answer의 스트리밍 버전. LLM이 생성하는 토큰 조각을 바로 yield 한다.
+        스트림이 끝나면 참조 문서를 붙인 전체 답변을 대화 내역에 추가한다.
+        """
+        context_text = context.get("context", "문맥 정보가 제공되지 않았습니다.")
+        references = context.get("references", [])
+
+        input_messages = self._build_input_messages(user_id, question, context_text)
+
+        parts = []
+        # 스트리밍은 첫 토큰까지의 시간과 전체 생성 시간을 따로 기록
+        started = time.perf_counter()
+        for chunk in self.llm.stream(input_messages):
+            text = chunk.content if isinstance(chunk, AIMessage) else chunk
+            if text:
+                if not parts:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                parts.append(text)
+                yield text
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm")
+
+        answer = "".join(parts) + self.format_references(references)
+        self.add_ai_message(user_id, answer)
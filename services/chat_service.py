@@ -1,34 +1,51 @@
 from datetime import datetime
 import uuid
 from models.models import ChatHistory, db
+from services.metrics import STAGE_SECONDS
+from services.pagination import keyset_page
+from services.write_behind import write_behind
 
 ## 사용 시 기존 로직에 통합 필요
 
 class ChatService:
     @staticmethod
     def save_chat(user_id, question, answer, conversation_id=None):
-        """사용자의 채팅 기록을 DB에 저장"""
-        try:
-            # conversation_id가 없으면 생성
-            if conversation_id is None:
-                conversation_id = str(uuid.uuid4())  # 고유 ID 생성
+        """
+        사용자의 채팅 기록 저장 예약.
+        write_behind 버퍼가 백그라운드에서 모아서 저장하므로 요청은 DB commit을 기다리지 않는다.
+        """
+        # conversation_id가 없으면 생성
+        if conversation_id is None:
+            conversation_id = str(uuid.uuid4())  # 고유 ID 생성
 
-            new_chat = ChatHistory(
+        with STAGE_SECONDS.time(stage="save_chat"):
+            write_behind.add(
+                ChatHistory,
                 user_id=user_id,
                 question=question,
                 answer=answer,
-                conversation_id=conversation_id,  # 추가
+                conversation_id=conversation_id,
                 timestamp=datetime.utcnow()
             )
-            db.session.add(new_chat)
-            db.session.commit()
-        except Exception as e:
-            print(f"❌ Error saving chat: {e}")
-            db.session.rollback()
-            raise e
 
 
     @staticmethod
     def get_chat_history(user_id):
         """사용자의 채팅 기록을 가져옴"""
-        return ChatHistory.query.filter_by(user_id=user_id).order_by(ChatHistory.timestamp.desc()).all()
+        return ChatHistory.query.filter_by(user_id=user_id).order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).all()
+
+    @staticmethod
+    def get_chat_history_page(user_id, limit, cursor=None, summary=False):
+        """
+        최신순 채팅 기록 한 페이지 (user_id, timestamp, id 인덱스 사용).
+        summary=True이면 답변 본문 없이 id/대화 ID/질문/시간만 조회한다.
+        :return: (행 리스트, 다음 페이지 커서 또는 None)
+        """
+        columns = None
+        if summary:
+            columns = (ChatHistory.id, ChatHistory.conversation_id, ChatHistory.question, ChatHistory.timestamp)
+        return keyset_page(
+            ChatHistory.query.filter_by(user_id=user_id),
+            ChatHistory.timestamp, ChatHistory.id, limit,
+            cursor=cursor, descending=True, columns=columns
+        )
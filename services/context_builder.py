@@ -0,0 +1,110 @@
+import hashlib
+
+import numpy as np
+
+from services.token_counter import count_tokens
+
+
+class ContextBuilder:
+    """
+    검색 후보 청크로 LLM 컨텍스트를 구성.
+    1. 완전히 같은 청크와 벡터가 거의 같은 청크(재업로드 등) 제거
+    2. FAISS에 저장된 벡터로 MMR(maximal marginal relevance)을 적용해 다양한 청크 선택
+    3. 같은 문서의 인접 청크가 겹치는(chunk_overlap) 부분 제거
+    4. token_budget 안에 들어가는 만큼만 포함
+    """
+
+    def __init__(self, token_budget=1500, lambda_mult=0.7, duplicate_threshold=0.97, max_overlap_chars=200):
+        self.token_budget = token_budget
+        self.lambda_mult = lambda_mult
+        self.duplicate_threshold = duplicate_threshold
+        self.max_overlap_chars = max_overlap_chars
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _remove_duplicates(self, candidates):
+        """텍스트 해시가 같거나 코사인 유사도가 duplicate_threshold 이상인 후보 제거 (앞쪽 우선)"""
+        seen_hashes = set()
+        kept = []
+        kept_vectors = []
+        for doc, vector, score in candidates:
+            text_hash = hashlib.sha256(" ".join(doc.page_content.split()).encode("utf-8")).hexdigest()
+            if text_hash in seen_hashes:
+                continue
+            unit = vector / (np.linalg.norm(vector) or 1.0)
+            if kept_vectors and float(np.max(np.stack(kept_vectors) @ unit)) >= self.duplicate_threshold:
+                continue
+            seen_hashes.add(text_hash)
+            kept.append((doc, vector, score))
+            kept_vectors.append(unit)
+        return kept
+
+    def _mmr_order(self, query_vector, candidates, k, use_scores=False):
+        """
+        MMR로 후보 k개를 선택한 순서 (인덱스 리스트).
+        use_scores이면 질문 벡터와의 유사도 대신 후보 점수(최댓값 기준 정규화)를 관련도로 사용.
+        """
+        if not candidates:
+            return []
+        vectors = self._normalize(np.array([vector for _, vector, _ in candidates], dtype=np.float32))
+        if use_scores:
+            relevance = np.array([score for _, _, score in candidates], dtype=np.float32)
+            relevance = relevance / (relevance.max() or 1.0)
+        else:
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            relevance = vectors @ query
+
+        selected = [int(np.argmax(relevance))]
+        max_similarity = vectors @ vectors[selected[0]]
+        while len(selected) < min(k, len(candidates)):
+            scores = self.lambda_mult * relevance - (1 - self.lambda_mult) * max_similarity
+            scores[selected] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            max_similarity = np.maximum(max_similarity, vectors @ vectors[best])
+        return selected
+
+    def _trim_overlap(self, text, previous_texts):
+        """앞서 선택된 같은 문서 청크의 끝부분과 겹치는 시작 부분을 잘라냄"""
+        for previous in previous_texts:
+            tail = previous[-self.max_overlap_chars:]
+            for size in range(min(len(tail), len(text)), 20, -1):
+                if text.startswith(tail[-size:]):
+                    return text[size:].lstrip()
+        return text
+
+    def build(self, query_vector, candidates, k, use_scores=False):
+        """
+        :param candidates: (Document, 벡터, 관련도 점수) 리스트 (관련도 순)
+        :param use_scores: MMR 관련도로 후보 점수 사용 (hybrid 검색의 융합 점수 등)
+        :return: (선택된 (본문, Document) 리스트, 사용한 토큰 수)
+        """
+        candidates = self._remove_duplicates(candidates)
+        order = self._mmr_order(query_vector, candidates, k, use_scores=use_scores)
+
+        selected = []
+        used_tokens = 0
+        texts_by_title = {}
+        for index in order:
+            doc = candidates[index][0]
+            title = doc.metadata.get("title", "제목 없음")
+            url = doc.metadata.get("url", "URL 없음")
+            content = self._trim_overlap(doc.page_content, texts_by_title.get(title, []))
+            if not content:
+                continue
+            tokens = count_tokens(f"{content}\n출처: {title} ({url})")
+            if used_tokens + tokens > self.token_budget:
+                if selected:
+                    continue  # 더 작은 청크는 들어갈 수 있으므로 계속 확인
+                # 첫 청크가 예산보다 크면 예산에 맞게 잘라서라도 포함
+                content = content[:max(1, len(content) * self.token_budget // tokens)]
+                tokens = self.token_budget
+            selected.append((content, doc))
+            used_tokens += tokens
+            texts_by_title.setdefault(title, []).append(doc.page_content)
+        return selected, used_tokens
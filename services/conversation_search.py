@@ -0,0 +1,285 @@
+"""
+대화 전문 검색 인덱스.
+대화 메시지(JSON)에서 본문 텍스트만 뽑아 conversation_search 테이블에 저장하고 DB 종류에 맞는 인덱스를 사용한다.
+- PostgreSQL: 제목(A)/본문(B) 가중 tsvector GIN 인덱스 + pg_trgm 인덱스 (한국어 조사 등 부분 문자열 일치)
+- SQLite: FTS5 (bm25 순위, snippet 하이라이트). FTS5가 없는 빌드는 LIKE 검색으로 대체
+대화 생성/수정/삭제 시 같은 트랜잭션 안에서 upsert/delete를 호출해 동기화한다.
+"""
+import json
+import re
+import threading
+
+import sqlalchemy as sa
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+_POSTGRES_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS conversation_search (
+        conversation_id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL DEFAULT '',
+        content TEXT NOT NULL DEFAULT '',
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', content), 'B')
+        ) STORED
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_conversation_search_document ON conversation_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS ix_conversation_search_user ON conversation_search (user_id)",
+]
+# 확장 설치 권한이 없으면 trigram 인덱스 없이 동작 (ILIKE는 사용자 단위로만 스캔)
+_POSTGRES_TRIGRAM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_conversation_search_content_trgm ON conversation_search USING GIN (content gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_conversation_search_title_trgm ON conversation_search USING GIN (title gin_trgm_ops)",
+]
+# rowid = conversation_id 이므로 수정/삭제가 rowid 조회로 끝난다
+_SQLITE_FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS conversation_search USING fts5(
+        title, content, user_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+]
+_LIKE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS conversation_search (
+        conversation_id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL DEFAULT '',
+        content TEXT NOT NULL DEFAULT ''
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_conversation_search_user ON conversation_search (user_id)",
+]
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def extract_text(messages):
+    """대화 메시지(JSON 문자열 또는 리스트)에서 검색할 본문 텍스트만 추출"""
+    if isinstance(messages, str):
+        try:
+            messages = json.loads(messages)
+        except ValueError:
+            return messages
+    if not isinstance(messages, list):
+        return "" if messages is None else str(messages)
+
+    parts = []
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else message
+        if isinstance(content, list):
+            # [{"type": "text", "text": ...}] 형태의 멀티파트 메시지
+            content = " ".join(
+                part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+            )
+        if content:
+            parts.append(str(content))
+    return "\n".join(parts)
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _snippet(text, terms, width=80):
+    """LIKE 대체 검색용 스니펫: 첫 일치 위치 주변을 잘라 일치 부분을 강조"""
+    lowered = text.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [position for position in positions if position >= 0]
+    start = max(0, min(positions) - width // 2) if positions else 0
+    fragment = text[start:start + width]
+    for term in terms:
+        fragment = re.sub(
+            re.escape(term), lambda match: f"{HIGHLIGHT_START}{match.group(0)}{HIGHLIGHT_END}",
+            fragment, flags=re.IGNORECASE
+        )
+    return ("…" if start > 0 else "") + fragment + ("…" if start + width < len(text) else "")
+
+
+class ConversationSearchIndex:
+    """대화 제목/본문 전문 검색 (DB 종류별 백엔드 자동 선택, 첫 사용 시 스키마 생성)"""
+
+    def __init__(self, db, backfill=None):
+        """
+        :param db: Flask-SQLAlchemy 인스턴스
+        :param backfill: 인덱스를 처음 만들 때 기존 대화를 채우기 위한 함수.
+                         backfill(connection)은 그 연결에서 조회한 (conversation_id, user_id, title, messages) 행들을 반환한다.
+        """
+        self.db = db
+        self.backfill = backfill
+        self.backend = None
+        self.trigram = False
+        self._lock = threading.Lock()
+
+    def _execute(self, statement, params=None, connection=None):
+        executor = connection if connection is not None else self.db.session
+        return executor.execute(sa.text(statement), params or {})
+
+    def ensure_schema(self):
+        """
+        검색 테이블/인덱스 생성 (app context 필요). 새로 만든 경우 기존 대화로 채운다.
+        요청 세션의 트랜잭션과 섞이지 않도록 별도 연결에서 수행하며, 앱 시작 시 한 번 호출해 둔다.
+        """
+        if self.backend is not None:
+            return self.backend
+        with self._lock:
+            if self.backend is not None:
+                return self.backend
+            engine = self.db.engine
+            created = not sa.inspect(engine).has_table("conversation_search")
+
+            if engine.dialect.name == "postgresql":
+                backend = "postgres"
+                with engine.begin() as connection:
+                    for statement in _POSTGRES_SCHEMA:
+                        self._execute(statement, connection=connection)
+                try:
+                    with engine.begin() as connection:
+                        for statement in _POSTGRES_TRIGRAM:
+                            self._execute(statement, connection=connection)
+                    self.trigram = True
+                except Exception as e:
+                    print(f"⚠️ pg_trgm을 사용할 수 없어 tsvector 검색만 사용합니다: {e}")
+            else:
+                with engine.begin() as connection:
+                    backend = "fts5" if engine.dialect.name == "sqlite" and self._sqlite_has_fts5(connection) else "like"
+                    for statement in _SQLITE_FTS_SCHEMA if backend == "fts5" else _LIKE_SCHEMA:
+                        self._execute(statement, connection=connection)
+
+            if created and self.backfill is not None:
+                count = 0
+                with engine.begin() as connection:
+                    for conversation_id, user_id, title, messages in self.backfill(connection):
+                        self._upsert(backend, conversation_id, user_id, title, messages, connection=connection)
+                        count += 1
+                print(f"🔎 대화 검색 인덱스 생성 ({backend}): 기존 대화 {count}개 색인")
+            self.backend = backend
+        return self.backend
+
+    def _sqlite_has_fts5(self, connection):
+        try:
+            options = [row[0] for row in self._execute("PRAGMA compile_options", connection=connection)]
+            return "ENABLE_FTS5" in options
+        except Exception:
+            return False
+
+    def upsert(self, conversation_id, user_id, title, messages):
+        """대화 색인 추가/갱신 (호출한 쪽의 세션 트랜잭션에 포함되며 commit은 호출한 쪽에서)"""
+        self._upsert(self.ensure_schema(), conversation_id, user_id, title, messages)
+
+    def _upsert(self, backend, conversation_id, user_id, title, messages, connection=None):
+        params = {
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "title": title or "",
+            "content": extract_text(messages),
+        }
+        if backend == "fts5":
+            self._execute("DELETE FROM conversation_search WHERE rowid = :conversation_id", params, connection)
+            self._execute(
+                "INSERT INTO conversation_search (rowid, title, content, user_id) "
+                "VALUES (:conversation_id, :title, :content, :user_id)",
+                params, connection
+            )
+        elif backend == "postgres":
+            self._execute(
+                "INSERT INTO conversation_search (conversation_id, user_id, title, content) "
+                "VALUES (:conversation_id, :user_id, :title, :content) "
+                "ON CONFLICT (conversation_id) DO UPDATE SET "
+                "user_id = EXCLUDED.user_id, title = EXCLUDED.title, content = EXCLUDED.content",
+                params, connection
+            )
+        else:
+            self._execute("DELETE FROM conversation_search WHERE conversation_id = :conversation_id", params, connection)
+            self._execute(
+                "INSERT INTO conversation_search (conversation_id, user_id, title, content) "
+                "VALUES (:conversation_id, :user_id, :title, :content)",
+                params, connection
+            )
+
+    def delete(self, conversation_id):
+        """대화 색인 삭제 (commit은 호출한 쪽에서)"""
+        backend = self.ensure_schema()
+        key = "rowid" if backend == "fts5" else "conversation_id"
+        self._execute(f"DELETE FROM conversation_search WHERE {key} = :conversation_id", {"conversation_id": conversation_id})
+
+    def search(self, user_id, query, field="all", limit=20):
+        """
+        사용자 대화 검색.
+        :param field: "all" (제목 + 본문) 또는 "title"
+        :return: [{"id", "rank", "snippet"}] 관련도 순 (snippet의 일치 부분은 <mark>로 강조)
+        """
+        terms = _TERM_RE.findall(query)
+        if not terms:
+            return []
+        backend = self.ensure_schema()
+        if backend == "postgres":
+            rows = self._search_postgres(user_id, query, field, limit)
+        elif backend == "fts5":
+            rows = self._search_fts5(user_id, terms, field, limit)
+        else:
+            rows = self._search_like(user_id, terms, field, limit)
+        return [{"id": row[0], "rank": float(row[1]), "snippet": row[2]} for row in rows]
+
+    def _search_postgres(self, user_id, query, field, limit):
+        column = "title" if field == "title" else "content"
+        document = "to_tsvector('simple', s.title)" if field == "title" else "s.document"
+        substring = "s.title ILIKE :pattern" if field == "title" else "(s.title ILIKE :pattern OR s.content ILIKE :pattern)"
+        headline_options = f"StartSel={HIGHLIGHT_START},StopSel={HIGHLIGHT_END},MaxFragments=2,MaxWords=20,MinWords=5"
+        # 단어 일치(tsquery) 또는 부분 문자열 일치(trigram)인 행을 순위순으로
+        similarity = f"similarity(s.{column}, :query)" if self.trigram else "0"
+        return self._execute(
+            f"""SELECT s.conversation_id,
+                       ts_rank_cd({document}, q.query) + {similarity} AS rank,
+                       ts_headline('simple', s.{column}, q.query, :headline_options) AS snippet
+                FROM conversation_search s, websearch_to_tsquery('simple', :query) AS q(query)
+                WHERE s.user_id = :user_id
+                  AND ({document} @@ q.query OR {substring})
+                ORDER BY rank DESC, s.conversation_id DESC
+                LIMIT :limit""",
+            {
+                "user_id": user_id,
+                "query": query,
+                "pattern": f"%{_escape_like(query)}%",
+                "headline_options": headline_options,
+                "limit": limit,
+            }
+        ).fetchall()
+
+    def _search_fts5(self, user_id, terms, field, limit):
+        # 각 단어를 접두어 검색으로 (한국어 조사가 붙은 단어도 일치), 모든 단어 포함(AND)
+        match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+        if field == "title":
+            match = f"title : ({match})"
+        snippet_column = 0 if field == "title" else 1
+        return self._execute(
+            f"""SELECT rowid, -bm25(conversation_search, 10.0, 1.0) AS rank,
+                       snippet(conversation_search, {snippet_column}, :start, :end, '…', 16) AS snippet
+                FROM conversation_search
+                WHERE conversation_search MATCH :match AND user_id = :user_id
+                ORDER BY bm25(conversation_search, 10.0, 1.0), rowid DESC
+                LIMIT :limit""",
+            {"match": match, "user_id": user_id, "start": HIGHLIGHT_START, "end": HIGHLIGHT_END, "limit": limit}
+        ).fetchall()
+
+    def _search_like(self, user_id, terms, field, limit):
+        columns = ["title"] if field == "title" else ["title", "content"]
+        conditions = []
+        params = {"user_id": user_id, "limit": limit}
+        for i, term in enumerate(terms):
+            params[f"term{i}"] = f"%{_escape_like(term)}%"
+            conditions.append(
+                "(" + " OR ".join(f"{column} LIKE :term{i} ESCAPE '\\'" for column in columns) + ")"
+            )
+        rows = self._execute(
+            f"""SELECT conversation_id, title, content FROM conversation_search
+                WHERE user_id = :user_id AND {' AND '.join(conditions)}
+                ORDER BY conversation_id DESC
+                LIMIT :limit""",
+            params
+        ).fetchall()
+        results = []
+        for conversation_id, title, content in rows:
+            text = title if field == "title" else content
+            hits = sum(text.lower().count(term.lower()) for term in terms)
+            results.append((conversation_id, hits, _snippet(text, terms)))
+        results.sort(key=lambda row: row[1], reverse=True)
+        return results
@@ -2,22 +2,53 @@ from langchain_community.document_loaders import PDFPlumberLoader
 from langchain_community.vectorstores import FAISS
 from bs4 import SoupStrainer
 from langchain.schema import Document as LangChainDocument
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pytesseract
 from services.docs import Docs
 
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.document_loaders import UnstructuredWordDocumentLoader
-from bs4 import SoupStrainer
+from bs4 import BeautifulSoup, SoupStrainer
 from services.docs import Docs
+from services.web_crawler import WebCrawler
+from services.metrics import INGESTION_STAGE_SECONDS, INGESTION_ITEMS
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import os
 
+
+def _ocr_page(file_path, page_num, dpi, lang):
+    """
+    PDF 한 페이지만 래스터화하여 OCR 수행 (스레드 풀에서 실행).
+    래스터화(pdftoppm)와 OCR(tesseract)은 외부 프로세스에서 실행되므로 스레드로도 병렬 처리되며,
+    멀티스레드 서버 프로세스를 fork하지 않는다. 메모리는 동시에 처리 중인 페이지 수에만 비례한다.
+    """
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_num, last_page=page_num)
+    try:
+        return pytesseract.image_to_string(images[0], lang=lang) if images else ""
+    finally:
+        for image in images:
+            image.close()
+
+
 class DocumentFetcher:
     def __init__(self):
         self.bs_kwargs = dict(
             # 이거 수정하기 지금은 네이버 기사 기준
             parse_only=SoupStrainer("div", attrs={"class": ["newsct_article _article_body", "media_end_head_title"]})
         )
+        # OCR 설정
+        self.ocr_dpi = int(os.getenv("OCR_DPI", "200"))
+        self.ocr_lang = os.getenv("OCR_LANG", "eng")
+        self.ocr_workers = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+        # 동시에 래스터화/OCR 중인 최대 페이지 수 (메모리 상한)
+        self.ocr_batch_pages = int(os.getenv("OCR_BATCH_PAGES", str(self.ocr_workers * 2)))
+        # 여러 URL 수집용 크롤러 (연결 풀을 작업 간에 재사용)
+        self.crawler = WebCrawler(
+            max_workers=int(os.getenv("CRAWL_WORKERS", "16")),
+            per_host_limit=int(os.getenv("CRAWL_PER_HOST", "4")),
+            timeout=float(os.getenv("CRAWL_TIMEOUT", "20"))
+        )
 
     def fetch(self, title, url):
         """
@@ -25,7 +56,9 @@ class DocumentFetcher:
         """
         try:
             loader = WebBaseLoader(web_paths=(url,), bs_kwargs=self.bs_kwargs)
-            docs = loader.load()
+            with INGESTION_STAGE_SECONDS.time(stage="parse"):
+                docs = loader.load()
+            INGESTION_ITEMS.inc(len(docs), stage="parse")
 
             if not docs:
                 raise RuntimeError("No content found. Please check if the provided URL is correct.")
@@ -37,6 +70,38 @@ class DocumentFetcher:
         except Exception as e:
             raise RuntimeError(f"Error fetching document: {e}")
 
+    def parse_html(self, content):
+        """HTML에서 bs_kwargs의 SoupStrainer에 해당하는 부분만 파싱하여 본문 텍스트 반환"""
+        soup = BeautifulSoup(content, "html.parser", **self.bs_kwargs)
+        return soup.get_text()
+
+    def fetch_many(self, items):
+        """
+        여러 URL을 동시에 가져와 완료되는 순서대로 (Docs 또는 None, 결과 dict)를 yield.
+        :param items: [{"url": ..., "title": ...}] (title이 없으면 URL을 제목으로 사용)
+        """
+        titles = {item["url"]: item.get("title") or item["url"] for item in items}
+        for fetched in self.crawler.fetch_all(titles):
+            result = {
+                "url": fetched.url,
+                "title": titles[fetched.url],
+                "http_status": fetched.status_code,
+                "fetch_seconds": round(fetched.seconds, 3),
+            }
+            if fetched.error is not None:
+                result.update(status="failed", error=fetched.error)
+                yield None, result
+                continue
+
+            with INGESTION_STAGE_SECONDS.time(stage="parse"):
+                content = self.parse_html(fetched.content)
+            INGESTION_ITEMS.inc(stage="parse")
+            if not content.strip():
+                result.update(status="failed", error="No content found")
+                yield None, result
+                continue
+            yield Docs.from_web(title=result["title"], url=fetched.url, content=content), result
+
     def load_docx(self, file_path):
         """
         Load a .docx file and return a Docs object.
@@ -47,7 +112,9 @@ class DocumentFetcher:
         try:
             # Use UnstructuredWordDocumentLoader to load .docx files
             loader = PDFPlumberLoader(file_path)
-            docs = loader.load()
+            with INGESTION_STAGE_SECONDS.time(stage="parse"):
+                docs = loader.load()
+            INGESTION_ITEMS.inc(len(docs), stage="parse")
 
             if not docs:
                 raise RuntimeError("No content found in the .docx file.")
@@ -59,16 +126,36 @@ class DocumentFetcher:
         except Exception as e:
             raise RuntimeError(f"Error loading .docx file: {e}")
         
+    def iter_ocr_pages(self, file_path):
+        """
+        Perform OCR page by page across a thread pool and yield (page_num, text) in page order.
+        최대 ocr_batch_pages개의 페이지만 동시에 처리하므로 페이지 수와 무관하게 메모리가 일정하다.
+        """
+        page_count = pdfinfo_from_path(file_path)["Pages"]
+        max_workers = max(1, min(self.ocr_workers, page_count))
+        window = max(self.ocr_batch_pages, max_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr") as executor:
+            pending = deque()
+            next_page = 1
+            while next_page <= page_count or pending:
+                while next_page <= page_count and len(pending) < window:
+                    pending.append((next_page, executor.submit(_ocr_page, file_path, next_page, self.ocr_dpi, self.ocr_lang)))
+                    next_page += 1
+                page_num, future = pending.popleft()
+                print(f"Processing page {page_num}/{page_count} with OCR...")
+                # 페이지 결과를 기다린 시간 (병렬 처리 중이므로 처리량은 ingestion_items_total로 확인)
+                with INGESTION_STAGE_SECONDS.time(stage="ocr"):
+                    text = future.result()
+                INGESTION_ITEMS.inc(stage="ocr")
+                yield page_num, text
+
     def extract_text_with_ocr(self, file_path):
         """
         Perform OCR on an image-based PDF and return extracted text.
         """
         try:
-            images = convert_from_path(file_path)
-            text = ""
-            for page_num, image in enumerate(images, start=1):
-                print(f"Processing page {page_num} with OCR...")
-                text += pytesseract.image_to_string(image, lang='eng')
+            text = "".join(page_text for _, page_text in self.iter_ocr_pages(file_path))
 
             if text.strip():
                 print("Extracted content using OCR (first 500 characters):")
@@ -80,40 +167,45 @@ class DocumentFetcher:
             print(f"Error during OCR processing: {e}")
             return ""
 
-    def load_pdf(self, file_path):
+    def iter_pdf(self, file_path, source=None):
+        """
+        Yield a .pdf file page by page as LangChain Documents. Use OCR as a fallback if necessary.
+        페이지를 읽는 즉시 넘기므로 호출 측은 전체 페이지를 모으지 않고 바로 청크로 분할할 수 있다.
+        :param source: 메타데이터에 기록할 경로 (업로드마다 임시 경로가 달라도 청크 비교가 되도록 고정값 지정)
+        """
+        source = source or file_path
+        # 파일 이름에서 title 추출 (확장자 제거)
+        title = os.path.splitext(os.path.basename(file_path))[0]
+
+        extracted = False
+        pages = PDFPlumberLoader(file_path).lazy_load()
+        while True:
+            with INGESTION_STAGE_SECONDS.time(stage="parse"):
+                page = next(pages, None)
+            if page is None:
+                break
+            INGESTION_ITEMS.inc(stage="parse")
+            if not page.page_content.strip():
+                continue
+            if not extracted:
+                print("Extracted content using PDFPlumberLoader (first page):")
+                print(page.page_content[:500])
+                extracted = True
+            yield LangChainDocument(page_content=page.page_content, metadata={"source": source, "title": title})
+
+        if not extracted:
+            print("No content extracted using PDFPlumberLoader. Falling back to OCR...")
+            for _, page_text in self.iter_ocr_pages(file_path):
+                if page_text.strip():
+                    yield LangChainDocument(page_content=page_text, metadata={"source": source, "title": title})
+
+    def load_pdf(self, file_path, source=None):
         """
-        Load a .pdf file and return LangChain Documents. Use OCR as a fallback if necessary.
+        Load a .pdf file and return LangChain Documents (one per page). Use OCR as a fallback if necessary.
+        :param source: 메타데이터에 기록할 경로 (업로드마다 임시 경로가 달라도 청크 비교가 되도록 고정값 지정)
         """
         try:
-            loader = PDFPlumberLoader(file_path)
-            documents = loader.load_and_split()
-
-            if documents:
-                print("Extracted content using PDFPlumberLoader (first document):")
-                print(documents[0].page_content[:500])
-
-                # 파일 이름에서 title 추출
-                file_name = os.path.basename(file_path)
-                title = os.path.splitext(file_name)[0]  # 확장자 제거하여 제목으로 사용
-
-                return [
-                    LangChainDocument(
-                        page_content=doc.page_content,
-                        metadata={"source": file_path, "title": title}  # title 추가
-                    )
-                    for doc in documents
-                ]
-            else:
-                print("No content extracted using PDFPlumberLoader. Falling back to OCR...")
-                ocr_text = self.extract_text_with_ocr(file_path)
-                if ocr_text.strip():
-                    file_name = os.path.basename(file_path)
-                    title = os.path.splitext(file_name)[0]
-                    return [LangChainDocument(page_content=ocr_text, metadata={"source": file_path, "title": title})]
-                else:
-                    return []
-
-
+            return list(self.iter_pdf(file_path, source=source))
         except Exception as e:
             print(f"Error processing PDF file: {e}")
             return []
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TokenBucket:
+    """초당 rate개의 토큰을 채우는 토큰 버킷 (rate <= 0이면 제한 없음)"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# 상태 코드가 없는 일시적 오류의 예외 클래스 이름 (선택 의존성이라 import 대신 이름으로 비교)
+# google.api_core: ResourceExhausted, ServiceUnavailable, DeadlineExceeded, InternalServerError, TooManyRequests
+# openai: RateLimitError, APITimeoutError, APIConnectionError / requests, httpx: Timeout, ConnectionError 계열
+_RETRYABLE_ERROR_TYPES = {
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+    "RateLimitError", "APITimeoutError", "APIConnectionError",
+    "Timeout", "ConnectTimeout", "ReadTimeout", "TimeoutException", "ConnectError",
+}
+
+
+def _status_code(error):
+    for attr in ("status_code", "code", "http_status"):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable_error(error):
+    """
+    429(쿼터 초과), 5xx, 타임아웃/연결 오류인지 판별 (Google/OpenAI 클라이언트 예외 공통 처리).
+    메시지 문자열이 아닌 상태 코드와 예외 종류로만 판단하며, 감싼 예외(__cause__)도 확인한다.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status = _status_code(error)
+        if status is not None:
+            return status == 429 or 500 <= status < 600
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        if any(cls.__name__ in _RETRYABLE_ERROR_TYPES for cls in type(error).__mro__):
+            return True
+        error = error.__cause__
+    return False
+
+
+class EmbeddingExecutor:
+    """
+    임베딩 요청을 batch_size 단위로 나누어 최대 max_concurrency개까지 병렬 호출.
+    토큰 버킷으로 초당 요청 수를 제한하고, 429/5xx는 지터가 있는 지수 백오프로 재시도한다.
+    배치가 끝날 때마다 on_batch(texts, vectors)를 호출하므로 호출 측에서 즉시 캐시에 저장해
+    실패 후 재시도 시 이미 임베딩된 배치부터 이어서 처리할 수 있다.
+    """
+
+    def __init__(self, embedding_model, batch_size=100, max_concurrency=4,
+                 requests_per_second=0, max_retries=5, base_delay=1.0, max_delay=30.0):
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _embed_batch(self, texts, counters):
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                return self.embedding_model.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                delay = random.uniform(0, delay)  # full jitter
+                attempt += 1
+                with counters["lock"]:
+                    counters["retries"] += 1
+                print(f"⚠️ 임베딩 요청 재시도 {attempt}/{self.max_retries} ({delay:.1f}초 후): {e}")
+                time.sleep(delay)
+
+    def embed(self, texts, on_batch=None):
+        """
+        텍스트 목록 임베딩.
+        :return: (벡터 리스트, 통계 dict)
+        """
+        started_at = time.monotonic()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        counters = {"retries": 0, "lock": threading.Lock()}
+        results = [None] * len(batches)
+
+        def run(index):
+            vectors = self._embed_batch(batches[index], counters)
+            results[index] = vectors
+            if on_batch:
+                on_batch(batches[index], vectors)
+
+        if len(batches) <= 1 or self.max_concurrency <= 1:
+            for index in range(len(batches)):
+                run(index)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                # 하나라도 실패하면 예외 전파 (완료된 배치는 이미 on_batch로 전달됨)
+                for future in [executor.submit(run, index) for index in range(len(batches))]:
+                    future.result()
+
+        elapsed = time.monotonic() - started_at
+        vectors = [vector for batch_vectors in results for vector in batch_vectors]
+        stats = {
+            "embedded": len(vectors),
+            "batches": len(batches),
+            "retries": counters["retries"],
+            "seconds": round(elapsed, 3),
+            "embeddings_per_second": round(len(vectors) / elapsed, 2) if elapsed > 0 else None,
+        }
+        return vectors, stats
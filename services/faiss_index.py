@@ -0,0 +1,168 @@
+import math
+
+import faiss
+import numpy as np
+
+
+class IndexConfig:
+    """
+    FAISS 인덱스 종류 및 파라미터 설정.
+    index_type이 "auto"이면 벡터 수에 따라 flat → hnsw → ivf 순으로 전환한다.
+    quantization은 벡터 저장 방식: "none"(float32), "sq8"(차원당 1바이트), "pq"(product quantization)
+    """
+
+    def __init__(self, index_type="auto", hnsw_min_vectors=20_000, ivf_min_vectors=200_000,
+                 hnsw_m=32, hnsw_ef_construction=200, hnsw_ef_search=64, ivf_nprobe=16,
+                 quantization="none", pq_m=0):
+        self.index_type = index_type
+        self.hnsw_min_vectors = hnsw_min_vectors
+        self.ivf_min_vectors = ivf_min_vectors
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nprobe = ivf_nprobe
+        self.quantization = quantization
+        self.pq_m = pq_m
+
+    def target_kind(self, vector_count):
+        """현재 벡터 수에 맞는 인덱스 종류"""
+        if self.index_type != "auto":
+            return self.index_type
+        if vector_count >= self.ivf_min_vectors:
+            return "ivf"
+        if vector_count >= self.hnsw_min_vectors:
+            return "hnsw"
+        return "flat"
+
+
+def index_kind(index):
+    """인덱스 종류 판별 (flat / hnsw / ivf)"""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def index_encoding(index):
+    """벡터 저장 방식 판별 (none / sq8 / pq)"""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "sq8"
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "none"
+
+
+def ivf_nlist(vector_count):
+    """IVF 클러스터 수: 약 4*sqrt(N), 클러스터당 학습 벡터가 최소 39개가 되도록 제한"""
+    return max(1, min(int(4 * math.sqrt(vector_count)), vector_count // 39))
+
+
+def pq_subquantizers(dim, config):
+    """PQ 서브 양자화기 수: 지정값 또는 dim/8, 차원을 나누어떨어지게 조정"""
+    m = max(1, min(config.pq_m or dim // 8, dim))
+    while dim % m:
+        m -= 1
+    return m
+
+
+def pq_nbits(vector_count):
+    """PQ 코드 비트 수: 기본 8비트, 학습 벡터가 적으면 센트로이드당 39개 이상이 되도록 줄임"""
+    return max(1, min(8, int(math.log2(max(2, vector_count // 39)))))
+
+
+def encoding_description(dim, vector_count, config):
+    if config.quantization == "sq8":
+        return "SQ8"
+    if config.quantization == "pq":
+        return f"PQ{pq_subquantizers(dim, config)}x{pq_nbits(vector_count)}"
+    return "Flat"
+
+
+def index_description(kind, dim, vector_count, config):
+    """faiss.index_factory 설명 문자열"""
+    encoding = encoding_description(dim, vector_count, config)
+    if kind == "hnsw":
+        return f"HNSW{config.hnsw_m},{encoding}"
+    if kind == "ivf":
+        return f"IVF{ivf_nlist(vector_count)},{encoding}"
+    return encoding
+
+
+def prepare_index(index, config):
+    """검색 파라미터 적용 및 IVF reconstruct용 direct map 준비"""
+    kind = index_kind(index)
+    if kind == "hnsw":
+        index.hnsw.efSearch = config.hnsw_ef_search
+    elif kind == "ivf":
+        index.nprobe = config.ivf_nprobe
+        index.make_direct_map()
+    return index
+
+
+def extract_vectors(index, start=0, count=None):
+    """인덱스 위치 순서대로 저장된 벡터 추출"""
+    count = index.ntotal - start if count is None else count
+    if count <= 0:
+        return np.empty((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(start, count)
+
+
+def build_index(kind, vectors, metric_type, config):
+    """
+    주어진 종류로 새 인덱스를 만들고 벡터를 같은 순서로 추가.
+    위치(position)가 그대로 유지되므로 index_to_docstore_id를 바꿀 필요가 없다.
+    """
+    dim = vectors.shape[1]
+    index = faiss.index_factory(dim, index_description(kind, dim, len(vectors), config), metric_type)
+    if kind == "hnsw":
+        index.hnsw.efConstruction = config.hnsw_ef_construction
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return prepare_index(index, config)
+
+
+def tombstone_selector(positions):
+    """삭제 표시된 위치를 검색에서 제외하는 IDSelector (제외할 위치가 없으면 None)"""
+    if not positions:
+        return None
+    batch = faiss.IDSelectorBatch(np.fromiter(positions, dtype=np.int64, count=len(positions)))
+    selector = faiss.IDSelectorNot(batch)
+    selector.referenced_objects = [batch]  # IDSelectorNot은 포인터만 보관하므로 참조 유지
+    return selector
+
+
+def search_parameters(index, selector):
+    """
+    selector를 적용한 검색 파라미터 (인덱스에 설정된 efSearch/nprobe 유지).
+    selector가 없거나 필터 검색을 지원하지 않는 인덱스(Flat PQ)면 None.
+    """
+    if selector is None or isinstance(index, faiss.IndexPQ):
+        return None
+    kind = index_kind(index)
+    if kind == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = index.hnsw.efSearch
+    elif kind == "ivf":
+        params = faiss.SearchParametersIVF()
+        params.nprobe = index.nprobe
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+
+def exact_scores(query, vectors, metric_type):
+    """원본 벡터로 계산한 FAISS와 같은 척도의 점수 (내적: 클수록, L2: 작을수록 가까움)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if metric_type == faiss.METRIC_INNER_PRODUCT:
+        return vectors @ query
+    return np.sum((vectors - query) ** 2, axis=1)
+
+
+def index_memory_bytes(index):
+    """직렬화된 인덱스 크기 (코드 + 그래프/센트로이드 등 부가 구조 포함)"""
+    return int(faiss.serialize_index(index).nbytes)
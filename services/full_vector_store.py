@@ -0,0 +1,77 @@
+import sqlite3
+import threading
+
+import numpy as np
+
+
+class FullVectorStore:
+    """
+    양자화(SQ8/PQ) 인덱스를 위한 원본 float32 벡터 저장소 (문서 ID → 벡터, SQLite).
+    메모리에는 압축된 코드만 두고, 검색 후보 재점수화와 인덱스 재구성 때만 디스크에서 읽는다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS vectors (
+                doc_id TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def put_many(self, ids, vectors):
+        """벡터 저장 (같은 ID는 덮어씀)"""
+        rows = [
+            (doc_id, np.asarray(vector, dtype=np.float32).tobytes())
+            for doc_id, vector in zip(ids, vectors)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO vectors (doc_id, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def get_many(self, ids):
+        """:return: {문서 ID: 벡터} (저장되지 않은 ID는 빠짐)"""
+        found = {}
+        unique_ids = list(dict.fromkeys(ids))
+        with self._lock:
+            # SQLite 파라미터 개수 제한을 피하기 위해 나눠서 조회
+            for start in range(0, len(unique_ids), 500):
+                batch = unique_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT doc_id, vector FROM vectors WHERE doc_id IN ({placeholders})", batch
+                ).fetchall()
+                for doc_id, blob in rows:
+                    found[doc_id] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def delete_many(self, ids):
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM vectors WHERE doc_id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.commit()
+
+    def iter_batches(self, batch_size=10_000):
+        """전체 벡터를 (ID 리스트, 행렬) 배치로 순회"""
+        last_id = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT doc_id, vector FROM vectors WHERE doc_id > ? ORDER BY doc_id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [doc_id for doc_id, _ in rows], np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
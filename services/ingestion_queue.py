@@ -0,0 +1,362 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from models.models import db, FileMetadata, IngestionJob
+from services.metrics import INGESTION_STAGE_SECONDS, INGESTION_ITEMS
+
+
+class IngestionJobQueue:
+    """
+    문서 수집(파싱 → 분할 → 임베딩 → 저장)을 HTTP 요청 밖의 워커 스레드에서 처리하는 작업 큐.
+    작업 상태는 ingestion_jobs 테이블에 저장되어 재시작 후에도 이어서 처리된다.
+    """
+
+    def __init__(self, document_fetcher, vector_db_manager, worker_count=2, stale_seconds=600, collections=None):
+        self.document_fetcher = document_fetcher
+        self.vector_db_manager = vector_db_manager
+        # payload의 "collection"으로 저장 대상 컬렉션 선택 (VectorCollections)
+        self.collections = collections
+        self.worker_count = worker_count
+        # running 작업의 updated_at이 이 시간보다 오래되면 멈춘 것으로 볼 수 있도록
+        # 처리 중에는 그 1/4 주기로 갱신 (긴 OCR/임베딩 단계도 진행 중으로 보임)
+        self.stale_seconds = stale_seconds
+        self.heartbeat_seconds = max(1, stale_seconds // 4)
+        self.app = None
+        self._queue = queue.Queue()
+        self._workers = []
+        self._handlers = {
+            "file": self._run_file_job,
+            "pdf": self._run_pdf_job,
+            "url": self._run_url_job,
+            "urls": self._run_bulk_url_job,
+        }
+
+    def init_app(self, app):
+        """
+        워커 시작 및 미완료 작업 복구 (db.create_all() 이후 호출).
+        요청을 처리하는 프로세스에서만 시작한다: INGESTION_WORKERS_ENABLED가 False이거나
+        리로더(USE_RELOADER)의 부모 프로세스(WERKZEUG_RUN_MAIN 미설정)이면 작업 등록만 가능하다.
+        """
+        self.app = app
+        if not app.config.get("INGESTION_WORKERS_ENABLED", True):
+            return
+        if app.config.get("USE_RELOADER") and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+            return
+        with app.app_context():
+            self._recover_jobs()
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._worker_loop, name=f"ingestion-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, kind, payload, created_by=None):
+        """작업을 등록하고 job id를 즉시 반환"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown ingestion job kind: {kind}")
+        job = IngestionJob(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            status="queued",
+            payload=json.dumps(payload, ensure_ascii=False),
+            created_by=created_by
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._queue.put(job.id)
+        return job.id
+
+    @staticmethod
+    def get_job_status(job_id):
+        """작업 상태 조회 (없으면 None)"""
+        job = IngestionJob.query.get(job_id)
+        if not job:
+            return None
+        return {
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": {
+                "pages_parsed": job.pages_parsed,
+                "chunks_total": job.chunks_total,
+                "chunks_embedded": job.chunks_embedded,
+            },
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        }
+
+    def _recover_jobs(self):
+        """
+        시작 시 미완료 작업을 다시 대기열에 넣음.
+        워커는 벡터스토어를 가진 한 프로세스에서만 돌기 때문에 시작 시점의 running 작업은
+        모두 이전 프로세스가 남긴 것이므로 갱신 시각과 관계없이 다시 처리한다.
+        """
+        jobs = IngestionJob.query.filter(
+            IngestionJob.status.in_(("queued", "running"))
+        ).order_by(IngestionJob.created_at.asc()).all()
+        for job in jobs:
+            job.status = "queued"
+            self._queue.put(job.id)
+        db.session.commit()
+        if jobs:
+            print(f"🔁 미완료 수집 작업 {len(jobs)}개를 다시 대기열에 넣었습니다.")
+
+    def _claim(self, job_id):
+        """queued 상태인 작업만 running으로 전환 (여러 프로세스가 같은 작업을 잡지 않도록)"""
+        claimed = IngestionJob.query.filter_by(id=job_id, status="queued").update(
+            {"status": "running", "updated_at": datetime.utcnow()}
+        )
+        db.session.commit()
+        return claimed == 1
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        IngestionJob.query.filter_by(id=job_id).update(fields)
+        db.session.commit()
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    try:
+                        self._run(job_id)
+                    except Exception as e:
+                        # DB 오류 등으로 작업 상태를 기록하지 못해도 워커 스레드는 계속 동작
+                        print(f"❌ 수집 작업 처리 오류 ({job_id}): {e}")
+                        try:
+                            db.session.rollback()
+                        except Exception:
+                            pass
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        if not self._claim(job_id):
+            return
+        job = IngestionJob.query.get(job_id)
+        payload = json.loads(job.payload)
+        try:
+            with self._heartbeat(job_id):
+                result = self._handlers[job.kind](job_id, payload)
+            self._update(
+                job_id, status="succeeded", stage="done",
+                result=json.dumps(result, ensure_ascii=False, default=str)
+            )
+            print(f"✅ 수집 작업 완료: {job_id}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 수집 작업 실패 ({job_id}): {e}")
+            self._update(job_id, status="failed", error=str(e))
+
+    @contextmanager
+    def _heartbeat(self, job_id):
+        """작업 처리 중 updated_at을 주기적으로 갱신 (다른 프로세스가 stale로 보고 다시 잡지 않도록)"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat_seconds):
+                try:
+                    with self.app.app_context():
+                        IngestionJob.query.filter_by(id=job_id, status="running").update(
+                            {"updated_at": datetime.utcnow()}
+                        )
+                        db.session.commit()
+                except Exception as e:
+                    print(f"⚠️ 수집 작업 heartbeat 실패 ({job_id}): {e}")
+
+        thread = threading.Thread(target=beat, name=f"ingestion-heartbeat-{job_id[:8]}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _target(self, payload):
+        """작업 payload가 지정한 컬렉션의 VectorDBManager (없으면 기본)"""
+        if self.collections is None:
+            return self.vector_db_manager
+        return self.collections.get(payload.get("collection"))
+
+    def _progress_callback(self, job_id):
+        # 임베딩 배치 스레드에서 호출될 수 있으므로 app context를 직접 연다
+        def report(embedded, total):
+            with self.app.app_context():
+                self._update(job_id, chunks_embedded=embedded, chunks_total=total)
+        return report
+
+    def _run_file_job(self, job_id, payload):
+        """/api/files/upload 파일 업로드 처리 (끝나면 업로드 임시 파일 삭제)"""
+        try:
+            return self._index_file(job_id, payload)
+        finally:
+            self._remove_upload(payload["temp_path"])
+
+    @staticmethod
+    def _remove_upload(path):
+        """처리가 끝난 업로드 임시 파일과 업로드별 디렉터리 삭제"""
+        if os.path.exists(path):
+            os.remove(path)
+        directory = os.path.dirname(path)
+        if directory and os.path.normpath(directory) != "temp_uploads":
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+    def _index_file(self, job_id, payload):
+        file_name = payload["file_name"]
+        temp_path = payload["temp_path"]
+        # 청크 메타데이터의 source는 업로드마다 달라지는 임시 경로 대신 고정값 (이전 버전과 청크 비교용)
+        source = payload.get("source", temp_path)
+        content_hash = payload.get("content_hash")
+
+        # 같은 파일의 다른 업로드 작업이 먼저 끝난 경우 (동시 업로드) 다시 처리하지 않음
+        if content_hash:
+            existing = FileMetadata.query.filter_by(
+                content_hash=content_hash, collection=payload.get("collection")
+            ).first()
+            if existing:
+                return {"message": "File already indexed", "duplicate": True, "file_id": existing.id}
+
+        self._update(job_id, stage="parsing")
+        if file_name.endswith("docx"):
+            pages = [self.document_fetcher.load_docx(temp_path).to_langchain_document()]
+        else:
+            # PDF는 페이지를 읽는 대로 분할 (전체 페이지 목록을 메모리에 두지 않음)
+            pages = self.document_fetcher.iter_pdf(temp_path, source=source)
+
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+        documents = []
+        pages_parsed = 0
+        for page in pages:
+            pages_parsed += 1
+            with INGESTION_STAGE_SECONDS.time(stage="split"):
+                for split in text_splitter.split_text(page.page_content):
+                    documents.append(
+                        Document(page_content=split, metadata={"title": file_name, "source": source})
+                    )
+        if not documents:
+            raise RuntimeError("Failed to process the document content")
+        INGESTION_ITEMS.inc(len(documents), stage="split")
+
+        self._update(job_id, stage="embedding", pages_parsed=pages_parsed, chunks_total=len(documents))
+        # 같은 이름의 이전 버전이 있으면 바뀐 청크만 임베딩/교체
+        vector_result = self._target(payload).upsert_documents(
+            file_name, documents, progress_callback=self._progress_callback(job_id)
+        )
+
+        # Save metadata to the database
+        self._update(job_id, stage="saving")
+        metadata = FileMetadata.query.filter_by(name=file_name, collection=payload.get("collection")).first()
+        if metadata is None:
+            metadata = FileMetadata(name=file_name, collection=payload.get("collection"))
+            db.session.add(metadata)
+        metadata.size = payload["file_size"]
+        metadata.type = payload["file_type"]
+        metadata.upload_date = datetime.fromisoformat(payload["upload_date"])
+        metadata.user_id = payload["user_id"]
+        metadata.content_hash = content_hash
+        db.session.commit()
+        return {
+            "message": "File uploaded successfully",
+            "document_count": len(documents),
+            "chunks_unchanged": vector_result["unchanged"],
+            "chunks_added": vector_result["added"],
+            "chunks_removed": vector_result["removed"],
+            "embedding_stats": vector_result.get("embedding_stats")
+        }
+
+    def _run_pdf_job(self, job_id, payload):
+        """/api/pdf/upload PDF 업로드 처리"""
+        self._update(job_id, stage="parsing")
+        try:
+            # 페이지를 읽는 대로 add_pdf_to_db에서 분할 (임시 파일은 모두 읽은 뒤 삭제)
+            pages = self.document_fetcher.iter_pdf(payload["file_path"], source=payload.get("source"))
+            result = self._target(payload).add_pdf_to_db(pages, progress_callback=self._progress_callback(job_id))
+        finally:
+            self._remove_upload(payload["file_path"])
+        if not result["document_count"]:
+            raise RuntimeError("❌ PDF에서 텍스트를 추출할 수 없습니다.")
+        return result
+
+    def _run_url_job(self, job_id, payload):
+        """URL 문서 수집 처리"""
+        self._update(job_id, stage="parsing")
+        doc = self.document_fetcher.fetch(payload["title"], payload["url"])
+
+        self._update(job_id, stage="embedding", pages_parsed=1)
+        vector_details = self._target(payload).add_doc_to_db(doc, progress_callback=self._progress_callback(job_id))
+        return {
+            "message": f"URL '{payload['title']}' has been successfully added to the vector database.",
+            "vector_info": vector_details
+        }
+
+    def _run_bulk_url_job(self, job_id, payload):
+        """
+        여러 URL(또는 sitemap) 일괄 수집.
+        크롤러가 다음 페이지들을 가져오는 동안 이미 받은 페이지를 분할/임베딩하며,
+        URL 제목 단위로 upsert하므로 다시 수집해도 바뀐 청크만 임베딩한다.
+        """
+        self._update(job_id, stage="crawling")
+        items = list(payload.get("urls") or [])
+        if payload.get("sitemap"):
+            sitemap_urls = self.document_fetcher.crawler.sitemap_urls(
+                payload["sitemap"], limit=payload.get("max_urls", 1000)
+            )
+            items.extend({"url": url} for url in sitemap_urls)
+        items = list({item["url"]: item for item in items}.values())
+        if not items:
+            raise RuntimeError("No URLs to ingest")
+
+        target = self._target(payload)
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+        results = []
+        pages = chunks = 0
+        started = time.perf_counter()
+        for doc, result in self.document_fetcher.fetch_many(items):
+            if doc is not None:
+                try:
+                    with INGESTION_STAGE_SECONDS.time(stage="split"):
+                        splits = text_splitter.split_text(doc.content)
+                    INGESTION_ITEMS.inc(len(splits), stage="split")
+                    documents = [
+                        Document(page_content=split, metadata={"title": doc.title, "url": doc.url})
+                        for split in splits
+                    ]
+                    vector_result = target.upsert_documents(doc.title, documents)
+                    result.update(
+                        status="indexed",
+                        chunks=len(documents),
+                        chunks_added=vector_result["added"],
+                        chunks_removed=vector_result["removed"]
+                    )
+                    pages += 1
+                    chunks += len(documents)
+                except Exception as e:
+                    result.update(status="failed", error=str(e))
+            results.append(result)
+            self._update(job_id, pages_parsed=pages, chunks_total=chunks, chunks_embedded=chunks)
+
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for result in results if result["status"] == "failed")
+        return {
+            "message": f"{pages} of {len(results)} URLs have been added to the vector database.",
+            "url_count": len(results),
+            "succeeded": pages,
+            "failed": failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "pages_per_second": round(pages / elapsed, 2) if elapsed > 0 else None,
+            "results": results
+        }
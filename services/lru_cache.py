@@ -0,0 +1,82 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def normalize_query(text):
+    """캐시 키용 질문 정규화 (유니코드 NFC, 앞뒤 공백 제거, 연속 공백 축약)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class LRUTTLCache:
+    """
+    스레드 안전한 인메모리 LRU 캐시. 항목은 ttl_seconds가 지나면 만료된다.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """ttl_seconds를 주면 이 항목만 기본 TTL 대신 그 시간 후 만료"""
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def touch(self, key, value):
+        """key가 아직 value를 가리키면 만료 시간만 갱신 (다른 값으로 바뀌었거나 없으면 그대로 둠)"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] is not value:
+                return False
+            self._data[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._data.move_to_end(key)
+            return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._data),
+                "max_size": self.max_size,
+            }
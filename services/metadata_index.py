@@ -0,0 +1,98 @@
+import json
+import os
+
+
+class MetadataIndex:
+    """
+    벡터스토어 청크의 보조 인덱스: title → 청크 ID, source(url/파일 경로) → 청크 ID,
+    (title, source) 문서별 청크 수.
+    제목 삭제와 문서 목록 조회가 docstore 전체를 훑지 않도록 추가/삭제 시 함께 갱신한다.
+    (VectorDBManager의 락 안에서만 변경/조회)
+    """
+
+    FILE_NAME = "metadata_index.json"
+
+    def __init__(self):
+        self._keys = {}       # 청크 ID → (title, source)
+        self._by_title = {}   # title → {청크 ID}
+        self._by_source = {}  # source → {청크 ID}
+        self._counts = {}     # (title, source) → 청크 수
+
+    @staticmethod
+    def _source(metadata):
+        return metadata.get("url") or metadata.get("source")
+
+    def add(self, ids, metadatas):
+        for doc_id, metadata in zip(ids, metadatas):
+            if doc_id in self._keys:
+                continue
+            key = (metadata.get("title"), self._source(metadata))
+            self._keys[doc_id] = key
+            self._by_title.setdefault(key[0], set()).add(doc_id)
+            self._by_source.setdefault(key[1], set()).add(doc_id)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def remove(self, ids):
+        for doc_id in ids:
+            key = self._keys.pop(doc_id, None)
+            if key is None:
+                continue
+            self._discard(self._by_title, key[0], doc_id)
+            self._discard(self._by_source, key[1], doc_id)
+            self._counts[key] -= 1
+            if not self._counts[key]:
+                del self._counts[key]
+
+    @staticmethod
+    def _discard(mapping, value, doc_id):
+        ids = mapping.get(value)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del mapping[value]
+
+    def ids_for_title(self, title):
+        return list(self._by_title.get(title, ()))
+
+    def ids_for_source(self, source):
+        return list(self._by_source.get(source, ()))
+
+    def documents(self):
+        """문서별 [{"title", "source", "chunk_count"}]"""
+        return [
+            {"title": title, "source": source, "chunk_count": count}
+            for (title, source), count in self._counts.items()
+        ]
+
+    def __len__(self):
+        return len(self._keys)
+
+    @classmethod
+    def from_docstore(cls, docs_by_id):
+        """docstore 내용으로 인덱스 생성 (기존 스냅샷처럼 저장된 인덱스가 없을 때)"""
+        index = cls()
+        items = [(doc_id, doc) for doc_id, doc in docs_by_id.items() if doc is not None]
+        index.add([doc_id for doc_id, _ in items], [doc.metadata for _, doc in items])
+        return index
+
+    def to_dict(self):
+        return {"chunks": {doc_id: list(key) for doc_id, key in self._keys.items()}}
+
+    @classmethod
+    def write(cls, directory, data):
+        """to_dict() 결과를 스냅샷 디렉터리에 저장 (락 밖에서 저장할 수 있도록 복사본을 받음)"""
+        with open(os.path.join(directory, cls.FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory):
+        """스냅샷 디렉터리에 저장된 인덱스 로드 (없으면 None)"""
+        path = os.path.join(directory, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls()
+        for doc_id, (title, source) in data["chunks"].items():
+            index.add([doc_id], [{"title": title, "source": source}])
+        return index
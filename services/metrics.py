@@ -0,0 +1,286 @@
+"""
+Prometheus 텍스트 형식 메트릭 (외부 라이브러리 없이 구현).
+단계별 지연 시간 히스토그램, 처리량 카운터, 진행 중 요청 수를 기록하고
+캐시 적중률/인덱스 크기처럼 조회 시점에 계산하는 값은 collector 콜백으로 수집한다.
+기록 비용은 락 한 번과 버킷 이진 탐색 정도라 요청 처리 경로에 부담이 없다.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """블록 실행 중에만 1 증가 (진행 중 요청 수)"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 버킷별 개수 (마지막 칸은 +Inf), 합계
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """블록 실행 시간을 초 단위로 기록 (예외가 나도 기록)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """메트릭과 조회 시점 collector를 모아 Prometheus 텍스트 형식으로 출력"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric already registered with a different type or labels: {metric.name}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """
+        조회 시점에 호출할 콜백 등록.
+        collector()는 [(이름, 종류, 설명, [(레이블 dict, 값)])]를 반환한다.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        # 같은 이름을 여러 collector가 내보내면 (예: 컬렉션별 인덱스) 한 블록으로 합친다
+        families = {}
+        for collector in collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                print(f"⚠️ 메트릭 수집 실패 ({getattr(collector, '__name__', collector)}): {e}")
+                continue
+            for name, kind, documentation, samples in collected:
+                family = families.setdefault(name, (kind, documentation, []))
+                family[2].extend(samples)
+        for name, (kind, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# 채팅/검색 단계: query_embedding, vector_search, lexical_search, context_build,
+# history_lookup, llm, llm_first_token (스트리밍), save_chat
+STAGE_SECONDS = registry.histogram(
+    "rag_stage_duration_seconds", "Latency of chat and retrieval pipeline stages", ("stage",)
+)
+# 문서 수집 단계: parse, ocr, split, embed, persist
+INGESTION_STAGE_SECONDS = registry.histogram(
+    "ingestion_stage_duration_seconds", "Latency of document ingestion stages", ("stage",)
+)
+INGESTION_ITEMS = registry.counter(
+    "ingestion_items_total", "Pages or chunks processed by each ingestion stage", ("stage",)
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "endpoint", "status")
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed", ("endpoint",)
+)
+
+
+def cache_collector(caches):
+    """
+    캐시 적중/미스 카운터와 적중률 collector.
+    :param caches: {캐시 이름: stats()가 hits/misses/hit_rate를 반환하는 객체}
+    """
+    def collect():
+        hits, misses, ratios = [], [], []
+        for name, cache in caches.items():
+            stats = cache.stats()
+            hits.append(({"cache": name}, stats["hits"]))
+            misses.append(({"cache": name}, stats["misses"]))
+            ratios.append(({"cache": name}, stats["hit_rate"]))
+        return [
+            ("cache_hits_total", "counter", "Cache hits", hits),
+            ("cache_misses_total", "counter", "Cache misses", misses),
+            ("cache_hit_ratio", "gauge", "Cache hit ratio since process start", ratios),
+        ]
+    return collect
+
+
+def vector_index_collector(collections):
+    """컬렉션별 벡터 수, 문서 수, WAL 크기 collector (인덱스 직렬화 없이 읽을 수 있는 값만)"""
+    def collect():
+        vectors, deleted, documents, wal_bytes = [], [], [], []
+        for name in collections.names():
+            manager = collections.get(name)
+            info = manager.get_index_info()
+            labels = {"collection": name, "index_type": info["index_type"], "quantization": info["quantization"]}
+            vectors.append((labels, info["vector_count"]))
+            deleted.append(({"collection": name}, info["deleted_vectors"]))
+            documents.append(({"collection": name}, len(manager.metadata_index)))
+            wal_bytes.append(({"collection": name}, manager.wal.size_bytes()))
+        return [
+            ("vector_index_vectors", "gauge", "Vectors stored in the FAISS index", vectors),
+            ("vector_index_deleted_vectors", "gauge", "Deleted vectors still in the index until compaction", deleted),
+            ("vector_index_documents", "gauge", "Distinct documents in the vector store", documents),
+            ("vector_wal_bytes", "gauge", "Write-ahead log size not yet compacted into a snapshot", wal_bytes),
+        ]
+    return collect
+
+
+def init_app(app):
+    """요청 지연 시간/진행 중 요청 수 기록 훅과 GET /metrics 등록"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        g.metrics_started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=request.method, endpoint=g.metrics_endpoint, status=response.status_code
+            )
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(error=None):
+        endpoint = g.pop("metrics_endpoint", None)
+        if endpoint is not None:
+            HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
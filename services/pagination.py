@@ -0,0 +1,83 @@
+"""
+커서 기반(keyset) 페이지네이션.
+OFFSET 대신 "마지막으로 본 (정렬 값, id) 다음부터"를 조건으로 조회하므로
+(정렬 컬럼, id) 복합 인덱스를 타고 이력 길이와 무관하게 한 페이지만 읽는다.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.types import DateTime
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+    """요청 파라미터 limit 검증 (1 ~ max_limit)"""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid limit: {value!r}")
+    if limit < 1:
+        raise ValueError(f"Invalid limit: {value!r}")
+    return min(limit, max_limit)
+
+
+def encode_cursor(sort_value, row_id):
+    """(정렬 값, id)를 URL에 넣을 수 있는 불투명 문자열로 변환"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort_column):
+    """encode_cursor의 역변환. 잘못된 커서는 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if sort_value is not None and isinstance(sort_column.type, DateTime):
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_page(query, sort_column, id_column, limit, cursor=None, descending=True, columns=None):
+    """
+    query를 (sort_column, id_column) 순으로 정렬하여 cursor 다음 limit개 조회.
+    :param columns: 일부 컬럼만 조회할 때 (with_entities) 지정. 정렬 컬럼과 id 컬럼을 포함해야 한다.
+    :return: (행 리스트, 다음 페이지 커서 또는 None)
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor, sort_column)
+        if descending:
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < row_id)
+            ))
+        else:
+            query = query.filter(or_(
+                sort_column > sort_value,
+                and_(sort_column == sort_value, id_column > row_id)
+            ))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    if columns is not None:
+        query = query.with_entities(*columns)
+
+    # 한 개 더 읽어 다음 페이지 존재 여부 확인
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
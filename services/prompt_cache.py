@@ -0,0 +1,57 @@
+import os
+import threading
+import uuid
+
+from models.models import LLMPrompt
+
+
+DEFAULT_PROMPT = "You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If you don't know the answer, just say that you don't know. Answer in Korean."
+
+
+class ActivePromptCache:
+    """
+    활성화된 LLM 프롬프트를 메모리에 캐시.
+    프롬프트가 변경되면 invalidate()가 버전 파일을 교체하고, 각 워커 프로세스는
+    요청마다 파일 stat만 비교하여 변경 시에만 DB에서 다시 읽는다.
+    """
+
+    def __init__(self, version_file="prompt_version", default_prompt=DEFAULT_PROMPT):
+        self.version_file = version_file
+        self.default_prompt = default_prompt
+        self._lock = threading.Lock()
+        self._prompt_text = None
+        self._loaded_version = None
+
+    def _current_version(self):
+        try:
+            stat = os.stat(self.version_file)
+            return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        """DB에서 활성화된 프롬프트 설명 부분 가져오기"""
+        active_prompt = LLMPrompt.query.filter_by(is_active=True).first()
+        if active_prompt:
+            print(f"✅ 활성화된 프롬프트 로드됨: {active_prompt.prompt_name}")
+            return active_prompt.prompt_text  # 설명 부분만 반환
+        print("❌ 활성화된 프롬프트가 없습니다. 기본 프롬프트를 사용합니다.")
+        return self.default_prompt
+
+    def get(self):
+        """캐시된 프롬프트 반환 (다른 프로세스에서 변경되었으면 다시 로드, app context 필요)"""
+        version = self._current_version()
+        with self._lock:
+            if self._prompt_text is None or version != self._loaded_version:
+                self._prompt_text = self._load()
+                self._loaded_version = version
+            return self._prompt_text
+
+    def invalidate(self):
+        """프롬프트 변경 알림: 버전 파일을 원자적으로 교체하여 모든 프로세스의 캐시 무효화"""
+        temp_file = f"{self.version_file}.{uuid.uuid4().hex}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(temp_file, self.version_file)
+        with self._lock:
+            self._prompt_text = None
@@ -1,45 +1,120 @@
 from langchain_community.vectorstores import FAISS
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from services.lru_cache import LRUTTLCache, normalize_query
+from services.context_builder import ContextBuilder
+from services.metrics import STAGE_SECONDS
+import threading
+import os
 
 class RetrieverManager:
 
-    def __init__(self, vector_db_manager):
+    def __init__(self, vector_db_manager, collections=None):
         """
         VectorDBManager 객체를 통해 벡터스토어를 관리.
+        collections(VectorCollections)가 있으면 컬렉션을 지정한 검색을 지원.
         """
         self.vector_db_manager = vector_db_manager
+        self.collections = collections
+        # 검색 결과 캐시: 키에 벡터스토어 generation이 포함되어 변경 시 자동 무효화
+        self.result_cache = LRUTTLCache(
+            max_size=int(os.getenv("RETRIEVAL_CACHE_SIZE", "512")),
+            ttl_seconds=int(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+        )
+        self._cache_generation = self._generation()
+        self._cache_lock = threading.Lock()
+        # 중복 제거 + MMR + 토큰 예산 기반 컨텍스트 구성
+        self.context_builder = ContextBuilder(
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+            lambda_mult=float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+        )
+        # MMR 후보로 가져올 청크 수 = k * fetch_k_multiplier
+        self.fetch_k_multiplier = int(os.getenv("CONTEXT_FETCH_K_MULTIPLIER", "4"))
+        # hybrid 검색의 reciprocal rank fusion 상수
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
 
-    def retrieve_context(self, question, k=3, search_type="similarity", similarity_threshold=0.7):
+    def _generation(self):
+        if self.collections is not None:
+            return self.collections.generation
+        return self.vector_db_manager.generation
+
+    def _result_cache_key(self, question, k, search_type, similarity_threshold, collections=None):
+        """캐시 키 생성. 벡터스토어가 변경되었으면 이전 generation 결과를 비운다."""
+        generation = self._generation()
+        with self._cache_lock:
+            if generation != self._cache_generation:
+                self.result_cache.clear()
+                self._cache_generation = generation
+        return (
+            normalize_query(question), k, search_type, similarity_threshold,
+            tuple(collections) if collections else None, generation
+        )
+
+    def _candidates(self, question, fetch_k, search_type, collections):
+        """검색 방식과 대상 컬렉션에 따라 (질문 임베딩, 후보) 반환"""
+        if collections:
+            if self.collections is None:
+                raise ValueError("Collections are not configured.")
+            source = self.collections
+            kwargs = {"names": collections}
+        else:
+            source = self.vector_db_manager
+            kwargs = {}
+        if search_type == "hybrid":
+            # 벡터 검색 + BM25 결과를 RRF로 합친 후보
+            return source.hybrid_candidates(question, fetch_k=fetch_k, rrf_k=self.rrf_k, **kwargs)
+        return source.search_candidates(question, fetch_k=fetch_k, **kwargs)
+
+    def retrieve_context(self, question, k=3, search_type="similarity", similarity_threshold=0.7, collections=None):
         """
         질문에 대한 컨텍스트를 검색.
+        collections를 지정하면 해당 컬렉션들에서 병렬로 검색한 결과를 합친다 (없으면 기본 컬렉션).
         """
+        cache_key = self._result_cache_key(question, k, search_type, similarity_threshold, collections)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return {"context": cached["context"], "references": list(cached["references"])}
+
         try:
 
-            # 벡터 DB에서 문서 검색
-            docs = self.vector_db_manager.search(
-                query=question, k=k, search_type=search_type, similarity_threshold=similarity_threshold
+            # 벡터 DB에서 후보 청크 검색 (FAISS에 저장된 벡터 포함)
+            query_vector, candidates = self._candidates(
+                question, max(k, k * self.fetch_k_multiplier), search_type, collections
             )
+            if search_type == "similarity_score_threshold":
+                candidates = [candidate for candidate in candidates if candidate[2] >= similarity_threshold]
+            elif search_type not in ("similarity", "mmr", "hybrid"):
+                raise ValueError(f"Unsupported search_type: {search_type}")
 
-            # 검색된 문서의 본문과 메타데이터를 기반으로 컨텍스트 생성
+            # 중복/겹침 제거, MMR 선택, 토큰 예산 적용 (hybrid는 융합 점수를 관련도로 사용)
+            with STAGE_SECONDS.time(stage="context_build"):
+                selected, used_tokens = self.context_builder.build(
+                    query_vector, candidates, k, use_scores=search_type == "hybrid"
+                )
+
+            # 선택된 청크의 본문과 메타데이터를 기반으로 컨텍스트 생성
             references = []
             context_list = []
 
-            for doc in docs:
-                content = doc.page_content  # 본문 내용
+            for content, doc in selected:
                 metadata = doc.metadata  # 메타데이터 (제목, URL 등)
                 title = metadata.get("title", "제목 없음")
                 url = metadata.get("url", "URL 없음")
 
                 context_list.append(f"{content}\n출처: {title} ({url})")
-                references.append({"title": title, "url": url})
+                reference = {"title": title, "url": url}
+                if reference not in references:
+                    references.append(reference)
 
             # 컨텍스트 본문 조합
             context = "\n\n".join(context_list)
 
-            # 결과 반환
-            return {
+            result = {
                 "context": context if context else "주어진 정보에서 질문에 대한 정보를 찾을 수 없습니다.",
                 "references": references
             }
+            self.result_cache.set(cache_key, {"context": result["context"], "references": list(references)})
+
+            # 결과 반환
+            return result
         except Exception as e:
             raise RuntimeError(f"Error during context retrieval: {e}")
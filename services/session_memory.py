@@ -0,0 +1,76 @@
+import threading
+
+from langchain.schema import AIMessage, HumanMessage
+from langchain_community.chat_message_histories import ChatMessageHistory
+from models.models import ChatHistory
+from services.lru_cache import LRUTTLCache
+from services.token_counter import count_tokens
+
+
+class SessionMemory:
+    """
+    사용자별 대화 내역 관리.
+    - 자주 쓰는 세션만 LRU + TTL로 메모리에 유지 (최대 max_sessions개)
+    - 캐시에 없으면 chat_history 테이블의 최근 대화로 복원
+    - 세션당 최대 max_messages개 메시지만 보관
+    - LLM에는 token_budget 안에 들어가는 최근 메시지만 전달
+    """
+
+    def __init__(self, max_sessions=1000, ttl_seconds=1800, max_messages=40, token_budget=2000):
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self._sessions = LRUTTLCache(max_size=max_sessions, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def _rehydrate(self, user_id):
+        """DB에서 최근 대화를 읽어 메시지 내역 복원 (app context 필요)"""
+        history = ChatMessageHistory()
+        rows = (
+            ChatHistory.query.filter_by(user_id=user_id)
+            .order_by(ChatHistory.timestamp.desc())
+            .limit(self.max_messages // 2)
+            .all()
+        )
+        for row in reversed(rows):
+            history.add_message(HumanMessage(content=row.question))
+            history.add_message(AIMessage(content=row.answer))
+        return history
+
+    def get_history(self, user_id):
+        """세션 메시지 내역 반환 (접근 시 TTL 갱신)"""
+        history = self._sessions.get(user_id)
+        if history is not None and self._sessions.touch(user_id, history):
+            return history
+        # 캐시에 없으면 확인/복원/저장을 한 번에 (동시에 놓친 요청이 서로 다른 내역을 만들지 않도록)
+        with self._lock:
+            history = self._sessions.get(user_id)
+            if history is None:
+                history = self._rehydrate(user_id)
+                self._sessions.set(user_id, history)
+            else:
+                self._sessions.touch(user_id, history)
+        return history
+
+    def add_message(self, user_id, message):
+        history = self.get_history(user_id)
+        history.add_message(message)
+        # 세션당 메시지 수 제한
+        if len(history.messages) > self.max_messages:
+            del history.messages[:-self.max_messages]
+
+    def window(self, messages, token_budget=None):
+        """최근 메시지부터 토큰 예산 안에 들어가는 만큼만 반환 (최소 1개)"""
+        budget = self.token_budget if token_budget is None else token_budget
+        selected = []
+        used = 0
+        for message in reversed(messages):
+            tokens = count_tokens(message.content)
+            if selected and used + tokens > budget:
+                break
+            selected.append(message)
+            used += tokens
+        selected.reverse()
+        return selected
+
+    def stats(self):
+        return self._sessions.stats()
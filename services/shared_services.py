@@ -0,0 +1,89 @@
+"""
+프로세스 전역에서 공유하는 서비스 인스턴스.
+모든 Blueprint가 같은 VectorDBManager(FAISS 인덱스)를 사용하므로
+인덱스를 한 번만 메모리에 올리고, 업로드된 문서가 즉시 검색에 반영된다.
+"""
+from services.answer_generator import AnswerGenerator
+from services.document_fetcher import DocumentFetcher
+from services.vector_db_manager import VectorDBManager
+from services.vector_collections import VectorCollections
+from services.retriever_manager import RetrieverManager
+from services.RAG_manager import RAGManager
+from services.ingestion_queue import IngestionJobQueue
+from services.chat_generator import ChatGenerator
+from services.prompt_cache import ActivePromptCache
+from services.session_memory import SessionMemory
+from services.metrics import registry, cache_collector, vector_index_collector
+
+from dotenv import load_dotenv
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Get API keys from environment variables
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Ensure at least one API key is provided
+if not (GOOGLE_API_KEY or OPENAI_API_KEY):
+    raise ValueError("Neither GOOGLE_API_KEY nor OPENAI_API_KEY is set in the environment variables.")
+
+# 클래스 인스턴스 생성 (모듈 import 시 한 번만 생성됨)
+document_fetcher = DocumentFetcher()
+vector_db_manager = VectorDBManager(
+    openai_api_key=OPENAI_API_KEY,
+    google_api_key=GOOGLE_API_KEY
+)
+answer_generator = AnswerGenerator(
+    model="models/gemini-1.5-flash",
+    temperature=0.7,
+    openai_api_key=OPENAI_API_KEY,
+    google_api_key=GOOGLE_API_KEY
+)
+# 이름 있는 컬렉션 (기본 컬렉션은 위 vector_db_manager, 그 외는 faiss_db/collections/<이름>)
+vector_collections = VectorCollections(
+    vector_db_manager,
+    root=os.getenv("VECTOR_COLLECTIONS_ROOT", os.path.join("faiss_db", "collections")),
+    max_workers=int(os.getenv("COLLECTION_SEARCH_WORKERS", "4"))
+)
+retriever_manager = RetrieverManager(vector_db_manager=vector_db_manager, collections=vector_collections)
+rag_manager = RAGManager(
+    retriever_manager=retriever_manager,
+    answer_generator=answer_generator,
+    document_fetcher=document_fetcher,
+    vector_db_manager=vector_db_manager
+)
+# 활성 프롬프트 캐시 (admin_routes에서 프롬프트 변경 시 invalidate)
+active_prompt_cache = ActivePromptCache(
+    version_file=os.getenv("PROMPT_VERSION_FILE", "prompt_version")
+)
+# LLM 클라이언트와 대화 내역을 재사용하는 채팅 생성기
+session_memory = SessionMemory(
+    max_sessions=int(os.getenv("CHAT_MEMORY_MAX_SESSIONS", "1000")),
+    ttl_seconds=int(os.getenv("CHAT_MEMORY_TTL", "1800")),
+    max_messages=int(os.getenv("CHAT_MEMORY_MAX_MESSAGES", "40")),
+    token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+)
+chat_generator = ChatGenerator(
+    retriever_manager,
+    prompt_cache=active_prompt_cache,
+    session_memory=session_memory,
+    openai_api_key=OPENAI_API_KEY,
+    google_api_key=GOOGLE_API_KEY
+)
+# 문서 수집 작업 큐 (app.py에서 init_app으로 워커 시작)
+ingestion_queue = IngestionJobQueue(
+    document_fetcher=document_fetcher,
+    vector_db_manager=vector_db_manager,
+    worker_count=int(os.getenv("INGESTION_WORKERS", "2")),
+    collections=vector_collections
+)
+# /metrics 조회 시점에 수집하는 캐시 적중률과 인덱스 크기
+registry.add_collector(cache_collector({
+    "query_embedding": vector_db_manager.query_embedding_cache,
+    "embedding": vector_db_manager.embedding_cache,
+    "retrieval_result": retriever_manager.result_cache,
+    "session_memory": session_memory,
+}))
+registry.add_collector(vector_index_collector(vector_collections))
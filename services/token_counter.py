@@ -0,0 +1,24 @@
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # 인코딩 파일을 받을 수 없는 환경에서는 글자 수 기반으로 근사
+            print(f"⚠️ tiktoken 인코딩 로드 실패, 글자 수로 토큰을 근사합니다: {e}")
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    """텍스트 토큰 수 (tiktoken cl100k_base 기준, Gemini 토큰 수의 근사치)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,118 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.bm25_index import fuse_hits
+from services.vector_db_manager import VectorDBManager
+
+
+class VectorCollections:
+    """
+    이름 있는 벡터 컬렉션 (부서별, 출처 유형별 등).
+    컬렉션마다 별도의 FAISS 인덱스, 락, WAL을 가지므로 한 컬렉션에 쓰는 동안 다른 컬렉션의 검색이 막히지 않는다.
+    임베딩 모델과 캐시는 기본 컬렉션의 것을 공유하며, 검색은 선택된 컬렉션들에 스레드 풀로 동시에 요청한 뒤
+    상위 결과만 합친다.
+    """
+
+    DEFAULT = "default"
+    _NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+    def __init__(self, default_manager, root="faiss_db/collections", max_workers=4):
+        """
+        :param default_manager: 기본 컬렉션 (기존 faiss_db)
+        :param root: 추가 컬렉션 디렉터리 (root/<이름>)
+        """
+        self.default_manager = default_manager
+        self.root = root
+        self._managers = {self.DEFAULT: default_manager}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collection-search")
+
+        # 디스크에 있는 컬렉션 로드
+        if os.path.isdir(root):
+            for name in sorted(os.listdir(root)):
+                if self._NAME_RE.match(name) and os.path.isdir(os.path.join(root, name)):
+                    self.get(name)
+
+    @classmethod
+    def validate_name(cls, name):
+        if not name or not cls._NAME_RE.match(name):
+            raise ValueError(f"Invalid collection name: {name!r} (영문, 숫자, '-', '_' 64자 이내)")
+        return name
+
+    def get(self, name=None, create=True):
+        """
+        컬렉션의 VectorDBManager 반환 (이름이 없으면 기본 컬렉션).
+        create=False이면 없는 컬렉션에 대해 KeyError.
+        """
+        name = name or self.DEFAULT
+        manager = self._managers.get(name)
+        if manager is not None:
+            return manager
+        self.validate_name(name)
+        with self._lock:
+            manager = self._managers.get(name)
+            if manager is None:
+                if not create:
+                    raise KeyError(f"Collection not found: {name}")
+                print(f"📚 벡터 컬렉션 로드: {name}")
+                manager = VectorDBManager(
+                    openai_api_key=None,
+                    google_api_key=None,
+                    vectorstore_path=os.path.join(self.root, name),
+                    shared=self.default_manager
+                )
+                self._managers[name] = manager
+        return manager
+
+    def names(self):
+        return list(self._managers)
+
+    @property
+    def generation(self):
+        """어느 컬렉션이든 변경되거나 새로 생기면 증가하는 값 (검색 결과 캐시 무효화용)"""
+        managers = list(self._managers.values())
+        return sum(manager.generation for manager in managers) + len(managers)
+
+    def _select(self, names):
+        """검색할 (이름, 매니저) 목록. names가 없으면 전체 컬렉션"""
+        if not names:
+            return list(self._managers.items())
+        return [(name, self.get(name, create=False)) for name in dict.fromkeys(names)]
+
+    def search_candidates(self, query, fetch_k, names=None):
+        """
+        선택된 컬렉션들에서 병렬 검색 후 관련도 순 상위 fetch_k개.
+        :return: (질문 임베딩, [(Document, 벡터, 관련도 점수)])
+        """
+        selected = self._select(names)
+        embedding = self.default_manager.generate_embedding(query)
+        futures = [
+            self._executor.submit(manager.candidates_by_vector, embedding, fetch_k)
+            for _, manager in selected
+        ]
+        candidates = [candidate for future in futures for candidate in future.result()]
+        candidates.sort(key=lambda candidate: candidate[2], reverse=True)
+        return embedding, candidates[:fetch_k]
+
+    def hybrid_candidates(self, query, fetch_k, rrf_k=60, names=None):
+        """
+        선택된 컬렉션들의 벡터/BM25 결과를 각각 점수 순으로 합친 뒤 RRF로 융합.
+        :return: (질문 임베딩, [(Document, 벡터, RRF 점수)])
+        """
+        selected = self._select(names)
+        embedding = self.default_manager.generate_embedding(query)
+        futures = [
+            (name, self._executor.submit(manager.hybrid_hits, query, embedding, fetch_k))
+            for name, manager in selected
+        ]
+        vector_hits, lexical_hits = [], []
+        for name, future in futures:
+            collection_vector_hits, collection_lexical_hits = future.result()
+            # 컬렉션 간 ID 충돌을 피하도록 (컬렉션, 문서 ID)를 키로 사용
+            vector_hits.extend(((name, doc_id), doc, vector, score) for doc_id, doc, vector, score in collection_vector_hits)
+            lexical_hits.extend(((name, doc_id), doc, vector, score) for doc_id, doc, vector, score in collection_lexical_hits)
+        vector_hits.sort(key=lambda hit: hit[3], reverse=True)
+        lexical_hits.sort(key=lambda hit: hit[3], reverse=True)
+        return embedding, fuse_hits(vector_hits[:fetch_k], lexical_hits[:fetch_k], fetch_k, k=rrf_k)
@@ -3,59 +3,828 @@ from langchain_community.vectorstores import FAISS
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_core.documents import Document
 from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
 from langchain_openai import OpenAI, OpenAIEmbeddings
+from services.rw_lock import ReadWriteLock
+from services.embedding_cache import EmbeddingCache
+from services.lru_cache import LRUTTLCache, normalize_query
+from services.vector_wal import VectorWriteAheadLog, DirectoryOwnerLock
+from services.embedding_executor import EmbeddingExecutor
+from services.faiss_index import (
+    IndexConfig, index_kind, index_encoding, build_index, prepare_index, extract_vectors,
+    tombstone_selector, search_parameters, exact_scores, index_memory_bytes
+)
+from services.full_vector_store import FullVectorStore
+from services.metadata_index import MetadataIndex
+from services.bm25_index import BM25Index, tokenize, fuse_hits
+from services.metrics import STAGE_SECONDS, INGESTION_STAGE_SECONDS, INGESTION_ITEMS
+import faiss
+import numpy as np
+import hashlib
+import json
+import shutil
+import threading
+import uuid
 import os
 
 class VectorDBManager:
-    def __init__(self, openai_api_key, google_api_key):
+    def __init__(self, openai_api_key, google_api_key, vectorstore_path="faiss_db", shared=None, embedding_model=None):
+        """
+        :param vectorstore_path: 스냅샷/WAL/보조 인덱스를 저장할 디렉터리 (컬렉션마다 별도)
+        :param shared: 임베딩 모델과 캐시를 공유할 VectorDBManager (컬렉션 생성 시)
+        :param embedding_model: API 키 대신 사용할 LangChain Embeddings 구현 (벤치마크 등)
+        """
         self.submitted_docs = [] 
         self.vectorstore = None
         self.embedding_model = None
-        self.vectorstore_path = "faiss_db"
+        self.vectorstore_path = vectorstore_path
+        # 검색은 read lock으로 병렬 수행, 변경은 write lock으로 단독 반영
+        self._lock = ReadWriteLock()
+        # writer 간 직렬화 (임베딩은 이 락 밖에서 수행)
+        self._write_mutex = threading.Lock()
+        # 벡터스토어가 변경될 때마다 증가
+        self.generation = 0
+        # WAL 크기가 이 값을 넘으면 백그라운드에서 새 스냅샷으로 compaction
+        self.wal_compact_bytes = int(os.getenv("VECTOR_WAL_COMPACT_BYTES", str(64 * 1024 * 1024)))
+        self._compaction_lock = threading.Lock()
+        # 인덱스 종류(flat/hnsw/ivf) 및 검색 파라미터. auto면 벡터 수에 따라 자동 전환
+        self.index_config = IndexConfig(
+            index_type=os.getenv("FAISS_INDEX_TYPE", "auto"),
+            hnsw_min_vectors=int(os.getenv("FAISS_HNSW_MIN_VECTORS", "20000")),
+            ivf_min_vectors=int(os.getenv("FAISS_IVF_MIN_VECTORS", "200000")),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            hnsw_ef_construction=int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200")),
+            hnsw_ef_search=int(os.getenv("FAISS_HNSW_EF_SEARCH", "64")),
+            ivf_nprobe=int(os.getenv("FAISS_IVF_NPROBE", "16")),
+            quantization=os.getenv("FAISS_QUANTIZATION", "none").lower(),
+            pq_m=int(os.getenv("FAISS_PQ_M", "0"))
+        )
+        # 양자화 인덱스 검색 시 k * rescore_factor개 후보를 원본 벡터로 다시 정렬 (1 이하면 사용 안 함)
+        self.rescore_factor = int(os.getenv("FAISS_RESCORE_FACTOR", "4"))
+        self.full_vectors = None
+        self._migration_lock = threading.Lock()
+        # 삭제된 벡터는 인덱스에 남겨 두고 검색에서만 제외 (삭제 표시).
+        # 전체 벡터 중 이 비율을 넘으면 compaction 때 인덱스를 재구성하여 실제로 제거한다
+        self.tombstone_ratio = float(os.getenv("FAISS_TOMBSTONE_RATIO", "0.2"))
         
-        # Initialize embedding model based on the available API key
-        if google_api_key:
-            os.environ["GOOGLE_API_KEY"] = google_api_key
-            self.embedding_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-        elif openai_api_key:
-            self.embedding_model = OpenAIEmbeddings(openai_api_key=openai_api_key)
+        if shared is not None:
+            # 다른 컬렉션과 임베딩 모델, 캐시, 실행기를 공유
+            for name in ("embedding_model", "embedding_model_name", "embedding_cache",
+                         "embedding_executor", "query_embedding_cache"):
+                setattr(self, name, getattr(shared, name))
         else:
-            raise ValueError("Either google_api_key or openai_api_key must be provided.")
+            self._init_embedding(openai_api_key, google_api_key, embedding_model)
             
-        # 벡터스토어 로드 (없으면 빈 DB 생성)
-        if os.path.exists(self.vectorstore_path):
+        # 스냅샷/WAL은 이 프로세스만 기록 (다른 프로세스가 사용 중이면 RuntimeError)
+        self._owner_lock = DirectoryOwnerLock(self.vectorstore_path)
+        self._owner_lock.acquire()
+
+        # 벡터스토어 로드 (스냅샷 + WAL 재생, 없으면 빈 DB 생성)
+        snapshot_path, wal_from = self._current_snapshot()
+        if os.path.exists(os.path.join(snapshot_path, "index.faiss")):
             try:
                 self.vectorstore = FAISS.load_local(
-                    self.vectorstore_path, 
+                    snapshot_path, 
                     self.embedding_model,
                     allow_dangerous_deserialization=True
                     )
+                # 스냅샷에 저장된 보조 인덱스가 없거나 docstore와 맞지 않으면 다시 구성
+                self.metadata_index = MetadataIndex.load(snapshot_path)
+                if self.metadata_index is None or len(self.metadata_index) != len(self.vectorstore.docstore._dict):
+                    self.metadata_index = MetadataIndex.from_docstore(self.vectorstore.docstore._dict)
+                self.bm25_index = BM25Index.load(snapshot_path)
+                if self.bm25_index is None or len(self.bm25_index) != len(self.vectorstore.docstore._dict):
+                    print("🔄 BM25 인덱스를 docstore로부터 구성합니다...")
+                    self.bm25_index = BM25Index.from_docstore(self.vectorstore.docstore._dict)
                 print("✅ 기존 FAISS 벡터스토어를 로드했습니다.")
             except Exception as e:
                 print(f"❌ FAISS 벡터스토어 로드 실패: {e}. 새 벡터스토어 생성 중...")
                 self.initialize_empty_vectorstore()
+                wal_from = 0
         else:
             print("🔄 새 빈 FAISS 벡터스토어를 생성합니다.")
             self.initialize_empty_vectorstore()
+            wal_from = 0
+
+        prepare_index(self.vectorstore.index, self.index_config)
+        self._rebuild_position_map()
+        self._reset_tombstones()
+
+        # 양자화 사용 시 원본 벡터를 디스크에 보관 (재점수화/재구성용)
+        full_vectors_path = os.path.join(self.vectorstore_path, "full_vectors.sqlite3")
+        if self.index_config.quantization != "none" or os.path.exists(full_vectors_path):
+            os.makedirs(self.vectorstore_path, exist_ok=True)
+            self.full_vectors = FullVectorStore(full_vectors_path)
+
+        # 스냅샷 이후의 변경분 재생
+        self.wal = VectorWriteAheadLog(os.path.join(self.vectorstore_path, "wal"))
+        self.wal.remove_segments_before(wal_from)
+        self._replay_wal(wal_from)
+        self._maybe_migrate_index()
+
+    def _init_embedding(self, openai_api_key, google_api_key, embedding_model=None):
+        """임베딩 모델, 청크 임베딩 캐시, 임베딩 실행기, 질문 임베딩 캐시 생성"""
+        # Initialize embedding model based on the available API key
+        if embedding_model is not None:
+            self.embedding_model = embedding_model
+            self.embedding_model_name = f"custom:{type(embedding_model).__name__}"
+        elif google_api_key:
+            os.environ["GOOGLE_API_KEY"] = google_api_key
+            self.embedding_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+            self.embedding_model_name = "google:models/text-embedding-004"
+        elif openai_api_key:
+            self.embedding_model = OpenAIEmbeddings(openai_api_key=openai_api_key)
+            self.embedding_model_name = f"openai:{self.embedding_model.model}"
+        else:
+            raise ValueError("Either google_api_key or openai_api_key must be provided.")
+
+        # 청크 임베딩 캐시 (재업로드/중복 청크의 임베딩 API 호출 방지)
+        self.embedding_cache = EmbeddingCache(
+            path=os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+            max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+        )
+        # 배치/병렬/속도 제한이 적용된 임베딩 실행기
+        self.embedding_executor = EmbeddingExecutor(
+            self.embedding_model,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "100")),
+            max_concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", "4")),
+            requests_per_second=float(os.getenv("EMBEDDING_REQUESTS_PER_SECOND", "0")),
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+        )
+        # 질문 임베딩 캐시 (자주 묻는 질문의 임베딩 API 왕복 제거)
+        self.query_embedding_cache = LRUTTLCache(
+            max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+            ttl_seconds=int(os.getenv("QUERY_CACHE_TTL", "3600"))
+        )
 
     def initialize_empty_vectorstore(self):
         """빈 벡터스토어 초기화 (기본 문서 추가)"""
         default_doc = Document(page_content="This is a default document.", metadata={"title": "Default"})
         self.vectorstore = FAISS.from_documents([default_doc], embedding=self.embedding_model)
+        self.metadata_index = MetadataIndex.from_docstore(self.vectorstore.docstore._dict)
+        self.bm25_index = BM25Index.from_docstore(self.vectorstore.docstore._dict)
         self.vectorstore.save_local(self.vectorstore_path)
+        current_file = os.path.join(self.vectorstore_path, "CURRENT")
+        if os.path.exists(current_file):
+            os.remove(current_file)
         print("✅ 기본 문서를 사용하여 벡터스토어를 초기화했습니다.")
 
+    def _current_snapshot(self):
+        """
+        현재 스냅샷 경로와 재생을 시작할 WAL 세그먼트 번호.
+        CURRENT 파일이 없으면 vectorstore_path에 직접 저장된 기존 형식을 사용.
+        """
+        current_file = os.path.join(self.vectorstore_path, "CURRENT")
+        if os.path.exists(current_file):
+            with open(current_file, encoding="utf-8") as f:
+                current = json.load(f)
+            return os.path.join(self.vectorstore_path, current["snapshot"]), current["wal_from"]
+        return self.vectorstore_path, 0
+
+    def _replay_wal(self, wal_from):
+        """
+        WAL 레코드를 스냅샷 위에 순서대로 재생.
+        스냅샷과 겹치는 레코드가 있을 수 있으므로 추가/삭제 모두 멱등하게 처리.
+        """
+        added = deleted = 0
+        for record in self.wal.replay(wal_from):
+            if record["op"] == "add":
+                added += self._replay_add(record)
+            elif record["op"] == "delete":
+                deleted += len(self._delete_ids(record["ids"]))
+            elif record["op"] == "upsert":
+                deleted += len(self._delete_ids(record["delete_ids"]))
+                added += self._replay_add(record)
+        if added or deleted:
+            print(f"🔁 WAL 재생 완료: 추가 {added}개, 삭제 {deleted}개")
+
+    def _replay_add(self, record):
+        """WAL 추가 레코드 재생 (이미 있는 ID는 건너뜀). 추가된 청크 수 반환"""
+        existing = self.vectorstore.docstore._dict
+        rows = {}
+        for doc_id, text, metadata, embedding in zip(
+            record["ids"], record["texts"], record["metadatas"], record["embeddings"]
+        ):
+            if doc_id not in existing:
+                rows[doc_id] = (text, metadata, embedding)
+        if rows:
+            self._apply_add(
+                list(rows),
+                [text for text, _, _ in rows.values()],
+                [metadata for _, metadata, _ in rows.values()],
+                [embedding for _, _, embedding in rows.values()],
+                [tokenize(text) for text, _, _ in rows.values()]
+            )
+        self._store_full_vectors(record["ids"], record["embeddings"])
+        return len(rows)
+
     def generate_embedding(self, text):
-        """generate text embedding"""
+        """generate text embedding (질문 임베딩 캐시 사용)"""
         if not self.embedding_model:
             raise ValueError("Embedding model is not initialized.")
-        return self.embedding_model.embed_query(text)
+        query = normalize_query(text)
+        embedding = self.query_embedding_cache.get(query)
+        if embedding is None:
+            with STAGE_SECONDS.time(stage="query_embedding"):
+                embedding = self.embedding_model.embed_query(query)
+            self.query_embedding_cache.set(query, embedding)
+        return embedding
+
+    def embed_texts(self, texts, progress_callback=None):
+        """
+        청크 텍스트 임베딩. 캐시에 있는 벡터는 재사용하고
+        없는 텍스트만 (중복 제거 후) 임베딩 실행기로 요청한다.
+        완료된 배치는 즉시 캐시에 저장되므로 중간에 실패해도 재시도 시 이어서 처리된다.
+        progress_callback(embedded, total)로 진행 상황을 보고한다.
+        :return: (벡터 리스트, 임베딩 통계 dict)
+        """
+        vectors = self.embedding_cache.get_many(self.embedding_model_name, texts)
+        reused = sum(1 for vector in vectors if vector is not None)
+        if progress_callback:
+            progress_callback(reused, len(texts))
+        missing_texts = list(dict.fromkeys(
+            text for text, vector in zip(texts, vectors) if vector is None
+        ))
 
-    def add_doc_to_db(self, doc):
+        stats = {"embedded": 0, "batches": 0, "retries": 0, "seconds": 0.0, "embeddings_per_second": None}
+        if missing_texts:
+            progress = {"done": reused, "lock": threading.Lock()}
+
+            def on_batch(batch_texts, batch_vectors):
+                self.embedding_cache.put_many(self.embedding_model_name, batch_texts, batch_vectors)
+                if progress_callback:
+                    with progress["lock"]:
+                        progress["done"] = min(len(texts), progress["done"] + len(batch_texts))
+                        done = progress["done"]
+                    progress_callback(done, len(texts))
+
+            with INGESTION_STAGE_SECONDS.time(stage="embed"):
+                new_vectors, stats = self.embedding_executor.embed(missing_texts, on_batch=on_batch)
+            INGESTION_ITEMS.inc(len(missing_texts), stage="embed")
+            computed = dict(zip(missing_texts, new_vectors))
+            vectors = [vector if vector is not None else computed[text] for text, vector in zip(texts, vectors)]
+            if progress_callback:
+                progress_callback(len(texts), len(texts))
+
+        stats["cache_hits"] = reused
+        stats["total"] = len(texts)
+        print(f"🧠 임베딩 완료: {stats}, 캐시 누적 {self.embedding_cache.stats()}")
+        return vectors, stats
+
+    def _add_documents(self, documents, progress_callback=None):
+        """
+        청크를 임베딩한 뒤 write lock 안에서 한 번에 벡터스토어에 반영하고 WAL에 기록.
+        임베딩 API 호출은 락 밖에서 수행하므로 그동안 검색이 막히지 않으며,
+        디스크 쓰기는 전체 인덱스가 아닌 새 청크 크기에만 비례한다.
+        """
+        texts = [document.page_content for document in documents]
+        metadatas = [document.metadata for document in documents]
+        ids = [getattr(document, "id", None) or str(uuid.uuid4()) for document in documents]
+        embeddings, embedding_stats = self.embed_texts(texts, progress_callback=progress_callback)
+        token_lists = [tokenize(text) for text in texts]
+
+        with INGESTION_STAGE_SECONDS.time(stage="persist"), self._write_mutex:
+            with self._lock.write_lock():
+                self._apply_add(ids, texts, metadatas, embeddings, token_lists)
+                self.generation += 1
+            try:
+                self.wal.append_add(ids, texts, metadatas, embeddings)
+            except Exception:
+                # 디스크 기록 실패 시 메모리 반영도 되돌림
+                self._delete_ids(ids)
+                raise
+            self._store_full_vectors(ids, embeddings)
+        INGESTION_ITEMS.inc(len(ids), stage="persist")
+        self._maybe_compact()
+        self._maybe_migrate_index()
+        return embedding_stats
+
+    def _apply_add(self, ids, texts, metadatas, embeddings, token_lists):
+        """
+        임베딩된 청크를 인덱스/docstore/보조 인덱스에 추가 (write lock 보유 상태 또는 시작 시 호출).
+        삭제 표시된 벡터도 인덱스에 남아 있으므로 새 위치는 매핑 크기가 아닌 ntotal부터 매긴다
+        (FAISS.add_embeddings는 매핑 크기부터 매겨 살아 있는 청크의 매핑을 덮어쓰므로 사용하지 않음).
+        """
+        existing = self.vectorstore.docstore._dict
+        if len(set(ids)) != len(ids) or any(doc_id in existing for doc_id in ids):
+            raise ValueError(f"Tried to add ids that already exist: {[doc_id for doc_id in ids if doc_id in existing]}")
+        vectors = np.array(embeddings, dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(vectors)
+        index = self.vectorstore.index
+        start = index.ntotal
+        index.add(vectors)
+        try:
+            self.vectorstore.docstore.add({
+                doc_id: Document(page_content=text, metadata=metadata, id=doc_id)
+                for doc_id, text, metadata in zip(ids, texts, metadatas)
+            })
+        except Exception:
+            # 문서가 연결되지 않은 벡터는 삭제 표시하여 검색에서 빼고 compaction 때 제거
+            self._tombstones.update(range(start, index.ntotal))
+            self._tombstone_selector = tombstone_selector(self._tombstones)
+            raise
+        self.vectorstore.index_to_docstore_id.update((start + offset, doc_id) for offset, doc_id in enumerate(ids))
+        self._id_to_position.update((doc_id, start + offset) for offset, doc_id in enumerate(ids))
+        self.metadata_index.add(ids, metadatas)
+        self.bm25_index.add(ids, token_lists)
+
+    def _apply_delete(self, ids):
+        """
+        문서 ID들을 삭제하고 실제로 삭제된 ID 목록을 반환 (write lock 보유 상태 또는 시작 시 호출).
+        벡터는 인덱스에 남긴 채 위치만 삭제 표시하므로 삭제 비용은 인덱스 크기와 무관하며,
+        표시된 벡터는 compaction/인덱스 재구성 때 실제로 제거된다.
+        """
+        present = [doc_id for doc_id in dict.fromkeys(ids) if doc_id in self._id_to_position]
+        if not present:
+            return []
+        mapping = self.vectorstore.index_to_docstore_id
+        for doc_id in present:
+            position = self._id_to_position.pop(doc_id)
+            del mapping[position]
+            self._tombstones.add(position)
+        self._tombstone_selector = tombstone_selector(self._tombstones)
+        self.vectorstore.docstore.delete(present)
+        self.metadata_index.remove(present)
+        self.bm25_index.remove(present)
+        self.generation += 1
+        return present
+
+    def _snapshot_chunks(self, ids):
+        """삭제 전 청크의 (ID, 위치, Document) (read lock 보유 상태에서 호출, 삭제를 되돌릴 때 사용)"""
+        return [
+            (doc_id, self._id_to_position[doc_id], self.vectorstore.docstore._dict[doc_id])
+            for doc_id in ids if doc_id in self._id_to_position
+        ]
+
+    def _restore_chunks(self, chunks):
+        """
+        _snapshot_chunks로 기록한 청크의 삭제 표시를 되돌림 (write lock 보유 상태에서 호출).
+        삭제는 위치를 비워 두기만 하므로 그 사이 인덱스가 재구성되지 않았다면 같은 위치에 그대로 복구된다.
+        """
+        if not chunks:
+            return
+        for doc_id, position, _ in chunks:
+            self.vectorstore.index_to_docstore_id[position] = doc_id
+            self._id_to_position[doc_id] = position
+            self._tombstones.discard(position)
+        self._tombstone_selector = tombstone_selector(self._tombstones)
+        self.vectorstore.docstore.add({doc_id: document for doc_id, _, document in chunks})
+        self.metadata_index.add([doc_id for doc_id, _, _ in chunks], [document.metadata for _, _, document in chunks])
+        self.bm25_index.add(
+            [doc_id for doc_id, _, _ in chunks], [tokenize(document.page_content) for _, _, document in chunks]
+        )
+
+    def _delete_ids(self, ids):
+        """
+        문서 ID들을 벡터스토어에서 삭제하고 실제로 삭제된 ID 목록을 반환
+        (_write_mutex 보유 상태 또는 시작 시 호출).
+        """
+        with self._lock.write_lock():
+            present = self._apply_delete(ids)
+        if present and self.full_vectors is not None:
+            self.full_vectors.delete_many(present)
+        return present
+
+    def _reset_tombstones(self):
+        """인덱스에는 있지만 index_to_docstore_id에 없는 위치(삭제 표시)를 다시 계산 (인덱스 교체/로드 시)"""
+        mapping = self.vectorstore.index_to_docstore_id
+        self._tombstones = {
+            position for position in range(self.vectorstore.index.ntotal) if position not in mapping
+        }
+        self._tombstone_selector = tombstone_selector(self._tombstones)
+
+    def _rebuild_position_map(self):
+        """문서 ID → 인덱스 위치 역매핑 재구성 (index_to_docstore_id가 새로 번호 매겨질 때)"""
+        self._id_to_position = {
+            doc_id: position for position, doc_id in self.vectorstore.index_to_docstore_id.items()
+        }
+
+    def _store_full_vectors(self, ids, embeddings):
+        """원본 벡터 저장소에 기록 (인덱스와 같은 정규화 적용)"""
+        if self.full_vectors is None or not ids:
+            return
+        vectors = np.array(embeddings, dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(vectors)
+        self.full_vectors.put_many(ids, vectors)
+
+    def _exact_vectors(self, ids, vectors, exact):
+        """
+        인덱스 재구성에 쓸 벡터. 현재 인덱스가 float32면 그 값을 원본 저장소에 채워 두고,
+        양자화된 인덱스면 원본 저장소의 벡터로 바꾼다 (없는 것은 복원값 사용).
+        """
+        if self.full_vectors is None or not ids:
+            return vectors
+        if exact:
+            self.full_vectors.put_many(ids, vectors)
+            return vectors
+        stored = self.full_vectors.get_many(ids)
+        return np.array([stored.get(doc_id, vector) for doc_id, vector in zip(ids, vectors)], dtype=np.float32)
+
+    def _maybe_migrate_index(self):
+        """
+        벡터 수가 임계값을 넘어 더 적합한 인덱스 종류가 있으면 백그라운드에서 재구성.
+        auto 모드에서는 flat → hnsw → ivf 방향으로만 전환한다.
+        """
+        with self._lock.read_lock():
+            vector_count = len(self.vectorstore.index_to_docstore_id)
+            current = index_kind(self.vectorstore.index)
+            current_encoding = index_encoding(self.vectorstore.index)
+        target = self.index_config.target_kind(vector_count)
+        order = {"flat": 0, "hnsw": 1, "ivf": 2}
+        if self.index_config.index_type == "auto" and order[target] < order[current]:
+            target = current
+        if vector_count == 0 or (target, self.index_config.quantization) == (current, current_encoding):
+            return
+        if not self._migration_lock.acquire(blocking=False):
+            return  # 이미 진행 중
+
+        def run():
+            try:
+                self.migrate_index(target)
+            except Exception as e:
+                print(f"❌ FAISS 인덱스 재구성 실패: {e}")
+            finally:
+                self._migration_lock.release()
+
+        threading.Thread(target=run, name="faiss-migration", daemon=True).start()
+
+    def migrate_index(self, kind, snapshot=True):
+        """
+        남아 있는 벡터를 같은 순서로 새 종류/저장 방식의 인덱스에 옮김 (docstore, 문서 ID 유지).
+        삭제 표시된 위치는 이때 실제로 제거되고 뒤의 위치가 앞으로 당겨진다.
+        학습/구성은 락 밖에서 하고, 그동안 추가된 벡터만 write mutex 안에서 이어 붙인 뒤 교체하며,
+        그동안 삭제된 문서는 새 인덱스에서 다시 삭제 표시된다.
+        :param snapshot: 전환 후 스냅샷 저장 여부 (compaction 중 호출 시 False)
+        """
+        with self._lock.read_lock():
+            index = self.vectorstore.index
+            base_count = index.ntotal
+            mapping = self.vectorstore.index_to_docstore_id
+            positions = [position for position in range(base_count) if position in mapping]
+            ids = [mapping[position] for position in positions]
+            vectors = extract_vectors(index)
+            if len(positions) < base_count:
+                vectors = vectors[positions]
+            exact = index_encoding(index) == "none"
+            metric_type = index.metric_type
+
+        encoding = self.index_config.quantization
+        print(f"🔧 FAISS 인덱스를 {kind}/{encoding}(으)로 재구성합니다 (벡터 {len(positions)}개)...")
+        vectors = self._exact_vectors(ids, vectors, exact)
+        new_index = build_index(kind, vectors, metric_type, self.index_config)
+
+        with self._write_mutex:
+            # 다른 writer는 모두 _write_mutex를 잡으므로 여기서 읽은 매핑은 교체 시점까지 그대로다
+            with self._lock.read_lock():
+                index = self.vectorstore.index
+                mapping = self.vectorstore.index_to_docstore_id
+                tail_positions = [position for position in range(base_count, index.ntotal) if position in mapping]
+                tail_ids = [mapping[position] for position in tail_positions]
+                tail = extract_vectors(index, start=base_count)[[position - base_count for position in tail_positions]]
+            tail = self._exact_vectors(tail_ids, tail, exact)
+            if len(tail):
+                new_index.add(tail)
+            old_positions = positions + tail_positions
+            with self._lock.write_lock():
+                self.vectorstore.index = new_index
+                self.vectorstore.index_to_docstore_id = {
+                    new_position: mapping[old_position]
+                    for new_position, old_position in enumerate(old_positions)
+                    if old_position in mapping
+                }
+                self._rebuild_position_map()
+                self._reset_tombstones()
+                self.generation += 1
+
+        print(f"✅ FAISS 인덱스를 {kind}/{encoding}(으)로 전환했습니다.")
+        if snapshot:
+            # 새 인덱스 형식을 스냅샷으로 저장
+            self.compact()
+        if encoding != "none":
+            self._write_quantization_report()
+        return True
+
+    def _purge_tombstones(self):
+        """
+        삭제 표시된 벡터를 뺀 인덱스로 재구성 (_compaction_lock 보유 상태에서 호출).
+        인덱스 전환이 진행 중이면 그쪽에서 제거되므로 건너뛴다.
+        """
+        with self._lock.read_lock():
+            kind = index_kind(self.vectorstore.index)
+            if not self._tombstones or not self.vectorstore.index_to_docstore_id:
+                return
+        if not self._migration_lock.acquire(blocking=False):
+            return
+        try:
+            self.migrate_index(kind, snapshot=False)
+        finally:
+            self._migration_lock.release()
+
+    def quantization_report(self, sample_size=200, k=10):
+        """
+        현재 인덱스의 메모리 사용량과 recall@k.
+        저장된 벡터 sample_size개를 질문으로 삼아 원본 벡터 전수 검색 결과(정답) 대비
+        인덱스 검색이 찾은 비율을 재점수화 전/후로 계산한다.
+        """
+        if self.full_vectors is None:
+            raise ValueError("원본 벡터 저장소가 없습니다. FAISS_QUANTIZATION을 설정하세요.")
+
+        with self._lock.read_lock():
+            index = self.vectorstore.index
+            report = {
+                "index_type": index_kind(index),
+                "quantization": index_encoding(index),
+                "vector_count": index.ntotal,
+                "dimension": index.d,
+                "index_bytes": index_memory_bytes(index),
+                "float32_bytes": index.ntotal * index.d * 4,
+            }
+            metric_type = index.metric_type
+            live_ids = sorted(self.vectorstore.index_to_docstore_id.values())
+        report["compression_ratio"] = round(report["float32_bytes"] / max(1, report["index_bytes"]), 2)
+
+        rng = np.random.default_rng(0)
+        sample_ids = list(rng.choice(live_ids, size=min(sample_size, len(live_ids)), replace=False))
+        stored = self.full_vectors.get_many(sample_ids)
+        sample_ids = [doc_id for doc_id in sample_ids if doc_id in stored]
+        if not sample_ids:
+            return report
+        queries = np.stack([stored[doc_id] for doc_id in sample_ids])
+
+        # 원본 벡터 전수 검색 (배치 단위로 읽어 상위 k개만 유지, 작을수록 가까운 거리로 통일)
+        live = set(live_ids)
+        top_distances = np.empty((len(queries), 0), dtype=np.float32)
+        top_ids = np.empty((len(queries), 0), dtype=object)
+        for batch_ids, matrix in self.full_vectors.iter_batches():
+            keep = [i for i, doc_id in enumerate(batch_ids) if doc_id in live]
+            if not keep:
+                continue
+            matrix = matrix[keep]
+            distances = np.stack([exact_scores(query, matrix, metric_type) for query in queries])
+            if metric_type == faiss.METRIC_INNER_PRODUCT:
+                distances = -distances
+            candidate_ids = np.tile(np.array([batch_ids[i] for i in keep], dtype=object), (len(queries), 1))
+            distances = np.hstack([top_distances, distances])
+            candidate_ids = np.hstack([top_ids, candidate_ids])
+            order = np.argsort(distances, axis=1)[:, :k]
+            top_distances = np.take_along_axis(distances, order, axis=1)
+            top_ids = np.take_along_axis(candidate_ids, order, axis=1)
+        truth = [set(row) for row in top_ids]
+
+        def recall(rescore):
+            found = 0
+            with self._lock.read_lock():
+                for query, expected in zip(queries, truth):
+                    hits = self._index_search(query, k, rescore=rescore)
+                    found += len(expected & {doc_id for doc_id, _, _, _ in hits})
+            return round(found / sum(len(expected) for expected in truth), 4)
+
+        report.update({
+            "k": k,
+            "queries": len(queries),
+            "recall_at_k": recall(False),
+            "recall_at_k_rescored": recall(True),
+            "rescore_factor": self.rescore_factor,
+        })
+        return report
+
+    def _write_quantization_report(self):
+        """양자화 인덱스 전환 후 메모리/recall 리포트를 로그와 파일로 남김"""
+        try:
+            report = self.quantization_report()
+        except Exception as e:
+            print(f"❌ 양자화 리포트 생성 실패: {e}")
+            return
+        with open(os.path.join(self.vectorstore_path, "quantization_report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📊 양자화 리포트: {report}")
+
+    def get_index_info(self):
+        """현재 인덱스 종류와 검색 파라미터"""
+        with self._lock.read_lock():
+            index = self.vectorstore.index
+            return {
+                "index_type": index_kind(index),
+                "quantization": index_encoding(index),
+                "vector_count": index.ntotal,
+                "deleted_vectors": len(self._tombstones),
+                "dimension": index.d,
+                "nprobe": self.index_config.ivf_nprobe,
+                "ef_search": self.index_config.hnsw_ef_search,
+            }
+
+    def _maybe_compact(self):
+        """
+        WAL이 임계값을 넘거나 삭제 표시된 벡터가 tombstone_ratio를 넘으면 백그라운드 스레드에서 compaction 실행.
+        compaction은 삭제 표시된 벡터를 뺀 인덱스로 재구성한 뒤 스냅샷을 저장한다.
+        """
+        with self._lock.read_lock():
+            tombstones = len(self._tombstones)
+            too_many_tombstones = tombstones > 0 and tombstones >= self.tombstone_ratio * self.vectorstore.index.ntotal
+        if not too_many_tombstones and self.wal.size_bytes() < self.wal_compact_bytes:
+            return
+        if not self._compaction_lock.acquire(blocking=False):
+            return  # 이미 진행 중
+
+        def run():
+            try:
+                self._purge_tombstones()
+                self._write_snapshot()
+            except Exception as e:
+                print(f"❌ 벡터스토어 compaction 실패: {e}")
+            finally:
+                self._compaction_lock.release()
+
+        threading.Thread(target=run, name="faiss-compaction", daemon=True).start()
+
+    def wait_for_maintenance(self):
+        """진행 중인 백그라운드 인덱스 재구성/compaction이 끝날 때까지 대기"""
+        with self._migration_lock:
+            pass
+        with self._compaction_lock:
+            pass
+
+    def compact(self):
+        """스냅샷 저장 (진행 중인 compaction이 있으면 끝날 때까지 대기)"""
+        with self._compaction_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        """
+        현재 벡터스토어를 새 스냅샷으로 저장하고, 스냅샷에 반영된 WAL 세그먼트를 삭제.
+        인덱스 복사만 read lock 안에서 하므로 저장 중에도 검색과 쓰기가 계속된다.
+        (_compaction_lock 보유 상태에서 호출)
+        """
+        with self._write_mutex:
+            wal_from = self.wal.rotate()
+
+        with self._lock.read_lock():
+            snapshot = FAISS(
+                embedding_function=self.embedding_model,
+                index=faiss.clone_index(self.vectorstore.index),
+                docstore=InMemoryDocstore(dict(self.vectorstore.docstore._dict)),
+                index_to_docstore_id=dict(self.vectorstore.index_to_docstore_id),
+                normalize_L2=self.vectorstore._normalize_L2,
+                distance_strategy=self.vectorstore.distance_strategy
+            )
+            metadata_data = self.metadata_index.to_dict()
+            bm25_data = self.bm25_index.dumps()
+
+        snapshot_name = f"{wal_from:08d}"
+        snapshots_dir = os.path.join(self.vectorstore_path, "snapshots")
+        snapshot.save_local(os.path.join(snapshots_dir, snapshot_name))
+        MetadataIndex.write(os.path.join(snapshots_dir, snapshot_name), metadata_data)
+        BM25Index.write(os.path.join(snapshots_dir, snapshot_name), bm25_data)
+
+        # CURRENT 파일 교체로 새 스냅샷을 원자적으로 공개
+        current_file = os.path.join(self.vectorstore_path, "CURRENT")
+        with open(current_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"snapshot": os.path.join("snapshots", snapshot_name), "wal_from": wal_from}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current_file + ".tmp", current_file)
+
+        self.wal.remove_segments_before(wal_from)
+        for name in os.listdir(snapshots_dir):
+            if name != snapshot_name:
+                shutil.rmtree(os.path.join(snapshots_dir, name), ignore_errors=True)
+        print(f"✅ 벡터스토어 스냅샷 저장 완료 (WAL 세그먼트 {wal_from}부터 유지)")
+
+    def add_split_documents(self, documents, progress_callback=None):
+        """이미 분할된 LangChain Document 청크들을 벡터 DB에 추가"""
+        if not documents:
+            return {"document_count": 0}
+        embedding_stats = self._add_documents(documents, progress_callback=progress_callback)
+        return {"document_count": len(documents), "embedding_stats": embedding_stats}
+
+    @staticmethod
+    def _chunk_hash(text, metadata):
+        """청크 비교용 해시 (본문과 메타데이터가 모두 같아야 같은 청크)"""
+        payload = json.dumps([text, metadata], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _diff_chunks(self, title, documents):
+        """
+        title로 저장된 청크와 새 청크 비교 (같은 청크가 여러 번 나와도 개수대로 짝지음).
+        :return: (새로 추가할 Document 리스트, 삭제할 청크 ID 리스트, 그대로 둘 청크 수)
+        """
+        with self._lock.read_lock():
+            stored = {}
+            docstore = self.vectorstore.docstore._dict
+            for doc_id in self.metadata_index.ids_for_title(title):
+                document = docstore.get(doc_id)
+                if document is not None:
+                    key = self._chunk_hash(document.page_content, document.metadata)
+                    stored.setdefault(key, []).append(doc_id)
+
+        new_documents = []
+        unchanged = 0
+        for document in documents:
+            matches = stored.get(self._chunk_hash(document.page_content, document.metadata))
+            if matches:
+                matches.pop()
+                unchanged += 1
+            else:
+                new_documents.append(document)
+        removed_ids = [doc_id for ids in stored.values() for doc_id in ids]
+        return new_documents, removed_ids, unchanged
+
+    def upsert_documents(self, title, documents, progress_callback=None):
+        """
+        title 문서의 새 버전(이미 분할된 청크)으로 교체.
+        청크 해시를 저장된 청크와 비교해 새 청크만 임베딩/추가하고 사라진 청크는 삭제하며,
+        삭제와 추가는 WAL 레코드 하나와 write lock 한 번으로 반영되어 검색에는 이전 버전이나 새 버전만 보인다.
+        반영이나 WAL 기록이 실패하면 이전 버전으로 되돌린다.
+        """
+        # 임베딩은 락 밖에서 하고 청크 해시별로 보관 (아래 재비교에서 새로 나온 청크만 추가로 임베딩)
+        new_documents, _, _ = self._diff_chunks(title, documents)
+        embedding_stats = None
+        embedded = {}
+        if new_documents:
+            embeddings, embedding_stats = self.embed_texts(
+                [document.page_content for document in new_documents], progress_callback=progress_callback
+            )
+            embedded = {
+                self._chunk_hash(document.page_content, document.metadata): embedding
+                for document, embedding in zip(new_documents, embeddings)
+            }
+
+        with INGESTION_STAGE_SECONDS.time(stage="persist"), self._write_mutex:
+            # 임베딩하는 동안 같은 문서가 바뀌었을 수 있으므로 쓰기 직전에 다시 비교
+            new_documents, removed_ids, unchanged = self._diff_chunks(title, documents)
+            if not new_documents and not removed_ids:
+                return {
+                    "title": title, "chunks_total": len(documents), "unchanged": unchanged,
+                    "added": 0, "removed": 0, "embedding_stats": embedding_stats
+                }
+
+            texts = [document.page_content for document in new_documents]
+            metadatas = [document.metadata for document in new_documents]
+            hashes = [self._chunk_hash(text, metadata) for text, metadata in zip(texts, metadatas)]
+            missing = list(dict.fromkeys(
+                (chunk_hash, text) for chunk_hash, text in zip(hashes, texts) if chunk_hash not in embedded
+            ))
+            if missing:
+                missing_embeddings, _ = self.embed_texts([text for _, text in missing])
+                embedded.update((chunk_hash, embedding) for (chunk_hash, _), embedding in zip(missing, missing_embeddings))
+            embeddings = [embedded[chunk_hash] for chunk_hash in hashes]
+            token_lists = [tokenize(text) for text in texts]
+            # 남는 청크와 ID가 겹치면 (예: "제목_순번" 형식) 새 ID 발급
+            with self._lock.read_lock():
+                kept_ids = set(self.metadata_index.ids_for_title(title)) - set(removed_ids)
+            ids = []
+            for document in new_documents:
+                doc_id = getattr(document, "id", None)
+                if not doc_id or doc_id in kept_ids or doc_id in ids:
+                    doc_id = str(uuid.uuid4())
+                ids.append(doc_id)
+
+            dimension = self.vectorstore.index.d
+            if any(len(embedding) != dimension for embedding in embeddings):
+                raise ValueError(f"Embedding dimension does not match the index ({dimension})")
+
+            # 메모리에 먼저 반영하고 WAL에 기록. 어느 쪽이든 실패하면 이전 버전으로 되돌려
+            # WAL과 메모리 인덱스가 항상 같은 상태를 가리키도록 한다
+            with self._lock.read_lock():
+                removed = self._snapshot_chunks(removed_ids)
+            with self._lock.write_lock():
+                self._apply_delete(removed_ids)
+                try:
+                    self._apply_add(ids, texts, metadatas, embeddings, token_lists)
+                except Exception:
+                    self._apply_delete(ids)
+                    self._restore_chunks(removed)
+                    raise
+                self.generation += 1
+            try:
+                self.wal.append_upsert(removed_ids, ids, texts, metadatas, embeddings)
+            except Exception:
+                with self._lock.write_lock():
+                    self._apply_delete(ids)
+                    self._restore_chunks(removed)
+                    self.generation += 1
+                raise
+            if self.full_vectors is not None and removed_ids:
+                self.full_vectors.delete_many(removed_ids)
+            self._store_full_vectors(ids, embeddings)
+        INGESTION_ITEMS.inc(len(ids), stage="persist")
+        print(f"🔁 '{title}' 갱신: 유지 {unchanged}, 추가 {len(ids)}, 삭제 {len(removed_ids)}")
+        self._maybe_compact()
+        self._maybe_migrate_index()
+        return {
+            "title": title, "chunks_total": len(documents), "unchanged": unchanged,
+            "added": len(ids), "removed": len(removed_ids), "embedding_stats": embedding_stats
+        }
+
+    def add_doc_to_db(self, doc, progress_callback=None):
         try:
             print(f"Processing document: {doc.metadata.get('title', '제목 없음')}")
             text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-            splits = text_splitter.split_text(doc.content)
+            with INGESTION_STAGE_SECONDS.time(stage="split"):
+                splits = text_splitter.split_text(doc.content)
+            INGESTION_ITEMS.inc(len(splits), stage="split")
 
             if not splits:
                 raise RuntimeError("Text splitting failed. No valid chunks generated.")
@@ -66,28 +835,22 @@ class VectorDBManager:
                 for split in splits
             ]
 
-            # 기존 벡터스토어에 새 문서 추가
-            self.vectorstore.add_documents(documents)
+            # 기존 벡터스토어에 새 문서 추가 및 저장
+            # (공유 인메모리 스토어가 기준이므로 디스크에서 다시 로드하지 않음)
+            self._add_documents(documents, progress_callback=progress_callback)
             print(f"✅ '{doc.title}' 문서가 벡터 DB에 성공적으로 추가되었습니다.")
 
-            # 벡터스토어 저장
-            self.vectorstore.save_local(self.vectorstore_path)
-            self.vectorstore = FAISS.load_local(
-                    self.vectorstore_path,
-                    self.embedding_model,
-                    allow_dangerous_deserialization=True  # 보안 설정 추가
-                )
-            print(f"✅ '{doc.title}' 문서가 벡터 DB에 성공적으로 추가 및 로드되었습니다.")
-
             # 제출된 문서 저장
             self.submitted_docs.append(doc)
 
             # 상위 3개 청크 정보
             vector_details = []
+            with self._lock.read_lock():
+                sample_vectors = [self.vectorstore.index.reconstruct(i) for i in range(min(3, len(documents)))]
             for i in range(min(3, len(documents))):
                 vector_details.append({
                     "vector_index": i + 1,
-                    "embedding_excerpt": self.vectorstore.index.reconstruct(i)[:5],  # 임베딩 일부 출력
+                    "embedding_excerpt": sample_vectors[i][:5],  # 임베딩 일부 출력
                     "content_excerpt": documents[i].page_content[:300],  # 청크 본문 일부 출력
                     "title": documents[i].metadata["title"],  # 문서 제목 추가
                     "url": documents[i].metadata["url"],  # 문서 URL 추가
@@ -101,32 +864,49 @@ class VectorDBManager:
             # print(f"Vectorstore saved at {self.vectorstore_path}.")
         except Exception as e:
             raise RuntimeError(f"Error processing document: {e}")
-    def add_pdf_to_db(self, docs):
-        """여러 문서를 벡터 DB에 추가"""
+    def add_pdf_to_db(self, docs, progress_callback=None):
+        """여러 문서(또는 페이지를 차례로 내주는 iterable)를 벡터 DB에 추가"""
         try:
-            if not isinstance(docs, list):
+            if hasattr(docs, "page_content"):
                 docs = [docs]  # 리스트로 변환
 
             text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
             documents = []
 
             for doc in docs:
-                splits = text_splitter.split_text(doc.page_content)  # doc.page_content 사용
-                for i, split in enumerate(splits):
-                    unique_id = f"{doc.metadata['title']}_{i}"  # title을 기반으로 고유 ID 생성
-                    documents.append(
-                        Document(page_content=split, metadata=doc.metadata, id=unique_id)
-                    )
+                with INGESTION_STAGE_SECONDS.time(stage="split"):
+                    splits = text_splitter.split_text(doc.page_content)  # doc.page_content 사용
+                    for split in splits:
+                        # title + 문서 전체 기준 순번으로 고유 ID 생성 (페이지가 여러 개여도 겹치지 않도록,
+                        # 재업로드 시 유지되는 청크와 겹치면 upsert_documents가 새 ID를 발급)
+                        unique_id = f"{doc.metadata['title']}_{len(documents)}"
+                        documents.append(
+                            Document(page_content=split, metadata=doc.metadata, id=unique_id)
+                        )
+            INGESTION_ITEMS.inc(len(documents), stage="split")
                 # for split in splits:
                 #     documents.append(
                 #         Document(page_content=split, metadata=doc.metadata)  # page_content 사용
                 #     )
 
-            # 벡터스토어에 문서 추가
-            self.vectorstore.add_documents(documents)
-            self.vectorstore.save_local(self.vectorstore_path)
+            # 제목별로 upsert (같은 PDF를 다시 올리면 바뀐 청크만 임베딩/교체)
+            by_title = {}
+            for document in documents:
+                by_title.setdefault(document.metadata.get("title"), []).append(document)
+            results = [
+                self.upsert_documents(title, title_documents, progress_callback=progress_callback)
+                for title, title_documents in by_title.items()
+            ]
 
-            return {"message": "✅ 문서가 성공적으로 벡터 DB에 추가되었습니다.", "document_count": len(documents)}
+            return {
+                "message": "✅ 문서가 성공적으로 벡터 DB에 추가되었습니다.",
+                "document_count": len(documents),
+                "chunks_unchanged": sum(result["unchanged"] for result in results),
+                "chunks_added": sum(result["added"] for result in results),
+                "chunks_removed": sum(result["removed"] for result in results),
+                "embedding_cache": self.embedding_cache.stats(),
+                "embedding_stats": [result["embedding_stats"] for result in results]
+            }
 
         except Exception as e:
             raise RuntimeError(f"Error processing document: {e}")
@@ -140,12 +920,150 @@ class VectorDBManager:
     def search(self, query, k, search_type, similarity_threshold):
         """
         Simple search in vector store.
+        질문 임베딩은 캐시를 거쳐 락 밖에서 구하고, FAISS 검색만 read lock 안에서 수행.
+        """
+        if not self.vectorstore:
+            raise ValueError("Vectorstore is not initialized. Add documents first.")
+
+        if search_type == "hybrid":
+            _, candidates = self.hybrid_candidates(query, fetch_k=k)
+            return [doc for doc, _, _ in candidates[:k]]
+
+        embedding = self.generate_embedding(query)
+        with self._lock.read_lock():
+            return self.search_by_vector(embedding, k, search_type, similarity_threshold)
+
+    def search_candidates(self, query, fetch_k):
+        """
+        질문과 가까운 후보 청크를 FAISS에 저장된 벡터와 함께 반환.
+        :return: (질문 임베딩, [(Document, 벡터, 관련도 점수)] 관련도 순)
+        """
+        if not self.vectorstore:
+            raise ValueError("Vectorstore is not initialized. Add documents first.")
+
+        embedding = self.generate_embedding(query)
+        return embedding, self.candidates_by_vector(embedding, fetch_k)
+
+    def candidates_by_vector(self, embedding, fetch_k):
+        """질문 임베딩으로 후보 청크 검색: [(Document, 벡터, 관련도 점수)] 관련도 순"""
+        with STAGE_SECONDS.time(stage="vector_search"), self._lock.read_lock():
+            relevance_fn = self.vectorstore._select_relevance_score_fn()
+            return [
+                (doc, vector, relevance_fn(score))
+                for _, doc, vector, score in self._index_search(embedding, fetch_k)
+            ]
+
+    def hybrid_candidates(self, query, fetch_k, rrf_k=60):
+        """
+        벡터 검색과 BM25 검색 결과를 reciprocal rank fusion으로 합친 후보.
+        제품 코드, 인명 같은 정확한 용어는 BM25 쪽에서 잡힌다.
+        :return: (질문 임베딩, [(Document, 벡터, RRF 점수)] 점수 순)
         """
         if not self.vectorstore:
             raise ValueError("Vectorstore is not initialized. Add documents first.")
 
-        retriever = self.get_retriever(search_type, k, similarity_threshold)
-        return retriever.invoke(query)
+        embedding = self.generate_embedding(query)
+        vector_hits, lexical_hits = self.hybrid_hits(query, embedding, fetch_k)
+        return embedding, fuse_hits(vector_hits, lexical_hits, fetch_k, k=rrf_k)
+
+    def hybrid_hits(self, query, embedding, fetch_k):
+        """
+        벡터 검색과 BM25 검색 결과 (융합 전).
+        :return: (벡터 결과, BM25 결과) 각각 [(문서 ID, Document, 벡터, 점수)] 점수 순
+                 (벡터 결과 점수는 관련도로 변환되어 컬렉션 간 비교 가능)
+        """
+        with self._lock.read_lock():
+            relevance_fn = self.vectorstore._select_relevance_score_fn()
+            with STAGE_SECONDS.time(stage="vector_search"):
+                vector_hits = [
+                    (doc_id, doc, vector, relevance_fn(score))
+                    for doc_id, doc, vector, score in self._index_search(embedding, fetch_k)
+                ]
+            with STAGE_SECONDS.time(stage="lexical_search"):
+                lexical_scores = self.bm25_index.search(query, fetch_k)
+
+            vectors = {doc_id: vector for doc_id, _, vector, _ in vector_hits}
+            lexical_only = [doc_id for doc_id, _ in lexical_scores if doc_id not in vectors]
+            vectors.update(zip(lexical_only, self._vectors_for_ids(lexical_only)))
+            lexical_hits = [
+                (doc_id, self.vectorstore.docstore._dict[doc_id], vectors[doc_id], score)
+                for doc_id, score in lexical_scores
+            ]
+        return vector_hits, lexical_hits
+
+    def _vectors_for_ids(self, ids):
+        """문서 ID의 벡터 (원본 벡터 저장소 우선, 없으면 인덱스에서 복원. read lock 보유 상태에서 호출)"""
+        stored = self.full_vectors.get_many(ids) if self.full_vectors is not None else {}
+        return [
+            stored[doc_id] if doc_id in stored else self.vectorstore.index.reconstruct(self._id_to_position[doc_id])
+            for doc_id in ids
+        ]
+
+    def _index_search(self, embedding, k, rescore=True):
+        """
+        FAISS 인덱스 검색 결과를 [(문서 ID, Document, 벡터, 점수)]로 반환 (read lock 보유 상태에서 호출).
+        원본 벡터 저장소가 있으면 복원값 대신 원본 벡터를 돌려주고, 양자화 인덱스는
+        k * rescore_factor개 후보를 원본 벡터로 다시 점수 매겨 상위 k개만 남긴다.
+        """
+        index = self.vectorstore.index
+        query_vector = np.array([embedding], dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(query_vector)
+        rescore = (
+            rescore and self.full_vectors is not None and self.rescore_factor > 1
+            and index_encoding(index) != "none"
+        )
+        fetch_k = k * self.rescore_factor if rescore else k
+        params = search_parameters(index, self._tombstone_selector)
+        if params is None and self._tombstones:
+            # 필터 검색을 지원하지 않는 인덱스: 삭제 표시된 수만큼 더 가져와 아래에서 걸러냄
+            fetch_k += len(self._tombstones)
+        scores, indices = index.search(query_vector, fetch_k, params=params)
+
+        hits = []
+        for score, position in zip(scores[0], indices[0]):
+            if position == -1:
+                continue
+            doc_id = self.vectorstore.index_to_docstore_id.get(int(position))
+            doc = self.vectorstore.docstore._dict.get(doc_id)
+            if doc is not None:
+                hits.append((doc_id, doc, int(position), float(score)))
+        stored = self.full_vectors.get_many([hit[0] for hit in hits]) if self.full_vectors is not None else {}
+
+        results = []
+        for doc_id, doc, position, score in hits:
+            vector = stored.get(doc_id)
+            if vector is None:
+                vector = index.reconstruct(position)
+            elif rescore:
+                score = float(exact_scores(query_vector[0], vector[None, :], index.metric_type)[0])
+            results.append((doc_id, doc, vector, score))
+        if rescore:
+            results.sort(key=lambda hit: hit[3], reverse=index.metric_type == faiss.METRIC_INNER_PRODUCT)
+        return results[:k]
+
+    def search_by_vector(self, embedding, k, search_type, similarity_threshold):
+        """임베딩 벡터로 검색 (read lock 보유 상태에서 호출)"""
+        if search_type == "mmr":
+            # 삭제 표시된 위치가 후보에 섞이지 않도록 _index_search 결과를 MMR로 다시 고름
+            # (fetch_k=20, lambda_mult=0.5는 LangChain 기본값)
+            hits = self._index_search(embedding, max(20, k))
+            query_vector = np.array([embedding], dtype=np.float32)
+            if self.vectorstore._normalize_L2:
+                faiss.normalize_L2(query_vector)
+            selected = maximal_marginal_relevance(query_vector[0], [vector for _, _, vector, _ in hits], k=k)
+            return [hits[i][1] for i in selected]
+
+        if search_type == "similarity_score_threshold":
+            relevance_fn = self.vectorstore._select_relevance_score_fn()
+            return [
+                doc for _, doc, _, score in self._index_search(embedding, k)
+                if relevance_fn(score) >= similarity_threshold
+            ]
+
+        if search_type != "similarity":
+            raise ValueError(f"Unsupported search_type: {search_type}")
+        return [doc for _, doc, _, _ in self._index_search(embedding, k)]
 
     def get_retriever(self, search_type, k, similarity_threshold):
         """Retrieve documents from the vectorstore."""
@@ -158,33 +1076,41 @@ class VectorDBManager:
         """Return all submitted documents."""
         return self.submitted_docs
     def get_all_docs_metadata(self):
-        """벡터 DB에 저장된 모든 문서의 메타데이터(title, url)를 반환"""
+        """
+        벡터 DB에 저장된 문서별 메타데이터를 반환 (보조 인덱스 사용).
+        청크마다 한 항목이던 이전과 달리 (title, url/source) 문서마다 한 항목이며
+        {"title", "url", "chunk_count"} 형식이다 (청크 수는 chunk_count를 합산).
+        """
         if not self.vectorstore:
             print("❌ FAISS 벡터스토어가 초기화되지 않았습니다.")
             return []
 
-        metadata_list = []
-        for doc_id, doc in self.vectorstore.docstore._dict.items():  # docstore 내부 dict 접근
+        with self._lock.read_lock():
+            documents = self.metadata_index.documents()
 
-            if doc is None:
-                continue
-            title = doc.metadata.get("title", "제목 없음")
-            url = doc.metadata.get("url", "URL 없음")
-            metadata_list.append({"title": title, "url": url})
+        return [
+            {
+                "title": document["title"] or "제목 없음",
+                "url": document["source"] or "URL 없음",
+                "chunk_count": document["chunk_count"],
+            }
+            for document in documents
+        ]
 
-        return metadata_list
     def get_top_k_vectors(self, k=5):
         """상위 K개의 벡터를 조회하여 반환합니다."""
         try:
             if not self.vectorstore:
                 raise RuntimeError("FAISS 벡터스토어가 초기화되지 않았습니다.")
 
-            if len(self.vectorstore.docstore._dict) == 0:
+            with self._lock.read_lock():
+                documents = list(self.vectorstore.docstore._dict.values())[:k]
+
+            if not documents:
                 print("❌ 벡터스토어에 저장된 문서가 없습니다.")
                 return []
 
             # 상위 K개의 문서 정보를 가져오기
-            documents = list(self.vectorstore.docstore._dict.values())[:k]
             top_k_info = [{"title": doc.metadata.get("title", "N/A"), "content_excerpt": doc.page_content[:300]} for doc in documents]
 
             return top_k_info
@@ -196,25 +1122,32 @@ class VectorDBManager:
     def delete_doc_by_title(self, title: str):
         """title을 기반으로 문서를 삭제"""
         try:
-            # 모든 문서 출력
-            print("📄 현재 저장된 문서 목록:")
-            for doc_id, doc in self.vectorstore.docstore._dict.items():
-                print(f"ID: {doc_id}, Title: {doc.metadata.get('title')}, Metadata: {doc.metadata}")
-
-            # docstore에서 title로 해당 ID 가져오기
-            doc_ids_to_delete = [
-                doc_id for doc_id, doc in self.vectorstore.docstore._dict.items()
-                if doc.metadata.get("title") == title
-            ]
+            with self._write_mutex:
+                # 보조 인덱스에서 title로 해당 ID 가져오기
+                with self._lock.read_lock():
+                    doc_ids_to_delete = self.metadata_index.ids_for_title(title)
 
-            if not doc_ids_to_delete:
-                return {"message": f"❌ '{title}' 제목의 문서를 찾을 수 없습니다."}
+                if not doc_ids_to_delete:
+                    return {"message": f"❌ '{title}' 제목의 문서를 찾을 수 없습니다."}
 
-            print(f"📝 삭제할 문서 ID 리스트: {doc_ids_to_delete}")
+                print(f"📝 '{title}' 문서의 청크 {len(doc_ids_to_delete)}개를 삭제합니다.")
 
-            # 삭제 수행
-            self.vectorstore.delete(doc_ids_to_delete)
-            self.vectorstore.save_local(self.vectorstore_path)
+                # 메모리에 먼저 반영하고 WAL에 기록 (기록 실패 시 삭제를 되돌림)
+                with self._lock.read_lock():
+                    removed = self._snapshot_chunks(doc_ids_to_delete)
+                with self._lock.write_lock():
+                    deleted_ids = self._apply_delete(doc_ids_to_delete)
+                try:
+                    self.wal.append_delete(doc_ids_to_delete)
+                except Exception:
+                    with self._lock.write_lock():
+                        self._restore_chunks(removed)
+                        self.generation += 1
+                    raise
+                if deleted_ids and self.full_vectors is not None:
+                    self.full_vectors.delete_many(deleted_ids)
+            # 삭제 표시가 쌓였으면 compaction에서 인덱스 재구성
+            self._maybe_compact()
 
             return {"message": f"✅ '{title}' 제목의 문서가 성공적으로 삭제되었습니다."}
 
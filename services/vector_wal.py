@@ -0,0 +1,190 @@
+import os
+import pickle
+import struct
+import threading
+import zlib
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_HEADER = struct.Struct("<II")  # payload 길이, crc32
+
+
+class DirectoryOwnerLock:
+    """
+    벡터스토어 디렉터리의 프로세스 간 배타 락 (프로세스가 살아 있는 동안 유지).
+    인덱스는 프로세스 메모리에 있으므로 WAL/스냅샷을 기록하는 프로세스는 하나여야 한다.
+    여러 프로세스가 같은 디렉터리를 쓰면 한 프로세스의 compaction이 다른 프로세스가 기록 중인
+    세그먼트를 지워 재시작 시 변경분이 사라지므로, 두 번째 프로세스는 시작 단계에서 실패시킨다.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, "LOCK")
+        self._file = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.seek(0)
+            owner = f.read().strip() or "unknown"
+            f.close()
+            raise RuntimeError(
+                f"{os.path.dirname(self.path)} is already in use by another process (pid {owner}). "
+                "The vector store supports a single server process: run one worker with threads "
+                "(e.g. gunicorn -w 1 --threads 8) and do not use the debug reloader."
+            )
+        f.truncate(0)
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class VectorWriteAheadLog:
+    """
+    FAISS 벡터스토어 변경분(추가된 벡터/문서, 삭제된 ID)을 기록하는 append-only 로그.
+    로그는 번호가 붙은 세그먼트 파일로 나뉘며, 스냅샷(compaction) 시 rotate() 후
+    스냅샷에 포함된 이전 세그먼트를 삭제한다.
+    한 디렉터리에는 한 프로세스만 기록해야 한다 (DirectoryOwnerLock으로 보장).
+    각 레코드는 [길이][crc32][pickle payload] 형식이며, 마지막 레코드가
+    중간에 잘린 경우(비정상 종료) 재생 시 무시한다.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        segments = self.list_segments()
+        self.active_seq = segments[-1] if segments else 1
+        self._truncate_corrupt_tail(self._segment_path(self.active_seq))
+        self._file = open(self._segment_path(self.active_seq), "ab")
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{seq:08d}.log")
+
+    def _truncate_corrupt_tail(self, path):
+        """비정상 종료로 잘린 마지막 레코드를 잘라내 이후 기록이 읽히도록 보장"""
+        if not os.path.exists(path):
+            return
+        valid_length = 0
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                length, crc = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                valid_length = f.tell()
+        if valid_length < os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(valid_length)
+
+    def list_segments(self):
+        """존재하는 세그먼트 번호 목록 (오름차순)"""
+        return sorted(
+            int(name[:-4]) for name in os.listdir(self.directory)
+            if name.endswith(".log") and name[:-4].isdigit()
+        )
+
+    def _append(self, record):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._file.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    @staticmethod
+    def _add_payload(ids, texts, metadatas, embeddings):
+        """추가 청크 payload (임베딩은 float32 바이트로 압축 저장)"""
+        dim = len(embeddings[0]) if embeddings else 0
+        flat = array("f")
+        for embedding in embeddings:
+            flat.extend(embedding)
+        return {
+            "ids": list(ids),
+            "texts": list(texts),
+            "metadatas": list(metadatas),
+            "dim": dim,
+            "vectors": flat.tobytes(),
+        }
+
+    def append_add(self, ids, texts, metadatas, embeddings):
+        """새 청크 기록"""
+        self._append({"op": "add", **self._add_payload(ids, texts, metadatas, embeddings)})
+
+    def append_upsert(self, delete_ids, ids, texts, metadatas, embeddings):
+        """삭제와 추가를 레코드 하나로 기록 (재생 시 둘 다 반영되거나 둘 다 무시됨)"""
+        self._append({
+            "op": "upsert",
+            "delete_ids": list(delete_ids),
+            **self._add_payload(ids, texts, metadatas, embeddings),
+        })
+
+    def append_delete(self, ids):
+        self._append({"op": "delete", "ids": list(ids)})
+
+    def size_bytes(self):
+        """현재 남아 있는 세그먼트 전체 크기"""
+        return sum(os.path.getsize(self._segment_path(seq)) for seq in self.list_segments())
+
+    def rotate(self):
+        """
+        새 세그먼트로 전환하고 그 번호를 반환.
+        반환된 번호 이전의 세그먼트는 더 이상 기록되지 않는다.
+        """
+        with self._lock:
+            self._file.close()
+            self.active_seq += 1
+            self._file = open(self._segment_path(self.active_seq), "ab")
+            return self.active_seq
+
+    def remove_segments_before(self, seq):
+        for old_seq in self.list_segments():
+            if old_seq < seq:
+                os.remove(self._segment_path(old_seq))
+
+    def replay(self, from_seq=0):
+        """from_seq 이상의 세그먼트 레코드를 순서대로 반환"""
+        for seq in self.list_segments():
+            if seq < from_seq:
+                continue
+            with open(self._segment_path(seq), "rb") as f:
+                while True:
+                    header = f.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        break
+                    length, crc = _HEADER.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        print(f"⚠️ WAL 세그먼트 {seq}의 손상된 마지막 레코드를 무시합니다.")
+                        break
+                    record = pickle.loads(payload)
+                    if record["op"] in ("add", "upsert"):
+                        vectors = array("f")
+                        vectors.frombytes(record.pop("vectors"))
+                        dim = record.pop("dim")
+                        record["embeddings"] = [
+                            vectors[i:i + dim].tolist() for i in range(0, len(vectors), dim)
+                        ] if dim else []
+                    yield record
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,158 @@
+"""
+여러 URL을 동시에 가져오는 HTTP 크롤러.
+keep-alive 연결 풀을 가진 requests.Session 하나를 공유하여 같은 호스트로의 요청은 연결을 재사용하고,
+호스트별 동시 요청 수를 제한하여 한 사이트에 요청이 몰리지 않도록 한다.
+제한은 작업을 스레드 풀에 넣기 전에 적용하므로 느린 호스트가 풀의 스레드를 붙잡지 않는다.
+"""
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+@dataclass
+class FetchResult:
+    url: str
+    content: bytes = None  # 응답 본문 (실패 시 None). 인코딩 판별은 파서에 맡긴다
+    status_code: int = None
+    error: str = None
+    seconds: float = 0.0
+
+
+class WebCrawler:
+    def __init__(self, max_workers=16, per_host_limit=4, timeout=20.0, max_bytes=10 * 1024 * 1024,
+                 retries=2, user_agent="Mozilla/5.0 (compatible; rag-ingest/1.0)"):
+        """
+        :param max_workers: 전체 동시 요청 수 (연결 풀 크기도 같게 맞춤)
+        :param per_host_limit: 호스트별 동시 요청 수
+        :param timeout: 연결/읽기 제한 시간 (초)
+        :param max_bytes: 응답 본문 최대 크기. 넘으면 해당 URL은 실패 처리
+        """
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_workers,
+            pool_maxsize=max_workers,
+            max_retries=Retry(
+                total=retries, backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",)
+            )
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    @staticmethod
+    def _host(url):
+        return urlsplit(url).netloc.lower()
+
+    def _host_slot(self, host):
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+
+    def get(self, url):
+        """URL 하나를 가져와 본문 바이트 반환 (HTTP 오류/크기 초과 시 예외)"""
+        with self._host_slot(self._host(url)):
+            return self._get(url)
+
+    def _get(self, url):
+        """호스트 슬롯을 이미 확보한 상태에서 URL 하나를 가져옴"""
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body.extend(chunk)
+                if len(body) > self.max_bytes:
+                    raise ValueError(f"Response exceeds {self.max_bytes} bytes")
+            return response.status_code, bytes(body)
+
+    def _fetch(self, url):
+        started = time.perf_counter()
+        try:
+            status_code, content = self._get(url)
+            return FetchResult(url=url, content=content, status_code=status_code,
+                               seconds=time.perf_counter() - started)
+        except Exception as e:
+            response = getattr(e, "response", None)
+            return FetchResult(url=url, status_code=getattr(response, "status_code", None), error=str(e),
+                               seconds=time.perf_counter() - started)
+
+    def fetch_all(self, urls):
+        """
+        URL들을 동시에 가져와 완료되는 순서대로 FetchResult를 yield.
+        URL을 호스트별 대기열로 나누고, 호스트 슬롯을 확보한 URL만 호스트를 돌아가며 풀에 넣는다.
+        진행 중인 요청은 max_workers개까지만 두므로 스레드가 슬롯을 기다리며 놀지 않고,
+        한 호스트가 느려도 다른 호스트의 URL은 계속 처리된다.
+        """
+        queues = {}
+        for url in urls:
+            queues.setdefault(self._host(url), deque()).append(url)
+        pending = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crawler") as executor:
+                while queues or pending:
+                    submitted = True
+                    while submitted and queues and len(pending) < self.max_workers:
+                        submitted = False
+                        for host in list(queues):
+                            if len(pending) >= self.max_workers:
+                                break
+                            # 슬롯이 없으면 (다른 수집 작업이 같은 호스트를 쓰는 중 포함) 다음 호스트로
+                            if not self._host_slot(host).acquire(blocking=False):
+                                continue
+                            url = queues[host].popleft()
+                            if not queues[host]:
+                                del queues[host]
+                            pending[executor.submit(self._fetch, url)] = host
+                            submitted = True
+                    if not pending:
+                        # 남은 호스트의 슬롯을 모두 다른 작업이 쓰는 중
+                        time.sleep(0.05)
+                        continue
+                    # 대기 중인 호스트가 있으면 다른 작업이 슬롯을 반납했는지 주기적으로 다시 확인
+                    done, _ = wait(pending, timeout=0.05 if queues else None, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._host_slot(pending.pop(future)).release()
+                        yield future.result()
+        finally:
+            # 중간에 중단된 경우 (executor 종료로 모두 끝난 요청의) 슬롯 반납
+            for host in pending.values():
+                self._host_slot(host).release()
+
+    def sitemap_urls(self, sitemap_url, limit=1000):
+        """sitemap.xml(또는 sitemap index)에서 페이지 URL 목록 추출 (최대 limit개)"""
+        urls = []
+        seen_sitemaps = set()
+        sitemaps = deque([sitemap_url])
+        while sitemaps and len(urls) < limit:
+            current = sitemaps.popleft()
+            if current in seen_sitemaps:
+                continue
+            seen_sitemaps.add(current)
+            _, content = self.get(current)
+            root = ET.fromstring(content)
+            # 네임스페이스 유무와 관계없이 태그 이름으로 비교
+            locations = [
+                element.text.strip() for element in root.iter()
+                if element.tag.rsplit("}", 1)[-1] == "loc" and element.text
+            ]
+            if root.tag.rsplit("}", 1)[-1] == "sitemapindex":
+                sitemaps.extend(locations)
+            else:
+                urls.extend(locations)
+        return list(dict.fromkeys(urls))[:limit]
@@ -0,0 +1,158 @@
+"""
+쓰기 지연(write-behind) 버퍼.
+채팅 기록, 감사 로그처럼 요청이 결과를 기다릴 필요 없는 INSERT를 큐에 쌓아 두고
+백그라운드 스레드가 batch_size개 또는 flush_interval초마다 테이블별 executemany 한 번과 commit 한 번으로 저장한다.
+큐가 가득 차면 put이 대기하고(backpressure), 그래도 자리가 나지 않으면 호출한 쪽에서 바로 저장한다.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from models.models import db
+from services.metrics import registry, STAGE_SECONDS
+
+
+class WriteBehindBuffer:
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0, put_timeout=5.0, enabled=True):
+        """
+        :param max_queue: 큐에 쌓을 수 있는 최대 행 수
+        :param put_timeout: 큐가 가득 찼을 때 기다리는 최대 시간 (초). 넘으면 호출한 쪽에서 동기 저장
+        :param enabled: False이면 항상 동기 저장
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.enabled = enabled
+        self.app = None
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._worker = None
+
+    def init_app(self, app):
+        """워커 시작 및 종료 시 남은 행 저장 훅 등록"""
+        if not self.enabled or self._worker is not None:
+            return
+        self.app = app
+        self._worker = threading.Thread(target=self._worker_loop, name="write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.shutdown)
+
+    def add(self, model, **values):
+        """
+        model 테이블에 values 행을 저장하도록 예약.
+        워커가 없거나 큐가 put_timeout 동안 가득 차 있으면 현재 세션에서 바로 저장한다 (app context 필요).
+        """
+        row = (model.__table__, values)
+        if self._worker is not None and not self._stop.is_set():
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+                return
+            except queue.Full:
+                print(f"⚠️ 쓰기 버퍼가 가득 차 동기 저장합니다 ({model.__tablename__})")
+        db.session.execute(model.__table__.insert(), [values])
+        db.session.commit()
+
+    def pending(self):
+        """대기 중인 항목 수 (flush 표시 포함)"""
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        """
+        호출 시점까지 큐에 들어온 행이 저장될 때까지 대기 (이후에 들어온 행은 기다리지 않음).
+        큐에 표시를 넣고 워커가 그 앞의 행을 저장한 뒤 표시를 처리하면 반환한다.
+        :return: timeout 안에 저장되었으면 True
+        """
+        if self._worker is None or self._stop.is_set():
+            return True
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def shutdown(self):
+        """남은 행을 저장하고 워커 종료 (atexit에서 호출)"""
+        if self._worker is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._worker.join(timeout=30)
+        if self._worker.is_alive():
+            print(f"⚠️ 쓰기 버퍼 종료 시간 초과: {self.pending()}개 행을 저장하지 못했습니다.")
+
+    def _next_batch(self):
+        """batch_size개가 모이거나 flush_interval이 지나거나 flush 표시가 나올 때까지 수집"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            if isinstance(item, threading.Event):
+                break
+        return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                rows = [item for item in batch if not isinstance(item, threading.Event)]
+                if rows:
+                    with self.app.app_context():
+                        self._write(rows)
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        item.set()
+                    self._queue.task_done()
+            elif self._stop.is_set():
+                return
+
+    def _write(self, batch):
+        """테이블별로 묶어 executemany 후 한 번에 commit. 실패하면 행 단위로 다시 시도해 문제 행만 버린다."""
+        by_table = defaultdict(list)
+        for table, values in batch:
+            by_table[table].append(values)
+
+        with STAGE_SECONDS.time(stage="write_behind_flush"):
+            try:
+                for table, rows in by_table.items():
+                    db.session.execute(table.insert(), rows)
+                db.session.commit()
+                self.flushed_rows += len(batch)
+                return
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ 쓰기 버퍼 일괄 저장 실패, 행 단위로 재시도: {e}")
+
+            for table, values in batch:
+                try:
+                    db.session.execute(table.insert(), [values])
+                    db.session.commit()
+                    self.flushed_rows += 1
+                except Exception as e:
+                    db.session.rollback()
+                    self.failed_rows += 1
+                    print(f"❌ 쓰기 버퍼 행 저장 실패 ({table.name}): {e}")
+
+
+write_behind = WriteBehindBuffer(
+    max_queue=int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000")),
+    batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1.0")),
+    enabled=os.getenv("WRITE_BEHIND_ENABLED", "true").lower() != "false"
+)
+registry.add_collector(lambda: [
+    ("write_behind_pending_rows", "gauge", "Rows waiting in the write-behind buffer", [({}, write_behind.pending())]),
+    ("write_behind_flushed_rows_total", "counter", "Rows written by the write-behind buffer", [({}, write_behind.flushed_rows)]),
+    ("write_behind_failed_rows_total", "counter", "Rows dropped after a failed write", [({}, write_behind.failed_rows)]),
+])
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain_core.documents import Document
+
+from benchmarks.fake_providers import FakeEmbeddings
+from services.vector_db_manager import VectorDBManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite3"))
+    monkeypatch.setenv("FAISS_INDEX_TYPE", "flat")
+    return VectorDBManager(
+        openai_api_key=None,
+        google_api_key=None,
+        vectorstore_path=str(tmp_path / "faiss_db"),
+        embedding_model=FakeEmbeddings(dimension=64)
+    )
+
+
+def assert_positions_consistent(manager):
+    mapping = manager.vectorstore.index_to_docstore_id
+    assert manager._id_to_position == {doc_id: position for position, doc_id in mapping.items()}
+    assert set(mapping.values()) == set(manager.vectorstore.docstore._dict)
+    assert not manager._tombstones & set(mapping)
+
+
+def test_add_after_delete_keeps_positions(manager):
+    manager._add_documents([Document(page_content="alpha apple avocado", metadata={"title": "A"})])
+    manager.delete_doc_by_title("A")
+    manager._add_documents([Document(page_content="bravo banana blueberry", metadata={"title": "B"})])
+
+    assert_positions_consistent(manager)
+    results = manager.search("bravo banana blueberry", 1, "similarity", 0)
+    assert [doc.page_content for doc in results] == ["bravo banana blueberry"]
+
+
+def test_upsert_replaces_changed_chunks(manager):
+    manager.upsert_documents("A", [Document(page_content=text, metadata={"title": "A"}) for text in ("one", "two")])
+    result = manager.upsert_documents(
+        "A", [Document(page_content=text, metadata={"title": "A"}) for text in ("one", "three")]
+    )
+
+    assert (result["unchanged"], result["added"], result["removed"]) == (1, 1, 1)
+    assert_positions_consistent(manager)
+    results = manager.search("three", 1, "similarity", 0)
+    assert [doc.page_content for doc in results] == ["three"]